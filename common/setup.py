@@ -0,0 +1,16 @@
+from setuptools import setup, find_packages
+
+# the metrics and the json codec shared by the Consumer Group and the Consumer Applications
+setup(
+    name='consumer_common',
+    version='0.0.1',
+    author_email='petya.slavova@gmail.com',
+    packages=find_packages(where='src'),
+    package_dir={"":"src"},
+    # the faster json codec
+    extras_require={'fast_json': ['orjson']},
+    setup_requires=['pytest-runner'],
+    tests_require=['pytest'],
+
+    python_requires='>=3.9',
+)
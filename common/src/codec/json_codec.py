@@ -0,0 +1,40 @@
+import json
+
+from typing import Any, List, Union
+
+# orjson (optional dependency) parses and serializes several times faster than the json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# A message is kept either decoded (dict) or as the raw json payload (bytes) received from the channel,
+# when its fields are not needed - the raw payloads are passed on without decoding and encoding them again.
+Message = Union[dict, bytes]
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+# checks that the payload is a json object, so that a malformed payload doesn't make the whole json array
+# of its batch invalid - the raw payload is returned with keep_raw, otherwise the decoded message
+def decode_message(data: Union[bytes, str], keep_raw: bool = False) -> Message:
+    msg = loads(data)
+    if not isinstance(msg, dict):
+        raise ValueError(f"Message is a json {type(msg).__name__}, expected a json object.")
+    return data if keep_raw else msg
+
+def encode_message(msg: Message) -> bytes:
+    return msg if isinstance(msg, bytes) else dumps(msg)
+
+# the json array of the messages, the raw payloads are copied as they are
+def encode_messages(msgs: List[Message]) -> bytes:
+    return b"[" + b",".join([encode_message(msg) for msg in msgs]) + b"]"
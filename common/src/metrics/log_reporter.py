@@ -0,0 +1,64 @@
+import collections
+import logging
+import math
+import time
+
+from typing import Dict, List, Tuple
+from metrics.metrics import COUNTER, GAUGE, HISTOGRAM, HistogramSnapshot, Labels, MetricsRegistry
+
+# Periodically logs the application metrics: the rates of the counters (over the reporting period and
+# over a longer rolling window), the latency quantiles of the histograms over the reporting period and
+# the values of the gauges. Labeled metrics (e.g. per consumer) are logged on a separate line per label.
+class LogReporter:
+    def __init__(self, registry: MetricsRegistry, period_in_seconds: int, window_in_seconds: int = 60):
+        self.registry = registry
+        self.period_in_seconds = period_in_seconds
+        self.window_in_seconds = window_in_seconds
+        self._counters_samples = collections.deque(maxlen=math.ceil(window_in_seconds / period_in_seconds) + 1)
+        self._counters_samples.append((time.monotonic(), {}))
+        self._previous_histograms: Dict[Tuple[str, Labels], HistogramSnapshot] = {}
+
+    def run_reporting(self) -> None:
+        logging.info("Starting Statistics Reporter ...")
+        while True:
+            time.sleep(self.period_in_seconds)
+            try:
+                for line in self.report():
+                    logging.info(line)
+            except Exception as ex:
+                logging.error("Failed to report statistics.")
+                logging.exception(ex)
+
+    def report(self) -> List[str]:
+        now = time.monotonic()
+        counters: Dict[Tuple[str, Labels], int] = {}
+        parts: Dict[Labels, List[str]] = {}
+        for family in self.registry.collect():
+            for labels, metric in sorted(family.metrics.items()):
+                if family.type == COUNTER:
+                    counters[(family.name, labels)] = metric.value()
+                elif family.type == GAUGE:
+                    parts.setdefault(labels, []).append(f"{family.name}: {metric.value():g}")
+                elif family.type == HISTOGRAM:
+                    snapshot = metric.snapshot()
+                    previous = self._previous_histograms.get((family.name, labels))
+                    self._previous_histograms[(family.name, labels)] = snapshot
+                    period_snapshot = snapshot.since(previous) if previous else snapshot
+                    if period_snapshot.count:
+                        parts.setdefault(labels, []).append(
+                            f"{family.name}: p50={period_snapshot.quantile(0.5) * 1000:.2f}ms "
+                            + f"p99={period_snapshot.quantile(0.99) * 1000:.2f}ms")
+
+        previous_time, previous_counters = self._counters_samples[-1]
+        window_time, window_counters = self._counters_samples[0]
+        for (name, labels), value in counters.items():
+            rate = (value - previous_counters.get((name, labels), 0)) / (now - previous_time)
+            window_rate = (value - window_counters.get((name, labels), 0)) / (now - window_time)
+            parts.setdefault(labels, []).insert(0, f"{name}: {rate:.2f}/s ({self.window_in_seconds}s: {window_rate:.2f}/s)")
+        self._counters_samples.append((now, counters))
+
+        lines = []
+        for labels, label_parts in sorted(parts.items()):
+            prefix = ", ".join(f"{name}={value}" for name, value in labels)
+            lines.append(f"{prefix + ': ' if prefix else ''}{'; '.join(label_parts)}")
+        return lines
@@ -0,0 +1,260 @@
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# The counters and histograms are striped - a thread updates the stripe selected by its id, so the threads
+# rarely wait for each other, while the number of stripes stays fixed however many threads are started
+# (e.g. a thread per connection of the Rest Api server).
+STRIPES_COUNT = 16
+
+def _get_stripe_index() -> int:
+    return threading.get_native_id() % STRIPES_COUNT
+
+# Counter striped by thread - each stripe is guarded by its own lock, so no increments are lost.
+# The value is the sum of all stripes.
+class Counter:
+    def __init__(self):
+        self._cells: List[int] = [0] * STRIPES_COUNT
+        self._locks = [threading.Lock() for _ in range(STRIPES_COUNT)]
+
+    def inc(self, amount: int = 1) -> None:
+        index = _get_stripe_index()
+        with self._locks[index]:
+            self._cells[index] += amount
+
+    def value(self) -> int:
+        return sum(self._cells)
+
+class Gauge:
+    def __init__(self, function: Callable[[], float] = None):
+        self._function = function
+        self._value = 0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def value(self) -> float:
+        return self._function() if self._function else self._value
+
+@dataclass
+class HistogramSnapshot:
+    buckets: Dict[Tuple[int, int], int]
+    count: int
+    sum: float
+
+    def since(self, previous: "HistogramSnapshot") -> "HistogramSnapshot":
+        buckets = {bucket: count - previous.buckets.get(bucket, 0) for bucket, count in self.buckets.items()}
+        return HistogramSnapshot(buckets={bucket: count for bucket, count in buckets.items() if count},
+                                 count=self.count - previous.count,
+                                 sum=self.sum - previous.sum)
+
+    def merge(self, other: "HistogramSnapshot") -> "HistogramSnapshot":
+        buckets = dict(self.buckets)
+        for bucket, count in other.buckets.items():
+            buckets[bucket] = buckets.get(bucket, 0) + count
+        return HistogramSnapshot(buckets=buckets, count=self.count + other.count, sum=self.sum + other.sum)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for (shift, mantissa), count in sorted(self.buckets.items()):
+            seen += count
+            if seen >= rank:
+                # middle of the bucket, converted from microseconds to seconds
+                return ((mantissa << shift) + ((1 << shift) - 1) / 2) / 1_000_000
+        return 0.0
+
+# Latency histogram with log-linear buckets (like HDR histograms) - each power of two range of the
+# values in microseconds is split in 2^(SUB_BUCKET_BITS - 1) buckets, which keeps the relative error
+# of the quantiles below 1% for any value. The buckets are striped by thread like the counter cells.
+class Histogram:
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self):
+        self._shards: List[Dict[Tuple[int, int], int]] = [{} for _ in range(STRIPES_COUNT)]
+        self._totals: List[List[float]] = [[0, 0.0] for _ in range(STRIPES_COUNT)]
+        self._locks = [threading.Lock() for _ in range(STRIPES_COUNT)]
+
+    def observe(self, value_in_seconds: float) -> None:
+        bucket = Histogram._get_bucket(max(int(value_in_seconds * 1_000_000), 0))
+        index = _get_stripe_index()
+        with self._locks[index]:
+            shard = self._shards[index]
+            shard[bucket] = shard.get(bucket, 0) + 1
+            totals = self._totals[index]
+            totals[0] += 1
+            totals[1] += value_in_seconds
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+    def snapshot(self) -> HistogramSnapshot:
+        buckets: Dict[Tuple[int, int], int] = {}
+        count, total_sum = 0, 0.0
+        for shard, totals, lock in zip(self._shards, self._totals, self._locks):
+            with lock:
+                shard_buckets = dict(shard)
+                count += int(totals[0])
+                total_sum += totals[1]
+            for bucket, bucket_count in shard_buckets.items():
+                buckets[bucket] = buckets.get(bucket, 0) + bucket_count
+        return HistogramSnapshot(buckets=buckets, count=count, sum=total_sum)
+
+    @staticmethod
+    def _get_bucket(value: int) -> Tuple[int, int]:
+        shift = max(value.bit_length() - Histogram.SUB_BUCKET_BITS, 0)
+        return shift, value >> shift
+
+class _Timer:
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start_time = time.monotonic()
+        return self
+
+    def __exit__(self, *args):
+        self.histogram.observe(time.monotonic() - self.start_time)
+
+@dataclass
+class MetricFamily:
+    name: str
+    help: str
+    type: str
+    metrics: Dict[Labels, object]
+
+# Values of the metrics exported by another process, e.g. by a worker process to its parent
+@dataclass
+class ExportedMetric:
+    name: str
+    help: str
+    type: str
+    labels: Labels
+    value: object
+
+# Sum of the local metric and the metrics imported from other processes with the same name and labels
+class _AggregatedMetric:
+    def __init__(self, type: str, values: List):
+        self.type = type
+        self.values = values
+
+    def value(self) -> float:
+        return sum(self.values)
+
+    def snapshot(self) -> HistogramSnapshot:
+        snapshot = HistogramSnapshot(buckets={}, count=0, sum=0.0)
+        for value in self.values:
+            snapshot = snapshot.merge(value)
+        return snapshot
+
+# Registry of the application metrics - a metric is identified by its name and labels, e.g.
+# the dispatch latency of each consumer is a separate histogram labeled with the consumer id.
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families: Dict[str, MetricFamily] = {}
+        self._imported: Dict[str, List[ExportedMetric]] = {}
+
+    def counter(self, name: str, help: str, labels: Dict[str, str] = None) -> Counter:
+        return self._get_metric(name, help, COUNTER, labels, Counter)
+
+    def gauge(self, name: str, help: str, labels: Dict[str, str] = None,
+              function: Callable[[], float] = None) -> Gauge:
+        return self._get_metric(name, help, GAUGE, labels, lambda: Gauge(function))
+
+    def histogram(self, name: str, help: str, labels: Dict[str, str] = None) -> Histogram:
+        return self._get_metric(name, help, HISTOGRAM, labels, Histogram)
+
+    def remove(self, name: str, labels: Dict[str, str]) -> None:
+        family = self._families.get(name)
+        if family is not None:
+            with self._lock:
+                family.metrics.pop(MetricsRegistry._to_labels(labels), None)
+
+    def remove_labeled(self, label_name: str, label_value: str) -> None:
+        with self._lock:
+            for family in self._families.values():
+                for labels in [labels for labels in family.metrics if (label_name, label_value) in labels]:
+                    del family.metrics[labels]
+            for source, metrics in self._imported.items():
+                self._imported[source] = [metric for metric in metrics if (label_name, label_value) not in metric.labels]
+
+    def collect(self) -> List[MetricFamily]:
+        with self._lock:
+            families = {family.name: MetricFamily(family.name, family.help, family.type, dict(family.metrics))
+                        for family in self._families.values()}
+            imported = [metric for metrics in self._imported.values() for metric in metrics]
+        if not imported:
+            return list(families.values())
+
+        values: Dict[Tuple[str, Labels], List] = {}
+        for metric in imported:
+            family = families.setdefault(metric.name, MetricFamily(metric.name, metric.help, metric.type, {}))
+            if family.type == metric.type:
+                values.setdefault((metric.name, metric.labels), []).append(metric.value)
+        for (name, labels), metric_values in values.items():
+            family = families[name]
+            local_metric = family.metrics.get(labels)
+            if local_metric is not None:
+                metric_values.append(local_metric.snapshot() if family.type == HISTOGRAM else local_metric.value())
+            family.metrics[labels] = _AggregatedMetric(family.type, metric_values)
+        return list(families.values())
+
+    def export(self) -> List[ExportedMetric]:
+        return [ExportedMetric(family.name, family.help, family.type, labels,
+                               metric.snapshot() if family.type == HISTOGRAM else metric.value())
+                for family in self.collect() for labels, metric in family.metrics.items()]
+
+    # the metrics exported by the source replace the ones imported from it before
+    def import_metrics(self, source: str, metrics: List[ExportedMetric]) -> None:
+        with self._lock:
+            self._imported[source] = metrics
+
+    # the source is stopped - its counters and histograms are kept, so that the totals don't decrease,
+    # while its gauges are dropped
+    def retire_imported(self, source: str) -> None:
+        with self._lock:
+            metrics = self._imported.get(source)
+            if metrics is not None:
+                self._imported[source] = [metric for metric in metrics if metric.type != GAUGE]
+
+    def _get_metric(self, name: str, help: str, type: str, labels: Dict[str, str], create: Callable):
+        key = MetricsRegistry._to_labels(labels)
+        family = self._families.get(name)
+        metric = family.metrics.get(key) if family is not None and family.type == type else None
+        if metric is not None:
+            return metric
+
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MetricFamily(name=name, help=help, type=type, metrics={})
+                self._families[name] = family
+            elif family.type != type:
+                raise ValueError(f"Metric {name} is already registered as {family.type}")
+            metric = family.metrics.get(key)
+            if metric is None:
+                metric = create()
+                family.metrics[key] = metric
+            return metric
+
+    @staticmethod
+    def _to_labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted(labels.items())) if labels else ()
+
+# the registry shared by all components of the application
+REGISTRY = MetricsRegistry()
+
+def redis_command_latency(command: str) -> Histogram:
+    return REGISTRY.histogram("redis_command_latency_seconds", "Latency of the Redis commands (or pipelines).",
+                              {"command": command})
@@ -0,0 +1,44 @@
+from typing import List
+from metrics.metrics import COUNTER, GAUGE, HISTOGRAM, Labels, MetricsRegistry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# quantiles of the latency histograms exposed in the summaries
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Renders the metrics of the registry in the Prometheus text exposition format.
+# The latency histograms are exposed as summaries - quantiles, sum and count since the application start.
+def render(registry: MetricsRegistry) -> str:
+    lines: List[str] = []
+    for family in sorted(registry.collect(), key=lambda family: family.name):
+        lines.append(f"# HELP {family.name} {_escape_help(family.help)}")
+        lines.append(f"# TYPE {family.name} {'summary' if family.type == HISTOGRAM else family.type}")
+        for labels, metric in sorted(family.metrics.items()):
+            if family.type in (COUNTER, GAUGE):
+                lines.append(f"{family.name}{_format_labels(labels)} {_format_value(metric.value())}")
+            elif family.type == HISTOGRAM:
+                snapshot = metric.snapshot()
+                for quantile in QUANTILES:
+                    quantile_labels = labels + (("quantile", str(quantile)),)
+                    lines.append(f"{family.name}{_format_labels(quantile_labels)} "
+                                 + _format_value(snapshot.quantile(quantile)))
+                lines.append(f"{family.name}_sum{_format_labels(labels)} {_format_value(snapshot.sum)}")
+                lines.append(f"{family.name}_count{_format_labels(labels)} {snapshot.count}")
+    return "\n".join(lines) + "\n"
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(str(value))}"' for name, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    # e.g. the liveness of a thread is reported as 1 or 0
+    if isinstance(value, bool):
+        value = int(value)
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
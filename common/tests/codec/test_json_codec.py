@@ -0,0 +1,30 @@
+import json
+import pytest
+
+from codec import json_codec
+
+def test_dumps_and_loads():
+    msg = {"message_id": "1", "values": [1, 2.5, None]}
+    assert json_codec.loads(json_codec.dumps(msg)) == msg
+    assert json_codec.loads(json_codec.dumps(msg).decode()) == msg
+
+def test_encode_message_keeps_raw_payload():
+    payload = b'{"message_id": "1"}'
+    assert json_codec.encode_message(payload) is payload
+
+def test_encode_messages_mixes_raw_and_decoded_messages():
+    body = json_codec.encode_messages([b'{"message_id": "1"}', {"message_id": "2"}])
+    assert json.loads(body) == [{"message_id": "1"}, {"message_id": "2"}]
+
+def test_encode_empty_messages():
+    assert json_codec.encode_messages([]) == b"[]"
+
+def test_decode_message():
+    payload = b'{"message_id": "1"}'
+    assert json_codec.decode_message(payload) == {"message_id": "1"}
+    assert json_codec.decode_message(payload, keep_raw=True) is payload
+
+@pytest.mark.parametrize("payload", [b"not json", b'{"message_id": "1"', b"[]", b'"1"', b"null", b"\xff"])
+def test_decode_message_rejects_malformed_payload(payload):
+    with pytest.raises(ValueError):
+        json_codec.decode_message(payload, keep_raw=True)
@@ -0,0 +1,27 @@
+from metrics.metrics import MetricsRegistry
+from metrics.log_reporter import LogReporter
+
+def test_report_counters_gauges_and_histograms():
+    registry = MetricsRegistry()
+    registry.counter("messages_received_total", "Received.").inc(10)
+    registry.gauge("dispatch_in_flight", "In flight.", function=lambda: 3)
+    registry.histogram("dispatch_latency_seconds", "Latency.", {"consumer_id": "localhost:5001"}).observe(0.01)
+    reporter = LogReporter(registry=registry, period_in_seconds=3)
+    reporter._counters_samples.append((0, {}))
+
+    lines = reporter.report()
+
+    assert len(lines) == 2
+    assert lines[0].startswith("messages_received_total: ")
+    assert "dispatch_in_flight: 3" in lines[0]
+    assert lines[1].startswith("consumer_id=localhost:5001: dispatch_latency_seconds: p50=10.0")
+
+def test_report_histogram_only_over_period():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("dispatch_latency_seconds", "Latency.")
+    reporter = LogReporter(registry=registry, period_in_seconds=3)
+    reporter._counters_samples.append((0, {}))
+
+    histogram.observe(0.01)
+    assert reporter.report() == ["dispatch_latency_seconds: p50=10.02ms p99=10.02ms"]
+    assert reporter.report() == []
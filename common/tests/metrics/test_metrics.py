@@ -0,0 +1,108 @@
+import threading
+import pytest
+
+from metrics.metrics import MetricsRegistry, Counter, Histogram, COUNTER, HISTOGRAM, STRIPES_COUNT
+
+def test_counter_sums_increments_of_all_threads():
+    counter = Counter()
+
+    def increment():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value() == 4000
+
+def test_metrics_of_short_lived_threads_are_not_kept():
+    counter = Counter()
+    histogram = Histogram()
+
+    for _ in range(200):
+        thread = threading.Thread(target=lambda: (counter.inc(), histogram.observe(0.001)))
+        thread.start()
+        thread.join()
+
+    assert counter.value() == 200
+    assert histogram.snapshot().count == 200
+    assert len(counter._cells) == STRIPES_COUNT
+    assert len(histogram._shards) == STRIPES_COUNT
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for value_in_ms in range(1, 101):
+        histogram.observe(value_in_ms / 1000)
+
+    snapshot = histogram.snapshot()
+    assert snapshot.count == 100
+    assert snapshot.sum == pytest.approx(5.05)
+    assert snapshot.quantile(0.5) == pytest.approx(0.050, rel=0.01)
+    assert snapshot.quantile(0.99) == pytest.approx(0.099, rel=0.01)
+
+def test_histogram_snapshot_since_previous():
+    histogram = Histogram()
+    histogram.observe(0.001)
+    previous = histogram.snapshot()
+    histogram.observe(0.5)
+
+    period_snapshot = histogram.snapshot().since(previous)
+    assert period_snapshot.count == 1
+    assert period_snapshot.quantile(0.5) == pytest.approx(0.5, rel=0.01)
+
+def test_registry_returns_same_metric_for_same_labels():
+    registry = MetricsRegistry()
+
+    counter = registry.counter("dispatched_total", "Dispatched.", {"consumer_id": "localhost:5001"})
+    assert registry.counter("dispatched_total", "Dispatched.", {"consumer_id": "localhost:5001"}) is counter
+    assert registry.counter("dispatched_total", "Dispatched.", {"consumer_id": "localhost:5002"}) is not counter
+
+def test_registry_rejects_different_metric_type():
+    registry = MetricsRegistry()
+    registry.counter("latency", "Latency.")
+
+    with pytest.raises(ValueError):
+        registry.histogram("latency", "Latency.")
+
+def test_registry_removes_labeled_metrics():
+    registry = MetricsRegistry()
+    registry.counter("dispatched_total", "Dispatched.", {"consumer_id": "localhost:5001"})
+    registry.histogram("latency_seconds", "Latency.", {"consumer_id": "localhost:5001"})
+    registry.counter("dispatched_total", "Dispatched.", {"consumer_id": "localhost:5002"})
+
+    registry.remove_labeled("consumer_id", "localhost:5001")
+
+    families = {family.name: family for family in registry.collect()}
+    assert families["dispatched_total"].type == COUNTER
+    assert list(families["dispatched_total"].metrics) == [(("consumer_id", "localhost:5002"),)]
+    assert families["latency_seconds"].type == HISTOGRAM
+    assert not families["latency_seconds"].metrics
+
+def test_registry_sums_imported_metrics():
+    registry = MetricsRegistry()
+    registry.counter("received_total", "Received.").inc(2)
+    worker_registry = MetricsRegistry()
+    worker_registry.counter("received_total", "Received.").inc(3)
+    worker_registry.histogram("latency_seconds", "Latency.").observe(0.1)
+
+    registry.import_metrics("worker:1", worker_registry.export())
+
+    families = {family.name: family for family in registry.collect()}
+    assert families["received_total"].metrics[()].value() == 5
+    assert families["latency_seconds"].metrics[()].snapshot().count == 1
+
+def test_registry_keeps_counters_of_retired_source():
+    registry = MetricsRegistry()
+    worker_registry = MetricsRegistry()
+    worker_registry.counter("received_total", "Received.").inc(3)
+    worker_registry.gauge("pubsub_backlog", "Backlog.").set(7)
+    registry.import_metrics("worker:1", worker_registry.export())
+
+    registry.retire_imported("worker:1")
+
+    families = {family.name: family for family in registry.collect()}
+    assert families["received_total"].metrics[()].value() == 3
+    assert "pubsub_backlog" not in families
@@ -0,0 +1,36 @@
+from metrics import prometheus
+from metrics.metrics import MetricsRegistry
+
+def test_render_counters_and_gauges():
+    registry = MetricsRegistry()
+    registry.counter("messages_received_total", "Messages received from the channel.").inc(5)
+    registry.gauge("thread_alive", "Whether the thread is running.", {"thread": "MessageListener"}, function=lambda: True)
+    registry.gauge("retry_pending", "Messages waiting.").set(1.5)
+
+    assert prometheus.render(registry) == \
+        "# HELP messages_received_total Messages received from the channel.\n" \
+        + "# TYPE messages_received_total counter\n" \
+        + "messages_received_total 5\n" \
+        + "# HELP retry_pending Messages waiting.\n" \
+        + "# TYPE retry_pending gauge\n" \
+        + "retry_pending 1.5\n" \
+        + "# HELP thread_alive Whether the thread is running.\n" \
+        + "# TYPE thread_alive gauge\n" \
+        + 'thread_alive{thread="MessageListener"} 1\n'
+
+def test_render_histogram_as_summary():
+    registry = MetricsRegistry()
+    registry.histogram("dispatch_latency_seconds", "Latency.", {"consumer_id": "localhost:5001"}).observe(0.01)
+
+    lines = prometheus.render(registry).splitlines()
+
+    assert lines[1] == "# TYPE dispatch_latency_seconds summary"
+    assert lines[2].startswith('dispatch_latency_seconds{consumer_id="localhost:5001",quantile="0.5"} 0.010')
+    assert lines[5] == 'dispatch_latency_seconds_sum{consumer_id="localhost:5001"} 0.01'
+    assert lines[6] == 'dispatch_latency_seconds_count{consumer_id="localhost:5001"} 1'
+
+def test_render_escapes_label_values():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors.", {"reason": 'bad "value"'}).inc()
+
+    assert 'errors_total{reason="bad \\"value\\""} 1' in prometheus.render(registry)
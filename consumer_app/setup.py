@@ -7,13 +7,16 @@ setup(
     packages=find_packages(where='src'),
     package_dir={"":"src"},
     install_requires=[
+        'consumer_common',
         'redis',
         'flask',
         'requests',
         'marshmallow'
     ],
+    # production grade serving modes of the Rest Api and the faster json codec
+    extras_require={'production': ['waitress', 'gunicorn'], 'fast_json': ['orjson']},
     setup_requires=['pytest-runner'],
-    tests_require=['pytest', 'requests-mock'],
+    tests_require=['pytest', 'requests-mock', 'fakeredis[lua]'],
 
     python_requires='>=3.9',
 )
@@ -0,0 +1,67 @@
+import logging
+
+from flask import Flask
+from typing import Callable
+from constants import SERVING_MODE_DEVELOPMENT, SERVING_MODE_WAITRESS
+
+# Serves the Rest Api in the current process:
+# development - the Flask (Werkzeug) development server, a thread per request
+# waitress - the production WSGI server waitress (optional dependency) with a fixed pool of worker threads
+class ApiServer:
+    def __init__(self, host: str, port: int, serving_mode: str, threads: int, drain_timeout_seconds: int):
+        self.host = host
+        self.port = port
+        self.serving_mode = serving_mode
+        self.threads = threads
+        self.drain_timeout_seconds = drain_timeout_seconds
+        self._server = None
+
+    def serve(self, app: Flask) -> None:
+        if self.serving_mode == SERVING_MODE_DEVELOPMENT:
+            logging.info("Starting Flask App...")
+            app.run(host=self.host, port=self.port, debug=False, threaded=True)
+        elif self.serving_mode == SERVING_MODE_WAITRESS:
+            try:
+                from waitress import create_server
+            except ImportError:
+                raise RuntimeError("Serving mode waitress requires the waitress package: pip install waitress")
+            logging.info(f"Starting Flask App with waitress and {self.threads} threads...")
+            self._server = create_server(app, host=self.host, port=self.port, threads=self.threads)
+            self._server.run()
+        else:
+            raise ValueError(f"Unsupported serving mode {self.serving_mode}")
+
+    def shutdown(self) -> None:
+        # stops accepting connections and waits for the requests being processed to complete
+        if self._server is not None:
+            logging.info(f"Draining Rest Api requests for up to {self.drain_timeout_seconds} seconds...")
+            self._server.close()
+            self._server.task_dispatcher.shutdown(cancel_pending=False, timeout=self.drain_timeout_seconds)
+
+# Serves the Rest Api with gunicorn (optional dependency) in several worker processes with a pool of threads each.
+# create_app is called in each worker process after it is started, so every worker creates its own objects,
+# on_worker_exit is called in the worker process once it has stopped accepting requests (after the graceful drain)
+# and on_exit - in the main process, once all workers are stopped.
+def serve_with_gunicorn(host: str, port: int, workers: int, threads: int, drain_timeout_seconds: int,
+                        create_app: Callable[[], Flask], on_worker_exit: Callable[[], None],
+                        on_exit: Callable[[], None]) -> None:
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise RuntimeError("Serving mode gunicorn requires the gunicorn package: pip install gunicorn")
+
+    class GunicornApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("graceful_timeout", drain_timeout_seconds)
+            self.cfg.set("worker_exit", lambda server, worker: on_worker_exit())
+            self.cfg.set("on_exit", lambda server: on_exit())
+
+        def load(self):
+            return create_app()
+
+    logging.info(f"Starting Flask App with gunicorn, {workers} workers and {threads} threads per worker...")
+    GunicornApplication().run()
@@ -1,23 +1,52 @@
 import uuid
 import logging
 from flask import (
-    g, Flask, jsonify, request
+    g, Blueprint, Flask, Response, current_app, jsonify, request
 )
+from flask.json.provider import DefaultJSONProvider
 from marshmallow import Schema, fields
 
+from codec import json_codec
 from constants import CONSUMER_CONTEXT_KEY
+from consumer.processing_executor import ProcessingOverloadedError, ProcessingStoppedError
+from metrics import prometheus
+from metrics.metrics import REGISTRY
 
-# creating the Flask app
-rest_api_app = Flask(__name__)
+# the apis are registered in each app created by create_app
+rest_api = Blueprint("rest_api", __name__)
 
 message_schema_err_msg = "Provided data does not match requirements. " \
     + "The body should contain json data like the following: {'consumer_id': '<host>:<port>'}. " \
     + "<host> and <port> are the connection details to use for consumer's Rest Apis."
 
+messages_schema_err_msg = "Provided data does not match requirements. " \
+    + "The body should contain json array like the following: [{'message_id': '<guid>'}, ...]."
+
+overloaded_err_msg = "The consumer is processing too many messages. Send the messages to another consumer or try again later."
+
+stopping_err_msg = "The consumer is stopping. Send the messages to another consumer."
+
+# seconds after which the rejected messages can be sent again
+RETRY_AFTER_SECONDS = 1
+
+invalid_message_err_msg = "Message does not match requirements. " \
+    + "Each message should be json object like the following: {'message_id': '<guid>'}."
+
 class MessageSchema(Schema):
     message_id = fields.String(required=True)
 
-@rest_api_app.post('/processMessage')
+# the schema is created once and reused by all requests
+message_schema = MessageSchema()
+
+# Parses the request bodies and serializes the responses with the json codec (orjson, when it is installed)
+class CodecJSONProvider(DefaultJSONProvider):
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return json_codec.dumps(obj).decode()
+
+@rest_api.post('/processMessage')
 def process_message():
     # expected format {"message_id": "some guid"}
     data = None
@@ -34,13 +63,15 @@ def process_message():
             response.status_code = 400
             return response
 
-        consumer = getattr(rest_api_app, CONSUMER_CONTEXT_KEY)
+        consumer = current_app.extensions[CONSUMER_CONTEXT_KEY]
         consumer.process_msg(data)
 
         response = jsonify(
             message = f"Message with id {data.get('message_id')} was processed successfully."
         )
         return response
+    except (ProcessingOverloadedError, ProcessingStoppedError) as ex:
+        return create_rejected_response(ex)
     except Exception as ex:
         uuid_ref = str(uuid.uuid4())
         logging.error(f"Failed to process message: {data}. Ref: {uuid_ref}")
@@ -50,11 +81,84 @@ def process_message():
         response.status_code = 400
         return response
 
-@rest_api_app.get('/health')
+@rest_api.post('/processMessages')
+def process_messages():
+    # expected format [{"message_id": "some guid"}, ...]
+    data = None
+    try:
+        if not request.is_json:
+            response = jsonify({"error": messages_schema_err_msg})
+            response.status_code = 400
+            return response
+        data = request.get_json(force=True)
+        if not isinstance(data, list):
+            response = jsonify({"error": messages_schema_err_msg})
+            response.status_code = 400
+            return response
+
+        # invalid messages are reported as failed, the valid ones are still processed
+        results = [None] * len(data)
+        valid_msgs_indexes = []
+        for index, msg in enumerate(data):
+            try:
+                validate_consumer_data(json_request_data=msg)
+                valid_msgs_indexes.append(index)
+            except Exception:
+                results[index] = {"status": "failed", "error": invalid_message_err_msg}
+
+        consumer = current_app.extensions[CONSUMER_CONTEXT_KEY]
+        processed = consumer.process_msgs([data[index] for index in valid_msgs_indexes])
+        for index, is_processed in zip(valid_msgs_indexes, processed):
+            results[index] = {"status": "processed"} if is_processed else {"status": "failed"}
+
+        for msg, result in zip(data, results):
+            result["message_id"] = msg.get("message_id") if isinstance(msg, dict) else None
+
+        response = jsonify(results=results)
+        return response
+    except (ProcessingOverloadedError, ProcessingStoppedError) as ex:
+        return create_rejected_response(ex)
+    except Exception as ex:
+        uuid_ref = str(uuid.uuid4())
+        logging.error(f"Failed to process messages batch: {data}. Ref: {uuid_ref}")
+        logging.exception(ex)
+        error_message = f"Failed to process messages! Use Ref for details: {uuid_ref}"
+        response = jsonify({"error": error_message})
+        response.status_code = 400
+        return response
+
+@rest_api.get('/health')
 def health():
     response = jsonify(message=f"Application is running")
     return response
 
+@rest_api.get('/metrics')
+def metrics():
+    return Response(prometheus.render(REGISTRY), content_type=prometheus.CONTENT_TYPE)
+
+# 429 when the consumer is overloaded and 503 when it is stopping - the messages were not processed
+def create_rejected_response(ex: Exception) -> Response:
+    logging.warning(f"Rejected messages: {ex}")
+    if isinstance(ex, ProcessingOverloadedError):
+        response = jsonify({"error": overloaded_err_msg})
+        response.status_code = 429
+    else:
+        response = jsonify({"error": stopping_err_msg})
+        response.status_code = 503
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
+def create_app(consumer) -> Flask:
+    rest_api_app = Flask(__name__)
+    rest_api_app.json = CodecJSONProvider(rest_api_app)
+    # the consumer is kept in the app extensions, so that it can be extracted and used in the api
+    rest_api_app.extensions[CONSUMER_CONTEXT_KEY] = consumer
+    rest_api_app.register_blueprint(rest_api)
+    return rest_api_app
+
 def validate_consumer_data(json_request_data):
-    schema = MessageSchema()
-    schema.load(json_request_data)
\ No newline at end of file
+    # the common message - an object with just the message id - is checked without the schema
+    if type(json_request_data) is dict and len(json_request_data) == 1 \
+            and type(json_request_data.get("message_id")) is str:
+        return
+    message_schema.load(json_request_data)
\ No newline at end of file
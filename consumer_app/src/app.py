@@ -1,33 +1,95 @@
 import argparse
+import functools
 import logging
 import threading
 import atexit
 
 from pathlib import Path
+from typing import List
 from config_parser import Configs, load_configs
-from api.consumer_api import rest_api_app
+from api.consumer_api import create_app
+from api.api_server import ApiServer, serve_with_gunicorn
 from consumer.consumer import Consumer
+from consumer.processed_messages_writer import DURABILITY_MODES
+from consumer.messages_stream_puller import MessagesStreamPuller
 from consumer.consumer_registration_monitor import ConsumerRegistrationMonitor
 from consumer_group.consumer_group_client import ConsumerGroupClient
-from constants import CONSUMER_CONTEXT_KEY
+from metrics.metrics import REGISTRY
+from metrics.log_reporter import LogReporter
+from constants import PIPELINE_MODES, PIPELINE_MODE_PULL, SERVING_MODES, SERVING_MODE_GUNICORN
 
 logging.basicConfig(format='%(asctime)s %(levelname)s %(threadName)s %(message)s',
                     level=logging.INFO,
                     datefmt='%Y-%m-%d %H:%M:%S')
 
-consumer: Consumer = None
+PRINT_STATS_PERIOD_IN_SECONDS = 3
 
-def start_flask_app(api_host: str, api_port: int, consumer: Consumer):
-    # set the consumer object in the context so that it can be extracted and used in the api
-    setattr(rest_api_app, CONSUMER_CONTEXT_KEY, consumer)
+def start_consumer(configs: Configs) -> Consumer:
+    logging.info("Initializing consumer.")
+    consumer = Consumer(
+        redis_host=configs.redis_host,
+        redis_port=configs.redis_port,
+        service_host=configs.rest_api_host,
+        service_port=configs.rest_api_port,
+        write_batch_size=configs.write_batch_size,
+        write_flush_interval_ms=configs.write_flush_interval_ms,
+        durability_mode=configs.durability_mode,
+        write_max_queued_batches=configs.write_max_queued_batches,
+        write_timeout_ms=configs.write_timeout_ms,
+        dedup_enabled=configs.dedup_enabled,
+        dedup_ttl_in_seconds=configs.dedup_ttl_in_seconds,
+        dedup_local_cache_size=configs.dedup_local_cache_size,
+        processing_stages=configs.processing_stages,
+        io_workers=configs.io_workers,
+        cpu_workers=configs.cpu_workers,
+        max_pending_batches=configs.max_pending_batches
+        )
 
-    logging.info("Starting Flask App...")
-    rest_api_app.run(host=api_host, port=api_port, debug = False)
+    REGISTRY.gauge("processing_pending_batches", "Batches being processed or waiting for a worker.",
+                   function=consumer.executor.pending_count)
 
-def release_resources_on_exit(group_app_host: str, group_app_port: int, consumer: Consumer):
-    logging.info("Unregister from consumer group...")
-    group_app_client = ConsumerGroupClient(group_app_host, group_app_port)
-    group_app_client.unregister(id=consumer.id)
+    # the background threads are daemon threads, so they don't keep the process (or a gunicorn worker) running
+    # after it is stopped - the pending processed messages are saved by consumer.close() on exit
+    writer_thread = threading.Thread(name="ProcessedMessagesWriter", target=consumer.writer.run_flushing, daemon=True)
+    writer_thread.start()
+    consumer_threads = [writer_thread]
+
+    if configs.pipeline_mode == PIPELINE_MODE_PULL:
+        logging.info("Initializing and starting pending messages puller.")
+        puller = MessagesStreamPuller(consumer=consumer,
+                                      batch_size=configs.pull_batch_size,
+                                      block_ms=configs.pull_block_ms,
+                                      claim_min_idle_ms=configs.pull_claim_min_idle_ms)
+        puller_thread = threading.Thread(name="MessagesPuller", target=puller.run_pulling, daemon=True)
+        puller_thread.start()
+        consumer_threads.append(puller_thread)
+
+    stats_reporter = LogReporter(registry=REGISTRY, period_in_seconds=PRINT_STATS_PERIOD_IN_SECONDS)
+    printStats_thread = threading.Thread(name="StatisticsReporter", target=stats_reporter.run_reporting, daemon=True)
+    printStats_thread.start()
+    consumer_threads.append(printStats_thread)
+
+    register_threads_liveness(consumer_threads)
+    return consumer
+
+def register_threads_liveness(threads: List[threading.Thread]) -> None:
+    for thread in threads:
+        REGISTRY.gauge("thread_alive", "Whether the application thread is running.", {"thread": thread.name},
+                       function=thread.is_alive)
+
+def release_resources_on_exit(group_app_client: ConsumerGroupClient, consumer_id: str,
+                              api_server: ApiServer = None, consumer: Consumer = None):
+    try:
+        logging.info("Unregister from consumer group...")
+        group_app_client.unregister(id=consumer_id)
+        group_app_client.close()
+    finally:
+        # the requests already received are completed before the pending processed messages are saved
+        if api_server is not None:
+            api_server.shutdown()
+        if consumer is not None:
+            logging.info("Saving the pending processed messages...")
+            consumer.close()
 
 def run():
     logging.info("Starting consumer application.")
@@ -41,10 +103,36 @@ def run():
                         help="Provide server host address for the Consumer Group Application. Value should be IP address or hostname.")
     parser.add_argument("--consumerGroupAppPort", required=False,
                         help="Provide server port for the Consumer Group Application.")
+    parser.add_argument("--heartbeatIntervalMs", required=False,
+                        help="How often in milliseconds the membership lease in the consumer group is renewed.")
     parser.add_argument("--restApiHost", required=False,
                         help="Hostname/IP on which the Rest Api Service will be started.")
     parser.add_argument("--restApiPort", required=False,
                         help="Port on which the Rest Api Service will be started.")
+    parser.add_argument("--writeBatchSize", required=False,
+                        help="Maximum number of processed messages saved to the Redis stream with one pipelined batch.")
+    parser.add_argument("--writeFlushIntervalMs", required=False,
+                        help="Maximum time in milliseconds a processed message waits for its batch to fill up before it is saved.")
+    parser.add_argument("--durabilityMode", required=False, choices=DURABILITY_MODES,
+                        help="sync - answer processing requests after the messages are saved; async - answer immediately.")
+    parser.add_argument("--pipelineMode", required=False, choices=PIPELINE_MODES,
+                        help="push - receive messages through the Rest Api; pull - pull messages from the pending messages stream.")
+    parser.add_argument("--pullBatchSize", required=False,
+                        help="Maximum number of messages pulled with one request in pull mode.")
+    parser.add_argument("--dedupEnabled", required=False, choices=["true", "false"],
+                        help="Skip the messages with already processed message_id.")
+    parser.add_argument("--processingStages", required=False,
+                        help="Comma separated <module>:<function> registering additional processing stages.")
+    parser.add_argument("--cpuWorkers", required=False,
+                        help="Number of worker processes running the processing stages (0 - the stages run in the request thread).")
+    parser.add_argument("--maxPendingBatches", required=False,
+                        help="Maximum number of batches processed at the same time, the others are rejected with 429 (default - twice the cpuWorkers).")
+    parser.add_argument("--servingMode", required=False, choices=SERVING_MODES,
+                        help="development - Flask development server; waitress - multi-threaded WSGI server; gunicorn - multi-process WSGI server.")
+    parser.add_argument("--apiWorkers", required=False,
+                        help="Number of worker processes serving the Rest Api in gunicorn serving mode.")
+    parser.add_argument("--apiThreads", required=False,
+                        help="Number of threads serving the Rest Api (per worker process in gunicorn serving mode).")
     parser.add_argument("--configFilePath", default=f"{src_folder_path}/../config/config.properties",
                         help="Location of the properties files with application configurations.")
 
@@ -53,35 +141,59 @@ def run():
     logging.info("Loading application configurations.")
     configs: Configs = load_configs(args)
 
-    logging.info("Initializing consumer.")
-    consumer = Consumer(
-        redis_host=configs.redis_host,
-        redis_port=configs.redis_port,
-        service_host=configs.rest_api_host,
-        service_port=configs.rest_api_port
-        )
+    consumer_id = f"{configs.rest_api_host}:{configs.rest_api_port}"
+    group_app_client = ConsumerGroupClient(host=configs.consumer_group_app_host,
+                                           port=configs.consumer_group_app_port,
+                                           timeout_ms=configs.consumer_group_app_timeout_ms)
+    monitor = ConsumerRegistrationMonitor(group_app_client=group_app_client, consumer_id=consumer_id,
+                                          heartbeat_interval_ms=configs.heartbeat_interval_ms)
+
+    if configs.serving_mode == SERVING_MODE_GUNICORN:
+        # each worker process creates its own consumer, the main process only keeps the registration
+        worker_consumers: List[Consumer] = []
+
+        def create_worker_app():
+            consumer = start_consumer(configs)
+            worker_consumers.append(consumer)
+            return create_app(consumer)
+
+        # called by the worker_exit hook of gunicorn in the stopping worker
+        def close_worker_consumers():
+            logging.info("Saving the pending processed messages...")
+            for consumer in worker_consumers:
+                consumer.close()
+
+        logging.info("Initializing and starting consumers registrations monitoring.")
+        registration_monitoring_thread = threading.Thread(name="ConsumerRegistrationMonitoring",
+                                                          target=monitor.run_monitoring)
+        registration_monitoring_thread.start()
+
+        logging.info("Initializing and starting Rest Api service.")
+        serve_with_gunicorn(host=configs.rest_api_host, port=configs.rest_api_port,
+                            workers=configs.rest_api_workers, threads=configs.rest_api_threads,
+                            drain_timeout_seconds=configs.rest_api_drain_timeout_seconds,
+                            create_app=create_worker_app, on_worker_exit=close_worker_consumers,
+                            on_exit=functools.partial(release_resources_on_exit, group_app_client, consumer_id))
+        return
+
+    consumer = start_consumer(configs)
 
     logging.info("Initializing and starting Rest Api service.")
-    flask_thread = threading.Thread(name="FlaskApp", target=start_flask_app,
-                                    kwargs={
-                                        "consumer":consumer,
-                                        "api_host":configs.rest_api_host,
-                                        "api_port":configs.rest_api_port
-                                    })
+    api_server = ApiServer(host=configs.rest_api_host, port=configs.rest_api_port,
+                           serving_mode=configs.serving_mode, threads=configs.rest_api_threads,
+                           drain_timeout_seconds=configs.rest_api_drain_timeout_seconds)
+    flask_thread = threading.Thread(name="FlaskApp", target=api_server.serve,
+                                    kwargs={"app":create_app(consumer)})
     flask_thread.start()
 
     logging.info("Initializing and starting consumers registrations monitoring.")
-    monitor = ConsumerRegistrationMonitor(group_app_host=configs.consumer_group_app_host,
-                                          group_app_port=configs.consumer_group_app_port,
-                                          consumer_id=consumer.id)
     registration_monitoring_thread = threading.Thread(name="ConsumerRegistrationMonitoring",
                                                       target=monitor.run_monitoring)
     registration_monitoring_thread.start()
 
-    atexit.register(release_resources_on_exit,
-                    configs.consumer_group_app_host,
-                    configs.consumer_group_app_port,
-                    consumer)
+    register_threads_liveness([flask_thread, registration_monitoring_thread])
+
+    atexit.register(release_resources_on_exit, group_app_client, consumer_id, api_server, consumer)
 
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    run()
@@ -2,6 +2,7 @@ import configparser
 import os.path
 import logging
 from dataclasses import dataclass
+from typing import List
 
 @dataclass
 class Configs:
@@ -9,8 +10,30 @@ class Configs:
     redis_port: int
     rest_api_host: str
     rest_api_port: int
+    serving_mode: str
+    rest_api_workers: int
+    rest_api_threads: int
+    rest_api_drain_timeout_seconds: int
     consumer_group_app_host: str
     consumer_group_app_port: int
+    consumer_group_app_timeout_ms: int
+    heartbeat_interval_ms: int
+    write_batch_size: int
+    write_flush_interval_ms: int
+    durability_mode: str
+    write_max_queued_batches: int
+    write_timeout_ms: int
+    pipeline_mode: str
+    pull_batch_size: int
+    pull_block_ms: int
+    pull_claim_min_idle_ms: int
+    dedup_enabled: bool
+    dedup_ttl_in_seconds: int
+    dedup_local_cache_size: int
+    processing_stages: List[str]
+    io_workers: int
+    cpu_workers: int
+    max_pending_batches: int
 
 def get_property(args_value: str, config_file_value: str, default_value: str, prop_type: type):
     if args_value:
@@ -20,12 +43,22 @@ def get_property(args_value: str, config_file_value: str, default_value: str, pr
     else:
         return prop_type(default_value)
 
+# by default a batch can wait for each worker processing the batches (the cpu_workers, else the io_workers,
+# else the request threads), the batches above it are rejected instead of queuing up without a limit
+def get_default_max_pending_batches(cpu_workers: int, io_workers: int, rest_api_threads: int) -> int:
+    if cpu_workers > 0:
+        return 2 * cpu_workers
+    if io_workers > 0:
+        return 2 * io_workers
+    return rest_api_threads
+
 def load_configs(args):
     if not os.path.isfile(args.configFilePath):
         logging.warn(f"Config file is not found: {args.configFilePath}")
         redis_props = {}
         rest_api_props = {}
         consumer_group_app_props = {}
+        processing_props = {}
     else:
         properties_config = configparser.RawConfigParser()
         properties_config.read(args.configFilePath)
@@ -34,6 +67,12 @@ def load_configs(args):
         rest_api_props = dict(properties_config.items('rest_api')) if properties_config.has_section('rest_api') else {}
         consumer_group_app_props = dict(properties_config.items('consumer_group_app')) \
             if properties_config.has_section('consumer_group_app') else {}
+        processing_props = dict(properties_config.items('processing')) if properties_config.has_section('processing') else {}
+
+    rest_api_threads = get_property(args.apiThreads, rest_api_props.get("threads"), "8", int)
+    io_workers = get_property(None, processing_props.get("io_workers"), "0", int)
+    cpu_workers = get_property(args.cpuWorkers, processing_props.get("cpu_workers"), "0", int)
+    default_max_pending_batches = get_default_max_pending_batches(cpu_workers, io_workers, rest_api_threads)
 
     configs: Configs = Configs(
         redis_host=get_property(args.redisServerHost, redis_props.get("host"), "localhost", str),
@@ -41,9 +80,37 @@ def load_configs(args):
 
         rest_api_host=get_property(args.restApiHost, rest_api_props.get("host"), "127.0.0.1", str),
         rest_api_port=get_property(args.restApiPort, rest_api_props.get("port"), "5001", int),
+        serving_mode=get_property(args.servingMode, rest_api_props.get("serving_mode"), "development", str),
+        rest_api_workers=get_property(args.apiWorkers, rest_api_props.get("workers"), "2", int),
+        rest_api_threads=rest_api_threads,
+        rest_api_drain_timeout_seconds=get_property(None, rest_api_props.get("drain_timeout_seconds"), "10", int),
 
         consumer_group_app_host=get_property(args.consumerGroupAppHost, consumer_group_app_props.get("host"), "127.0.0.1", str),
         consumer_group_app_port=get_property(args.consumerGroupAppPort, consumer_group_app_props.get("port"), "5000", int),
+        consumer_group_app_timeout_ms=get_property(None, consumer_group_app_props.get("timeout_ms"), "5000", int),
+        heartbeat_interval_ms=get_property(args.heartbeatIntervalMs, consumer_group_app_props.get("heartbeat_interval_ms"), "3000", int),
+
+        write_batch_size=get_property(args.writeBatchSize, processing_props.get("write_batch_size"), "100", int),
+        write_flush_interval_ms=get_property(args.writeFlushIntervalMs, processing_props.get("write_flush_interval_ms"), "10", int),
+        durability_mode=get_property(args.durabilityMode, processing_props.get("durability_mode"), "sync", str),
+        write_max_queued_batches=get_property(None, processing_props.get("write_max_queued_batches"), "100", int),
+        write_timeout_ms=get_property(None, processing_props.get("write_timeout_ms"), "5000", int),
+
+        pipeline_mode=get_property(args.pipelineMode, processing_props.get("pipeline_mode"), "push", str),
+        pull_batch_size=get_property(args.pullBatchSize, processing_props.get("pull_batch_size"), "100", int),
+        pull_block_ms=get_property(None, processing_props.get("pull_block_ms"), "1000", int),
+        pull_claim_min_idle_ms=get_property(None, processing_props.get("pull_claim_min_idle_ms"), "30000", int),
+
+        dedup_enabled=get_property(args.dedupEnabled, processing_props.get("dedup_enabled"), "false", str).lower() == "true",
+        dedup_ttl_in_seconds=get_property(None, processing_props.get("dedup_ttl_seconds"), "3600", int),
+        dedup_local_cache_size=get_property(None, processing_props.get("dedup_local_cache_size"), "100000", int),
+        processing_stages=[registration.strip() for registration
+                           in get_property(args.processingStages, processing_props.get("stages"), "", str).split(",")
+                           if registration.strip()],
+        io_workers=io_workers,
+        cpu_workers=cpu_workers,
+        max_pending_batches=get_property(args.maxPendingBatches, processing_props.get("max_pending_batches"),
+                                         str(default_max_pending_batches), int),
     )
 
     return configs
\ No newline at end of file
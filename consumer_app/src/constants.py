@@ -1 +1,10 @@
-CONSUMER_CONTEXT_KEY = "consumer"
\ No newline at end of file
+CONSUMER_CONTEXT_KEY = "consumer"
+
+PIPELINE_MODE_PUSH = "push"
+PIPELINE_MODE_PULL = "pull"
+PIPELINE_MODES = [PIPELINE_MODE_PUSH, PIPELINE_MODE_PULL]
+
+SERVING_MODE_DEVELOPMENT = "development"
+SERVING_MODE_WAITRESS = "waitress"
+SERVING_MODE_GUNICORN = "gunicorn"
+SERVING_MODES = [SERVING_MODE_DEVELOPMENT, SERVING_MODE_WAITRESS, SERVING_MODE_GUNICORN]
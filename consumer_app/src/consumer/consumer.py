@@ -1,13 +1,27 @@
+import functools
 import logging
 import redis
 
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List
+from consumer.processed_messages_writer import ProcessedMessagesWriter
+from consumer.messages_deduplicator import MessagesDeduplicator
+from consumer.processing_pipeline import MessageBatch, ProcessingPipeline, register_stages
+from consumer.processing_executor import ProcessingExecutor
+from metrics.metrics import REGISTRY
+
+MESSAGES_PROCESSED = REGISTRY.counter("messages_processed_total", "Messages processed by the consumer.")
+MESSAGES_FAILED = REGISTRY.counter("messages_failed_total", "Messages failed to be processed by the consumer.")
+PROCESSING_LATENCY = REGISTRY.histogram("processing_latency_seconds", "Latency of processing a batch of messages.")
 
 class Consumer:
     MSGS_STREAM_NAME = "messages:processed"
 
-    def __init__(self, redis_host: str, redis_port: int, service_host: str, service_port: int):
+    def __init__(self, redis_host: str, redis_port: int, service_host: str, service_port: int,
+                 write_batch_size: int, write_flush_interval_ms: int, durability_mode: str,
+                 dedup_enabled: bool = False, dedup_ttl_in_seconds: int = 3600, dedup_local_cache_size: int = 100000,
+                 processing_stages: List[str] = (), io_workers: int = 0, cpu_workers: int = 0,
+                 max_pending_batches: int = 0, write_max_queued_batches: int = 100, write_timeout_ms: int = 5000):
         try:
             self.id = f"{service_host}:{service_port}"
             self.redis_con_pool = redis.ConnectionPool(host=redis_host, port=redis_port)
@@ -15,13 +29,78 @@ class Consumer:
             logging.error("Failed to connect to Redis server")
             raise RuntimeError(ex)
 
-    def process_msg(self, msg: Dict[str, str]) -> Dict[str, str]:
+        self.deduplicator = MessagesDeduplicator(redis_con_pool=self.redis_con_pool,
+                                                 ttl_in_seconds=dedup_ttl_in_seconds,
+                                                 local_cache_size=dedup_local_cache_size) if dedup_enabled else None
+        self.writer = ProcessedMessagesWriter(redis_con_pool=self.redis_con_pool,
+                                              stream_name=Consumer.MSGS_STREAM_NAME,
+                                              batch_size=write_batch_size,
+                                              flush_interval_ms=write_flush_interval_ms,
+                                              durability_mode=durability_mode,
+                                              deduplicator=self.deduplicator,
+                                              max_queued_batches=write_max_queued_batches,
+                                              write_timeout_ms=write_timeout_ms)
+        self.executor = ProcessingExecutor(create_pipeline=functools.partial(create_pipeline, self.id,
+                                                                             tuple(processing_stages)),
+                                           io_workers=io_workers, cpu_workers=cpu_workers,
+                                           max_pending_batches=max_pending_batches)
+
+    def process_msg(self, msg: Dict[str, str]) -> None:
         logging.info(f"Processing msg with id {msg.get('message_id')}")
-        with redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
-            enriched_msg = {
-                            "subscriber_id": self.id,
-                            "message_id": msg.get("message_id"),
-                            "processing_time": datetime.now().strftime(format="%y-%m-%d'T'%H:%M:%S")
-                        }
-            connection.xadd(Consumer.MSGS_STREAM_NAME, enriched_msg)
+        if not self.executor.submit(self._process, [msg])[0]:
+            raise Exception(f"Failed to save processed msg with id {msg.get('message_id')}")
+
+    # the batches rejected by the executor raise ProcessingOverloadedError or ProcessingStoppedError,
+    # so that they can be sent to another consumer
+    def process_msgs(self, msgs: List[Dict[str, str]]) -> List[bool]:
+        logging.info(f"Processing batch of {len(msgs)} messages")
+        return self.executor.submit(self._process_safely, msgs)
+
+    def _process_safely(self, msgs: List[Dict[str, str]]) -> List[bool]:
+        try:
+            return self._process(msgs)
+        except Exception as ex:
+            logging.error(f"Failed to process batch of {len(msgs)} messages")
+            logging.exception(ex)
+            MESSAGES_FAILED.inc(len(msgs))
+            return [False] * len(msgs)
+
+    def _process(self, msgs: List[Dict[str, str]]) -> List[bool]:
+        with PROCESSING_LATENCY.time():
+            results = self._process_batch(msgs)
+        processed_count = results.count(True)
+        MESSAGES_PROCESSED.inc(processed_count)
+        MESSAGES_FAILED.inc(len(results) - processed_count)
+        return results
+
+    def _process_batch(self, msgs: List[Dict[str, str]]) -> List[bool]:
+        # the messages found in the local dedup cache are already processed - they are skipped
+        results = [True] * len(msgs)
+        new_msgs_indexes = [index for index, msg in enumerate(msgs)
+                            if not (self.deduplicator and self.deduplicator.is_duplicate(msg.get("message_id")))]
+        if len(new_msgs_indexes) < len(msgs):
+            logging.info(f"Skipping {len(msgs) - len(new_msgs_indexes)} already processed messages")
+
+        # the messages left out by the filters of the pipeline are reported as processed
+        entries, kept_indexes = self.executor.run_pipeline([msgs[index] for index in new_msgs_indexes])
+        written = self.writer.write(entries)
+        for kept_index, is_written in zip(kept_indexes, written):
+            results[new_msgs_indexes[kept_index]] = is_written
+        return results
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.writer.close()
+
+# the saved entries contain the message id, the id of the consumer and the processing time,
+# followed by the fields added by the registered stages
+def create_pipeline(consumer_id: str, processing_stages: List[str]) -> ProcessingPipeline:
+    pipeline = ProcessingPipeline(output_fields=["subscriber_id", "message_id", "processing_time"])
+    pipeline.add_enricher("subscriber_id", lambda batch: consumer_id)
+    pipeline.add_enricher("processing_time", get_processing_time)
+    register_stages(pipeline, processing_stages)
+    return pipeline
 
+# the time is computed once for the whole batch
+def get_processing_time(batch: MessageBatch) -> str:
+    return datetime.now().strftime(format="%y-%m-%d'T'%H:%M:%S")
@@ -3,22 +3,26 @@ import time
 
 from consumer_group.consumer_group_client import ConsumerGroupClient
 
-# TODO move to config.properties
-CHECK_INTERVAL_IN_MINUTES = 5
+DEFAULT_HEARTBEAT_INTERVAL_MS = 3000
 
+# Keeps the consumer registered in the consumer group - it renews the membership lease with a heartbeat
+# each heartbeat_interval_ms (should be a fraction of the lease TTL of the Consumer Group Application)
+# and registers the consumer again once it is not a member, e.g. after its lease expired.
 class ConsumerRegistrationMonitor:
-    def __init__(self, group_app_host: str, group_app_port: int, consumer_id: str):
-        self.group_app_client = ConsumerGroupClient(group_app_host, group_app_port)
+    def __init__(self, group_app_client: ConsumerGroupClient, consumer_id: str,
+                 heartbeat_interval_ms: int = DEFAULT_HEARTBEAT_INTERVAL_MS):
+        self.group_app_client = group_app_client
         self.consumer_id = consumer_id
+        self.heartbeat_interval_in_seconds = heartbeat_interval_ms / 1000
 
     def run_monitoring(self):
         while True:
             try:
-                if not self.group_app_client.check_membership(self.consumer_id):
+                if not self.group_app_client.heartbeat(self.consumer_id):
                     self.group_app_client.register(self.consumer_id)
             except Exception as ex:
-                error_msg = f"Exception raised in registration monitoring flow. Will try again in {CHECK_INTERVAL_IN_MINUTES} minutes"
+                error_msg = f"Exception raised in registration monitoring flow. Will try again in {self.heartbeat_interval_in_seconds} seconds"
                 logging.error(error_msg)
                 logging.exception(ex)
 
-            time.sleep(CHECK_INTERVAL_IN_MINUTES * 60)
+            time.sleep(self.heartbeat_interval_in_seconds)
@@ -0,0 +1,81 @@
+import threading
+import time
+import redis
+
+from collections import OrderedDict
+from typing import Dict, List
+from metrics.metrics import REGISTRY
+
+# Atomically adds the entry to the stream and marks the message id as processed, only when the
+# message id is not marked already. Returns the id of the added entry or nil for duplicates.
+# Redis doesn't roll back the writes of a failed script, so the message id is marked only after XADD succeeded -
+# otherwise the message would be skipped as a duplicate by its retries without being saved.
+# KEYS[1] - dedup key of the message, KEYS[2] - stream name
+# ARGV[1] - dedup key expiration in seconds, ARGV[2..] - entry fields and values
+DEDUP_XADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return false
+end
+local entry_id = redis.pcall('XADD', KEYS[2], '*', unpack(ARGV, 2))
+if type(entry_id) == 'table' and entry_id.err then
+    return entry_id
+end
+redis.call('SET', KEYS[1], '1', 'EX', ARGV[1])
+return entry_id
+"""
+
+# Skips the messages that were already processed (by this or by another consumer).
+# The recently processed message ids are kept in a bounded local cache, so most of the duplicates are
+# skipped without calling Redis; the other ones are detected by the dedup script executed on Redis.
+class MessagesDeduplicator:
+    DEDUP_KEY_PREFIX = "messages:processed:dedup:"
+
+    def __init__(self, redis_con_pool: redis.ConnectionPool, ttl_in_seconds: int, local_cache_size: int):
+        self.ttl_in_seconds = ttl_in_seconds
+        self.local_cache_size = local_cache_size
+        self._lock = threading.Lock()
+        self._local_cache: OrderedDict = OrderedDict()
+        with redis.Redis(connection_pool=redis_con_pool) as connection:
+            self._dedup_xadd_script = connection.register_script(DEDUP_XADD_SCRIPT)
+
+        self.checked = REGISTRY.counter("dedup_checked_total", "Messages checked for duplicates.")
+        self.local_hits = REGISTRY.counter("dedup_local_hits_total", "Duplicates found in the local cache.")
+        self.redis_hits = REGISTRY.counter("dedup_redis_hits_total", "Duplicates found by the Redis dedup script.")
+        REGISTRY.gauge("dedup_hit_rate", "Part of the checked messages that were duplicates.", function=self.get_hit_rate)
+
+    def is_duplicate(self, message_id: str) -> bool:
+        self.checked.inc()
+        with self._lock:
+            expiration_time = self._local_cache.get(message_id)
+            if expiration_time is None:
+                return False
+            if expiration_time < time.monotonic():
+                del self._local_cache[message_id]
+                return False
+            self._local_cache.move_to_end(message_id)
+        self.local_hits.inc()
+        return True
+
+    def add_xadd(self, pipeline: redis.client.Pipeline, stream_name: str, entry: Dict[str, str]) -> None:
+        args = [self.ttl_in_seconds]
+        for field, value in entry.items():
+            args.extend([field, value])
+        self._dedup_xadd_script(keys=[f"{MessagesDeduplicator.DEDUP_KEY_PREFIX}{entry['message_id']}", stream_name],
+                                args=args, client=pipeline)
+
+    def on_written(self, entries: List[Dict[str, str]], responses: List) -> None:
+        expiration_time = time.monotonic() + self.ttl_in_seconds
+        with self._lock:
+            for entry, response in zip(entries, responses):
+                if isinstance(response, Exception):
+                    continue
+                if response is None:
+                    self.redis_hits.inc()
+                self._local_cache[entry["message_id"]] = expiration_time
+                self._local_cache.move_to_end(entry["message_id"])
+            while len(self._local_cache) > self.local_cache_size:
+                self._local_cache.popitem(last=False)
+
+    def get_hit_rate(self) -> float:
+        checked_count = self.checked.value()
+        return (self.local_hits.value() + self.redis_hits.value()) / checked_count if checked_count else 0.0
@@ -0,0 +1,135 @@
+import logging
+import time
+import redis
+
+from typing import Dict, List, Tuple
+from codec import json_codec
+from consumer.consumer import Consumer
+from consumer.processing_executor import ProcessingOverloadedError, ProcessingStoppedError
+from metrics.metrics import redis_command_latency
+
+# Pulls the messages appended by the Consumer Group Application to the pending messages stream.
+# All consumers read through the same Redis stream consumer group, so each entry is delivered to only one of them.
+# An entry is acknowledged after it is processed, the entries that stay unacknowledged longer than
+# claim_min_idle_ms (e.g. the consumer died while processing them) are claimed by the other consumers.
+# An entry that isn't a json object with a message_id is moved to the dead letter stream, so that it isn't claimed again and again.
+# While the consumer is overloaded the pulling is paused for a while, the rejected entries stay unacknowledged
+# and are claimed again once they are idle. The pulling is stopped when the consumer is stopping.
+class MessagesStreamPuller:
+    MSGS_STREAM_NAME = "messages:pending"
+    STREAM_GROUP_NAME = "consumers"
+    DEAD_LETTER_STREAM_NAME = "messages:deadletter"
+    DEAD_LETTER_STREAM_MAX_LENGTH = 100000
+    CLAIM_INTERVAL_IN_SECONDS = 5
+    OVERLOADED_BACKOFF_IN_SECONDS = 0.1
+
+    def __init__(self, consumer: Consumer, batch_size: int, block_ms: int, claim_min_idle_ms: int):
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_min_idle_ms = claim_min_idle_ms
+        self._next_claim_time = 0
+
+    def run_pulling(self) -> None:
+        logging.info("Starting pending messages puller...")
+        while True:
+            try:
+                self._create_stream_group()
+                while True:
+                    if time.monotonic() >= self._next_claim_time:
+                        self._claim_idle_entries()
+                        self._next_claim_time = time.monotonic() + MessagesStreamPuller.CLAIM_INTERVAL_IN_SECONDS
+
+                    with redis.Redis(connection_pool=self.consumer.redis_con_pool) as connection:
+                        response = connection.xreadgroup(groupname=MessagesStreamPuller.STREAM_GROUP_NAME,
+                                                         consumername=self.consumer.id,
+                                                         streams={MessagesStreamPuller.MSGS_STREAM_NAME: ">"},
+                                                         count=self.batch_size,
+                                                         block=self.block_ms)
+                    for _, entries in response:
+                        self._process_entries(entries)
+            except ProcessingOverloadedError as ex:
+                logging.info(f"Consumer is overloaded, pulling of pending messages is paused. {ex}")
+                time.sleep(MessagesStreamPuller.OVERLOADED_BACKOFF_IN_SECONDS)
+            except ProcessingStoppedError:
+                logging.info("Consumer is stopping, pulling of pending messages is stopped.")
+                return
+            except Exception as ex:
+                logging.error(f"Pulling of pending messages encountered a failure. Will try again in 5 seconds")
+                logging.exception(ex)
+                time.sleep(5)
+
+    def _create_stream_group(self) -> None:
+        with redis.Redis(connection_pool=self.consumer.redis_con_pool) as connection:
+            try:
+                connection.xgroup_create(name=MessagesStreamPuller.MSGS_STREAM_NAME,
+                                         groupname=MessagesStreamPuller.STREAM_GROUP_NAME,
+                                         id="0", mkstream=True)
+            except redis.ResponseError as ex:
+                # the group is already created by another consumer
+                if "BUSYGROUP" not in str(ex):
+                    raise
+
+    def _claim_idle_entries(self) -> None:
+        start_id = "0-0"
+        while True:
+            with redis_command_latency("xautoclaim").time(), \
+                redis.Redis(connection_pool=self.consumer.redis_con_pool) as connection:
+                response = connection.xautoclaim(name=MessagesStreamPuller.MSGS_STREAM_NAME,
+                                                 groupname=MessagesStreamPuller.STREAM_GROUP_NAME,
+                                                 consumername=self.consumer.id,
+                                                 min_idle_time=self.claim_min_idle_ms,
+                                                 start_id=start_id,
+                                                 count=self.batch_size)
+            start_id, entries = response[0], response[1]
+            if entries:
+                logging.info(f"Claimed {len(entries)} idle pending messages")
+                self._process_entries(entries)
+            if start_id in (b"0-0", "0-0"):
+                return
+
+    def _process_entries(self, entries: List[Tuple[bytes, Dict[bytes, bytes]]]) -> None:
+        entries_ids = []
+        msgs = []
+        for entry_id, fields in entries:
+            # entries deleted from the stream before being claimed are returned without fields
+            if not fields:
+                continue
+            try:
+                msg = json_codec.decode_message(fields[b"data"])
+                if "message_id" not in msg:
+                    raise ValueError("Message has no message_id field.")
+                msgs.append(msg)
+            except Exception as ex:
+                logging.error(f"Invalid pending message {entry_id}: {fields}. {ex}")
+                self._dead_letter_entry(entry_id, fields, str(ex))
+                continue
+            entries_ids.append(entry_id)
+
+        if not msgs:
+            return
+        results = self.consumer.process_msgs(msgs)
+        processed_ids = [entry_id for entry_id, is_processed in zip(entries_ids, results) if is_processed]
+        if processed_ids:
+            with redis_command_latency("xack").time(), redis.Redis(connection_pool=self.consumer.redis_con_pool) as connection:
+                connection.xack(MessagesStreamPuller.MSGS_STREAM_NAME, MessagesStreamPuller.STREAM_GROUP_NAME,
+                                *processed_ids)
+        if len(processed_ids) < len(entries_ids):
+            logging.error(f"Failed to process {len(entries_ids) - len(processed_ids)} pending messages. "
+                          + "They will be claimed again once they are idle.")
+
+    # the entry is appended to the dead letter stream and acknowledged in one transaction,
+    # if it fails the entry is claimed again once it is idle
+    def _dead_letter_entry(self, entry_id: bytes, fields: Dict[bytes, bytes], reason: str) -> None:
+        try:
+            with redis.Redis(connection_pool=self.consumer.redis_con_pool) as connection:
+                pipeline = connection.pipeline(transaction=True)
+                pipeline.xadd(MessagesStreamPuller.DEAD_LETTER_STREAM_NAME,
+                              {"data": fields.get(b"data", b""), "error": reason, "attempts": 0},
+                              maxlen=MessagesStreamPuller.DEAD_LETTER_STREAM_MAX_LENGTH, approximate=True)
+                pipeline.xack(MessagesStreamPuller.MSGS_STREAM_NAME, MessagesStreamPuller.STREAM_GROUP_NAME, entry_id)
+                with redis_command_latency("xack").time():
+                    pipeline.execute()
+        except Exception as ex:
+            logging.error(f"Failed to move pending message {entry_id} to the dead letter stream")
+            logging.exception(ex)
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+import redis
+
+from typing import Dict, List
+from consumer.messages_deduplicator import MessagesDeduplicator
+from metrics.metrics import REGISTRY, redis_command_latency
+
+DURABILITY_MODE_SYNC = "sync"
+DURABILITY_MODE_ASYNC = "async"
+DURABILITY_MODES = [DURABILITY_MODE_SYNC, DURABILITY_MODE_ASYNC]
+
+class _PendingBatch:
+    def __init__(self):
+        self.entries: List[Dict[str, str]] = []
+        self.results: List[bool] = []
+        self.flushed = threading.Event()
+
+# Write-behind buffer for the processed messages stream.
+# Entries are collected and added to the stream with one pipelined batch of XADD commands once the
+# batch is full or once the flush interval is elapsed.
+# At most max_queued_batches full batches wait to be flushed - the writers are blocked until the flusher takes them.
+# In "sync" durability mode the writers wait until their entries are flushed and receive the XADD results.
+# An entry not flushed within write_timeout_ms is reported as not saved (it may still be saved later).
+# In "async" durability mode the writers return immediately - the entries that can be lost on a crash
+# are the ones not flushed yet (at most max_queued_batches + 1 batches besides the batches being flushed).
+class ProcessedMessagesWriter:
+    def __init__(self, redis_con_pool: redis.ConnectionPool, stream_name: str, batch_size: int,
+                 flush_interval_ms: int, durability_mode: str, deduplicator: MessagesDeduplicator = None,
+                 max_queued_batches: int = 100, write_timeout_ms: int = 5000):
+        if durability_mode not in DURABILITY_MODES:
+            raise ValueError(f"Unsupported durability mode {durability_mode}. Supported modes: {DURABILITY_MODES}")
+
+        self.redis_con_pool = redis_con_pool
+        self.stream_name = stream_name
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval_in_seconds = flush_interval_ms / 1000
+        self.durability_mode = durability_mode
+        self.deduplicator = deduplicator
+        self.max_queued_batches = max(max_queued_batches, 1)
+        self.write_timeout_in_seconds = write_timeout_ms / 1000
+        self._condition = threading.Condition()
+        self._current_batch = _PendingBatch()
+        self._current_batch_deadline = None
+        self._full_batches: List[_PendingBatch] = []
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.xadd_latency = redis_command_latency("xadd")
+        self.entries_written = REGISTRY.counter("stream_entries_written_total", "Entries saved in the processed messages stream.")
+        REGISTRY.gauge("write_buffer_pending", "Entries waiting to be saved in the processed messages stream.",
+                       function=self.pending_count)
+
+    def write(self, entries: List[Dict[str, str]]) -> List[bool]:
+        # batch and position in the batch for each of the written entries
+        positions = []
+        with self._condition:
+            for entry in entries:
+                # the writers wait on the same condition as the flusher, so all of them are notified
+                while len(self._full_batches) >= self.max_queued_batches and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    raise RuntimeError("Processed messages writer is closed.")
+                batch = self._current_batch
+                if not batch.entries:
+                    self._current_batch_deadline = time.monotonic() + self.flush_interval_in_seconds
+                    self._condition.notify_all()
+                positions.append((batch, len(batch.entries)))
+                batch.entries.append(entry)
+                if len(batch.entries) >= self.batch_size:
+                    self._full_batches.append(batch)
+                    self._current_batch = _PendingBatch()
+                    self._current_batch_deadline = None
+                    self._condition.notify_all()
+
+        if self.durability_mode == DURABILITY_MODE_ASYNC:
+            return [True] * len(entries)
+
+        results = []
+        timed_out_count = 0
+        deadline = time.monotonic() + self.write_timeout_in_seconds
+        for batch, index in positions:
+            if batch.flushed.wait(timeout=max(deadline - time.monotonic(), 0)):
+                results.append(batch.results[index])
+            else:
+                timed_out_count += 1
+                results.append(False)
+        if timed_out_count:
+            logging.error(f"{timed_out_count} entries were not saved to stream {self.stream_name} "
+                          + f"within {self.write_timeout_in_seconds * 1000:.0f} ms")
+        return results
+
+    def pending_count(self) -> int:
+        return len(self._current_batch.entries) + sum(len(batch.entries) for batch in list(self._full_batches))
+
+    def run_flushing(self) -> None:
+        logging.info("Starting processed messages writer...")
+        while True:
+            with self._condition:
+                while not self._has_ready_batches():
+                    if self._closed:
+                        return
+                    timeout = None if self._current_batch_deadline is None \
+                        else self._current_batch_deadline - time.monotonic()
+                    self._condition.wait(timeout=timeout)
+                ready_batches = self._pop_ready_batches()
+                # the writers blocked by the full queue can continue
+                self._condition.notify_all()
+            self._flush(ready_batches)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            ready_batches = self._full_batches + [self._current_batch]
+            self._full_batches = []
+            self._current_batch = _PendingBatch()
+            self._current_batch_deadline = None
+            self._condition.notify_all()
+        self._flush(ready_batches)
+
+    def _has_ready_batches(self) -> bool:
+        if self._full_batches:
+            return True
+        return self._current_batch_deadline is not None and self._current_batch_deadline <= time.monotonic()
+
+    def _pop_ready_batches(self) -> List[_PendingBatch]:
+        ready_batches = self._full_batches
+        self._full_batches = []
+        if self._current_batch_deadline is not None and self._current_batch_deadline <= time.monotonic():
+            ready_batches.append(self._current_batch)
+            self._current_batch = _PendingBatch()
+            self._current_batch_deadline = None
+        return ready_batches
+
+    def _flush(self, batches: List[_PendingBatch]) -> None:
+        # the flushes are serialized so that the entries keep their order in the stream
+        with self._flush_lock:
+            for batch in batches:
+                if not batch.entries:
+                    batch.flushed.set()
+                    continue
+                try:
+                    with self.xadd_latency.time(), redis.Redis(connection_pool=self.redis_con_pool) as connection:
+                        pipeline = connection.pipeline(transaction=False)
+                        for entry in batch.entries:
+                            if self.deduplicator:
+                                self.deduplicator.add_xadd(pipeline, self.stream_name, entry)
+                            else:
+                                pipeline.xadd(self.stream_name, entry)
+                        responses = pipeline.execute(raise_on_error=False)
+                    # duplicates are not added to the stream, but they are reported as processed
+                    batch.results = [not isinstance(response, Exception) for response in responses]
+                    if self.deduplicator:
+                        self.deduplicator.on_written(batch.entries, responses)
+                    self.entries_written.inc(batch.results.count(True))
+                    logging.debug(f"Flushed {len(batch.entries)} entries to stream {self.stream_name}")
+                except Exception as ex:
+                    logging.error(f"Failed to flush {len(batch.entries)} entries to stream {self.stream_name}")
+                    logging.exception(ex)
+                    batch.results = [False] * len(batch.entries)
+                finally:
+                    batch.flushed.set()
+
+                failed_count = batch.results.count(False)
+                if failed_count and self.durability_mode == DURABILITY_MODE_ASYNC:
+                    logging.error(f"{failed_count} processed messages were not saved to stream {self.stream_name}")
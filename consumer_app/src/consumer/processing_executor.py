@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+import threading
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from consumer.processing_pipeline import ProcessingPipeline
+from metrics.metrics import REGISTRY
+
+BATCHES_REJECTED = REGISTRY.counter("batches_rejected_total",
+                                    "Batches rejected, because too many batches were being processed.")
+
+# the batch is rejected because the consumer already processes too many batches - it can be sent to another consumer
+class ProcessingOverloadedError(Exception):
+    pass
+
+# the batch is rejected because the consumer is stopping
+class ProcessingStoppedError(Exception):
+    pass
+
+# the pipeline of a process pool worker, created once when the worker is started
+_worker_pipeline: ProcessingPipeline = None
+
+def _init_worker(create_pipeline: Callable[[], ProcessingPipeline]) -> None:
+    global _worker_pipeline
+    _worker_pipeline = create_pipeline()
+
+def _process_in_worker(msgs: List[Dict]) -> Tuple[List[Dict], List[int]]:
+    return _worker_pipeline.process(msgs)
+
+# Runs the processing of the message batches:
+# - at most max_pending_batches batches are processed or wait to be processed at the same time (0 - no limit),
+#   the batches above it are rejected at once, instead of making the requests wait longer and longer
+# - with io_workers > 0 the batches are processed (deduplicated and saved) by a pool of that many threads
+# - with cpu_workers > 0 the stages of the processing pipeline run in a pool of that many processes, so that
+#   CPU-heavy stages are not serialized on the GIL of the application process. The pipeline is created
+#   by create_pipeline in each worker process, and the messages and entries are pickled to and from the workers.
+class ProcessingExecutor:
+
+    def __init__(self, create_pipeline: Callable[[], ProcessingPipeline], io_workers: int = 0, cpu_workers: int = 0,
+                 max_pending_batches: int = 0):
+        self.max_pending_batches = max_pending_batches
+        self._pending_count = 0
+        self._pending_lock = threading.Lock()
+        self._stopped = False
+        self._pipeline = create_pipeline() if cpu_workers <= 0 else None
+        self._thread_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="ProcessingIO") \
+            if io_workers > 0 else None
+        # the workers are started with a fresh interpreter, as the application process already runs threads
+        self._process_pool = ProcessPoolExecutor(max_workers=cpu_workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker, initargs=(create_pipeline,)) \
+            if cpu_workers > 0 else None
+
+    # processes the batch with process_batch, in the thread pool if there is one,
+    # raises ProcessingOverloadedError or ProcessingStoppedError when the batch is not accepted
+    def submit(self, process_batch: Callable[[List[Dict]], List[bool]], msgs: List[Dict]) -> List[bool]:
+        with self._pending_lock:
+            if self._stopped:
+                raise ProcessingStoppedError("The consumer is stopping.")
+            if 0 < self.max_pending_batches <= self._pending_count:
+                BATCHES_REJECTED.inc()
+                raise ProcessingOverloadedError(f"The consumer is processing {self._pending_count} batches.")
+            self._pending_count += 1
+        try:
+            if self._thread_pool is not None:
+                return self._thread_pool.submit(process_batch, msgs).result()
+            return process_batch(msgs)
+        finally:
+            with self._pending_lock:
+                self._pending_count -= 1
+
+    # runs the processing pipeline on the messages, in the process pool if there is one
+    def run_pipeline(self, msgs: List[Dict]) -> Tuple[List[Dict], List[int]]:
+        if self._process_pool is not None:
+            return self._process_pool.submit(_process_in_worker, msgs).result()
+        return self._pipeline.process(msgs)
+
+    def pending_count(self) -> int:
+        return self._pending_count
+
+    # the new batches are rejected, the pending ones are completed
+    def shutdown(self) -> None:
+        with self._pending_lock:
+            self._stopped = True
+        logging.info("Waiting for the batches being processed...")
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True)
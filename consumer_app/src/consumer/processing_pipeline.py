@@ -0,0 +1,129 @@
+import importlib
+import logging
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Tuple
+
+# A batch of messages kept as columns - the list of values of a field for all messages, created from the messages
+# once a stage uses the field, or a single value shared by all messages of the batch (e.g. the processing time).
+# The stages work on whole columns, so the cost per message doesn't grow with each enrichment.
+class MessageBatch:
+
+    def __init__(self, msgs: List[Dict]):
+        self.msgs = msgs
+        # positions of the messages of the batch in the processed messages list, left after the filters
+        self.indexes = list(range(len(msgs)))
+        self._columns: Dict[str, List] = {}
+        self._constants: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def column(self, field: str) -> List:
+        if field in self._constants:
+            return [self._constants[field]] * len(self.indexes)
+        if field not in self._columns:
+            self._columns[field] = [msg.get(field) for msg in self.msgs]
+        return self._columns[field]
+
+    def set_column(self, field: str, values: List) -> None:
+        if len(values) != len(self.indexes):
+            raise ValueError(f"Column {field} has {len(values)} values, expected {len(self.indexes)}.")
+        self._constants.pop(field, None)
+        self._columns[field] = values
+
+    def set_constant(self, field: str, value: Any) -> None:
+        self._columns.pop(field, None)
+        self._constants[field] = value
+
+    def keep(self, mask: List[bool]) -> None:
+        self.msgs = [msg for msg, is_kept in zip(self.msgs, mask) if is_kept]
+        self.indexes = [index for index, is_kept in zip(self.indexes, mask) if is_kept]
+        self._columns = {field: [value for value, is_kept in zip(values, mask) if is_kept]
+                         for field, values in self._columns.items()}
+
+    # the rows of the output fields, fields without value are left out
+    def to_entries(self, fields: List[str]) -> List[Dict]:
+        columns = [(field, self.column(field)) for field in fields]
+        return [{field: values[row] for field, values in columns if values[row] is not None}
+                for row in range(len(self.indexes))]
+
+# A processing stage gets the whole batch and changes its columns or filters its messages.
+class ProcessingStage(ABC):
+    @abstractmethod
+    def process(self, batch: MessageBatch) -> None:
+        pass
+
+# sets target_field (the field itself by default) to function applied to the column of field
+class TransformStage(ProcessingStage):
+    def __init__(self, field: str, function: Callable[[List], List], target_field: str = None):
+        self.field = field
+        self.function = function
+        self.target_field = target_field or field
+
+    def process(self, batch: MessageBatch) -> None:
+        batch.set_column(self.target_field, self.function(batch.column(self.field)))
+
+# sets field to the value computed once for the batch - a list with a value for each message
+# or a single value shared by all messages
+class EnricherStage(ProcessingStage):
+    def __init__(self, field: str, compute: Callable[[MessageBatch], Any]):
+        self.field = field
+        self.compute = compute
+
+    def process(self, batch: MessageBatch) -> None:
+        value = self.compute(batch)
+        if isinstance(value, list):
+            batch.set_column(self.field, value)
+        else:
+            batch.set_constant(self.field, value)
+
+# keeps the messages for which predicate returned True - the filtered out messages are reported as processed,
+# but they are not saved
+class FilterStage(ProcessingStage):
+    def __init__(self, predicate: Callable[[MessageBatch], List[bool]]):
+        self.predicate = predicate
+
+    def process(self, batch: MessageBatch) -> None:
+        batch.keep(self.predicate(batch))
+
+# Runs the registered stages in order on each batch of messages and returns the entries to be saved
+# with the output fields, together with the positions of their messages in the batch.
+class ProcessingPipeline:
+
+    def __init__(self, output_fields: List[str]):
+        self.output_fields = list(output_fields)
+        self.stages: List[ProcessingStage] = []
+
+    def add_stage(self, stage: ProcessingStage, output_field: str = None) -> None:
+        self.stages.append(stage)
+        if output_field and output_field not in self.output_fields:
+            self.output_fields.append(output_field)
+
+    def add_transform(self, field: str, function: Callable[[List], List], target_field: str = None) -> None:
+        stage = TransformStage(field, function, target_field)
+        self.add_stage(stage, stage.target_field)
+
+    def add_enricher(self, field: str, compute: Callable[[MessageBatch], Any]) -> None:
+        self.add_stage(EnricherStage(field, compute), field)
+
+    def add_filter(self, predicate: Callable[[MessageBatch], List[bool]]) -> None:
+        self.add_stage(FilterStage(predicate))
+
+    def process(self, msgs: List[Dict]) -> Tuple[List[Dict], List[int]]:
+        batch = MessageBatch(msgs)
+        for stage in self.stages:
+            if not batch:
+                break
+            stage.process(batch)
+        return batch.to_entries(self.output_fields), batch.indexes
+
+# Calls the functions registering additional stages of the pipeline, given as "<module>:<function>" import paths,
+# e.g. "my_stages:register" for def register(pipeline: ProcessingPipeline) in my_stages.py.
+def register_stages(pipeline: ProcessingPipeline, registrations: List[str]) -> None:
+    for registration in registrations:
+        module_name, _, function_name = registration.partition(":")
+        if not module_name or not function_name:
+            raise ValueError(f"Invalid processing stages registration {registration}, expected <module>:<function>")
+        logging.info(f"Registering processing stages with {registration}")
+        getattr(importlib.import_module(module_name), function_name)(pipeline)
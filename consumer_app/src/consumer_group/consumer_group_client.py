@@ -1,15 +1,20 @@
 import requests
 import logging
 
+DEFAULT_TIMEOUT_MS = 5000
+
 class ConsumerGroupClient:
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, timeout_ms: int = DEFAULT_TIMEOUT_MS):
         self.consumer_group_app_url = f"http://{host}:{port}"
+        self.timeout = timeout_ms / 1000
+        # the session keeps the connection to the consumer group app alive between the requests
+        self.session = requests.Session()
+        self.session.headers.update({ "Content-Type": "application/json" })
 
     def register(self, id: str) -> None:
         url = f"{self.consumer_group_app_url}/register"
         payload = { "consumer_id": id }
-        headers = { "Content-Type": "application/json" }
-        response = requests.post(url, headers=headers, json=payload)
+        response = self.session.post(url, json=payload, timeout=self.timeout)
         if response.status_code == 200:
             logging.info("Successfully registered to consumers group.")
         else:
@@ -20,8 +25,7 @@ class ConsumerGroupClient:
     def unregister(self, id: str) -> None:
         url = f"{self.consumer_group_app_url}/unregister"
         payload = { "consumer_id": id }
-        headers = { "Content-Type": "application/json" }
-        response = requests.post(url, headers=headers, json=payload)
+        response = self.session.post(url, json=payload, timeout=self.timeout)
         if response.status_code == 200:
             logging.info("Successfully unregistered from consumers group.")
         else:
@@ -29,14 +33,31 @@ class ConsumerGroupClient:
                         + f"Response content: {response.content}"
             raise Exception(error_msg)
 
+    # renews the membership lease, returns False when the consumer is not a member of the group (anymore)
+    def heartbeat(self, id: str) -> bool:
+        url = f"{self.consumer_group_app_url}/heartbeat"
+        payload = { "consumer_id": id }
+        response = self.session.post(url, json=payload, timeout=self.timeout)
+        if response.status_code == 200:
+            return True
+        elif response.status_code == 404:
+            logging.info("Consumer is not found in consumer group.")
+            return False
+        else:
+            error_msg = f"Failed to send heartbeat to consumers group. Status Code: {response.status_code}; " \
+                        + f"Response content: {response.content}"
+            raise Exception(error_msg)
+
     def check_membership(self, id: str) -> bool:
         url = f"{self.consumer_group_app_url}/checkMembership"
         payload = { "consumer_id": id }
-        headers = { "Content-Type": "application/json" }
-        response = requests.post(url, headers=headers, json=payload)
+        response = self.session.post(url, json=payload, timeout=self.timeout)
         if response.status_code == 200:
             logging.info("Consumer is already registered to consumer group.")
             return True
         else:
             logging.info("Consumer is not found in consumer group.")
-            return False
\ No newline at end of file
+            return False
+
+    def close(self) -> None:
+        self.session.close()
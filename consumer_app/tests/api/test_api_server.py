@@ -0,0 +1,52 @@
+import sys
+import pytest
+
+from types import ModuleType
+from unittest.mock import MagicMock, patch
+from api.api_server import serve_with_gunicorn
+
+# gunicorn application running the hooks and loading the app in place of the worker processes
+class FakeBaseApplication:
+    def __init__(self):
+        self.cfg = MagicMock()
+        self.settings = {}
+        self.cfg.set.side_effect = self.settings.__setitem__
+        self.load_config()
+
+    def run(self):
+        FakeBaseApplication.loaded_app = self.load()
+        self.settings["worker_exit"](MagicMock(), MagicMock())
+        self.settings["on_exit"](MagicMock())
+        FakeBaseApplication.settings = self.settings
+
+@pytest.fixture
+def gunicorn_modules():
+    base_module = ModuleType("gunicorn.app.base")
+    base_module.BaseApplication = FakeBaseApplication
+    modules = {"gunicorn": ModuleType("gunicorn"), "gunicorn.app": ModuleType("gunicorn.app"),
+               "gunicorn.app.base": base_module}
+    with patch.dict(sys.modules, modules):
+        yield
+
+def test_serve_with_gunicorn_runs_hooks(gunicorn_modules):
+    flask_app = MagicMock()
+    on_worker_exit = MagicMock()
+    on_exit = MagicMock()
+
+    serve_with_gunicorn(host="127.0.0.1", port=5001, workers=2, threads=4, drain_timeout_seconds=10,
+                        create_app=lambda: flask_app, on_worker_exit=on_worker_exit, on_exit=on_exit)
+
+    assert FakeBaseApplication.loaded_app is flask_app
+    assert FakeBaseApplication.settings["bind"] == "127.0.0.1:5001"
+    assert FakeBaseApplication.settings["workers"] == 2
+    assert FakeBaseApplication.settings["threads"] == 4
+    assert FakeBaseApplication.settings["worker_class"] == "gthread"
+    assert FakeBaseApplication.settings["graceful_timeout"] == 10
+    on_worker_exit.assert_called_once()
+    on_exit.assert_called_once()
+
+def test_serve_with_gunicorn_requires_gunicorn():
+    with patch.dict(sys.modules, {"gunicorn": None, "gunicorn.app": None, "gunicorn.app.base": None}):
+        with pytest.raises(RuntimeError):
+            serve_with_gunicorn(host="127.0.0.1", port=5001, workers=2, threads=4, drain_timeout_seconds=10,
+                                create_app=MagicMock(), on_worker_exit=MagicMock(), on_exit=MagicMock())
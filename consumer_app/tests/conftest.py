@@ -0,0 +1,9 @@
+import pytest
+
+# Redis connection pool of an in-memory Redis server (fakeredis), the tests using it are skipped without fakeredis
+@pytest.fixture
+def redis_con_pool():
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+    connection_class = getattr(fakeredis, "FakeRedisConnection", None) or fakeredis.FakeConnection
+    return redis.ConnectionPool(connection_class=connection_class, server=fakeredis.FakeServer())
@@ -0,0 +1,66 @@
+import threading
+import pytest
+import redis
+
+from unittest.mock import patch
+from consumer.messages_deduplicator import MessagesDeduplicator
+from consumer.processed_messages_writer import ProcessedMessagesWriter
+
+STREAM_NAME = "messages:processed"
+
+@pytest.fixture
+def deduplicator(redis_con_pool):
+    return MessagesDeduplicator(redis_con_pool=redis_con_pool, ttl_in_seconds=60, local_cache_size=2)
+
+@pytest.fixture
+def writer(redis_con_pool, deduplicator):
+    # the dedup script needs the Lua scripting of fakeredis
+    pytest.importorskip("lupa")
+    writer = ProcessedMessagesWriter(redis_con_pool=redis_con_pool, stream_name=STREAM_NAME, batch_size=10,
+                                     flush_interval_ms=1, durability_mode="sync", deduplicator=deduplicator)
+    threading.Thread(target=writer.run_flushing, daemon=True).start()
+    yield writer
+    writer.close()
+
+def get_stream_length(redis_con_pool):
+    with redis.Redis(connection_pool=redis_con_pool) as connection:
+        return connection.xlen(STREAM_NAME)
+
+def test_duplicates_are_reported_as_processed_but_saved_once(redis_con_pool, deduplicator, writer):
+    assert writer.write([{"message_id": "1"}, {"message_id": "2"}]) == [True, True]
+    # another consumer, without the message ids in its local cache
+    deduplicator._local_cache.clear()
+    assert writer.write([{"message_id": "1"}, {"message_id": "3"}]) == [True, True]
+
+    assert get_stream_length(redis_con_pool) == 3
+    assert deduplicator.redis_hits.value() >= 1
+
+def test_message_id_is_not_marked_when_xadd_fails(redis_con_pool, deduplicator, writer):
+    with redis.Redis(connection_pool=redis_con_pool) as connection:
+        connection.set(STREAM_NAME, "not a stream")
+    assert writer.write([{"message_id": "1"}]) == [False]
+    assert not deduplicator.is_duplicate("1")
+
+    with redis.Redis(connection_pool=redis_con_pool) as connection:
+        connection.delete(STREAM_NAME)
+    assert writer.write([{"message_id": "1"}]) == [True]
+    assert get_stream_length(redis_con_pool) == 1
+
+def test_written_message_ids_are_kept_in_local_cache(deduplicator):
+    deduplicator.on_written([{"message_id": "1"}, {"message_id": "2"}, {"message_id": "3"}], ["1-0", None, "2-0"])
+
+    # the cache keeps the local_cache_size most recent ids
+    assert not deduplicator.is_duplicate("1")
+    assert deduplicator.is_duplicate("2")
+    assert deduplicator.is_duplicate("3")
+
+def test_failed_writes_are_not_kept_in_local_cache(deduplicator):
+    deduplicator.on_written([{"message_id": "1"}], [redis.ResponseError("WRONGTYPE")])
+
+    assert not deduplicator.is_duplicate("1")
+
+def test_expired_message_ids_are_not_duplicates(deduplicator):
+    deduplicator.on_written([{"message_id": "1"}], ["1-0"])
+
+    with patch("consumer.messages_deduplicator.time.monotonic", return_value=float("inf")):
+        assert not deduplicator.is_duplicate("1")
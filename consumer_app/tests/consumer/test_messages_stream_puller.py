@@ -0,0 +1,84 @@
+import pytest
+import redis
+
+from unittest.mock import MagicMock, patch
+from consumer.messages_stream_puller import MessagesStreamPuller
+from consumer.processing_executor import ProcessingOverloadedError, ProcessingStoppedError
+
+@pytest.fixture
+def connection(redis_con_pool):
+    with redis.Redis(connection_pool=redis_con_pool) as connection:
+        yield connection
+
+def create_puller(redis_con_pool, process_msgs, claim_min_idle_ms=30000):
+    consumer = MagicMock(id="localhost:5001", redis_con_pool=redis_con_pool)
+    consumer.process_msgs.side_effect = process_msgs
+    puller = MessagesStreamPuller(consumer=consumer, batch_size=10, block_ms=10, claim_min_idle_ms=claim_min_idle_ms)
+    puller._create_stream_group()
+    return puller
+
+def append_entries(connection, payloads):
+    for payload in payloads:
+        connection.xadd(MessagesStreamPuller.MSGS_STREAM_NAME, {"data": payload})
+
+def read_entries(connection, consumer_name="localhost:5001"):
+    response = connection.xreadgroup(groupname=MessagesStreamPuller.STREAM_GROUP_NAME, consumername=consumer_name,
+                                     streams={MessagesStreamPuller.MSGS_STREAM_NAME: ">"}, count=10)
+    return response[0][1]
+
+def get_pending_count(connection):
+    return connection.xpending(MessagesStreamPuller.MSGS_STREAM_NAME, MessagesStreamPuller.STREAM_GROUP_NAME)["pending"]
+
+def test_processed_entries_are_acknowledged(redis_con_pool, connection):
+    puller = create_puller(redis_con_pool, lambda msgs: [True] * len(msgs))
+    append_entries(connection, [b'{"message_id": "1"}', b'{"message_id": "2"}'])
+
+    puller._process_entries(read_entries(connection))
+
+    puller.consumer.process_msgs.assert_called_once_with([{"message_id": "1"}, {"message_id": "2"}])
+    assert get_pending_count(connection) == 0
+
+def test_failed_entries_stay_pending(redis_con_pool, connection):
+    puller = create_puller(redis_con_pool, lambda msgs: [True, False])
+    append_entries(connection, [b'{"message_id": "1"}', b'{"message_id": "2"}'])
+
+    puller._process_entries(read_entries(connection))
+
+    assert get_pending_count(connection) == 1
+
+def test_invalid_entries_are_moved_to_dead_letter_stream(redis_con_pool, connection):
+    puller = create_puller(redis_con_pool, lambda msgs: [True] * len(msgs))
+    invalid_payloads = [b"not json", b'"1"', b"[]", b"null", b'{"id": "2"}']
+    append_entries(connection, [b'{"message_id": "1"}'] + invalid_payloads + [b'{"message_id": "3"}'])
+
+    puller._process_entries(read_entries(connection))
+
+    puller.consumer.process_msgs.assert_called_once_with([{"message_id": "1"}, {"message_id": "3"}])
+    assert get_pending_count(connection) == 0
+    dead_letters = connection.xrange(MessagesStreamPuller.DEAD_LETTER_STREAM_NAME)
+    assert [fields[b"data"] for _, fields in dead_letters] == invalid_payloads
+
+def test_idle_entries_are_claimed(redis_con_pool, connection):
+    puller = create_puller(redis_con_pool, lambda msgs: [True] * len(msgs), claim_min_idle_ms=0)
+    append_entries(connection, [b'{"message_id": "1"}'])
+    # read, but never acknowledged by another consumer
+    read_entries(connection, consumer_name="localhost:5002")
+
+    puller._claim_idle_entries()
+
+    puller.consumer.process_msgs.assert_called_once_with([{"message_id": "1"}])
+    assert get_pending_count(connection) == 0
+
+def test_pulling_pauses_when_consumer_is_overloaded_and_stops_when_consumer_is_stopping(redis_con_pool, connection):
+    puller = create_puller(redis_con_pool, [ProcessingOverloadedError("overloaded"), ProcessingStoppedError("stopping")])
+    append_entries(connection, [b'{"message_id": "1"}'])
+
+    # the entry rejected by the overloaded consumer is claimed again at once
+    puller.claim_min_idle_ms = 0
+    with patch("consumer.messages_stream_puller.time.sleep") as sleep, \
+            patch.object(MessagesStreamPuller, "CLAIM_INTERVAL_IN_SECONDS", 0):
+        puller.run_pulling()
+
+    sleep.assert_called_once_with(MessagesStreamPuller.OVERLOADED_BACKOFF_IN_SECONDS)
+    assert puller.consumer.process_msgs.call_count == 2
+    assert get_pending_count(connection) == 1
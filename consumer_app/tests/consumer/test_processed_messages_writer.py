@@ -0,0 +1,86 @@
+import threading
+import pytest
+import redis
+
+from consumer.processed_messages_writer import ProcessedMessagesWriter
+
+STREAM_NAME = "messages:processed"
+
+def create_writer(redis_con_pool, **overrides):
+    settings = dict(stream_name=STREAM_NAME, batch_size=2, flush_interval_ms=10, durability_mode="sync")
+    settings.update(overrides)
+    return ProcessedMessagesWriter(redis_con_pool=redis_con_pool, **settings)
+
+def start_flushing(writer):
+    flushing_thread = threading.Thread(target=writer.run_flushing, daemon=True)
+    flushing_thread.start()
+    return flushing_thread
+
+def get_stream_entries(redis_con_pool):
+    with redis.Redis(connection_pool=redis_con_pool) as connection:
+        return [{field.decode(): value.decode() for field, value in fields.items()}
+                for _, fields in connection.xrange(STREAM_NAME)]
+
+def test_sync_write_returns_after_entries_are_saved(redis_con_pool):
+    writer = create_writer(redis_con_pool)
+    start_flushing(writer)
+
+    assert writer.write([{"message_id": "1"}, {"message_id": "2"}, {"message_id": "3"}]) == [True, True, True]
+
+    assert get_stream_entries(redis_con_pool) == [{"message_id": "1"}, {"message_id": "2"}, {"message_id": "3"}]
+    assert writer.pending_count() == 0
+    writer.close()
+
+def test_async_write_returns_before_entries_are_saved(redis_con_pool):
+    writer = create_writer(redis_con_pool, durability_mode="async", flush_interval_ms=60000)
+
+    assert writer.write([{"message_id": "1"}]) == [True]
+
+    assert get_stream_entries(redis_con_pool) == []
+    assert writer.pending_count() == 1
+    writer.close()
+    assert get_stream_entries(redis_con_pool) == [{"message_id": "1"}]
+
+def test_failed_xadd_is_reported_as_not_saved(redis_con_pool):
+    with redis.Redis(connection_pool=redis_con_pool) as connection:
+        connection.set(STREAM_NAME, "not a stream")
+    writer = create_writer(redis_con_pool)
+    start_flushing(writer)
+
+    assert writer.write([{"message_id": "1"}]) == [False]
+    writer.close()
+
+def test_sync_write_times_out_when_entries_are_not_saved(redis_con_pool):
+    # there is no flushing thread, so the entries are not saved
+    writer = create_writer(redis_con_pool, flush_interval_ms=60000, write_timeout_ms=50)
+
+    assert writer.write([{"message_id": "1"}]) == [False]
+
+def test_writers_wait_once_max_queued_batches_are_full(redis_con_pool):
+    writer = create_writer(redis_con_pool, durability_mode="async", batch_size=1, max_queued_batches=2)
+    writer.write([{"message_id": "1"}, {"message_id": "2"}])
+
+    written = threading.Event()
+    threading.Thread(target=lambda: (writer.write([{"message_id": "3"}]), written.set()), daemon=True).start()
+    assert not written.wait(timeout=0.1)
+    assert writer.pending_count() == 2
+
+    start_flushing(writer)
+    assert written.wait(timeout=2)
+    writer.close()
+    assert get_stream_entries(redis_con_pool) == [{"message_id": "1"}, {"message_id": "2"}, {"message_id": "3"}]
+
+def test_write_after_close_fails(redis_con_pool):
+    writer = create_writer(redis_con_pool)
+    flushing_thread = start_flushing(writer)
+    writer.close()
+
+    flushing_thread.join(timeout=2)
+    assert not flushing_thread.is_alive()
+    with pytest.raises(RuntimeError):
+        writer.write([{"message_id": "1"}])
+
+def test_unsupported_durability_mode():
+    with pytest.raises(ValueError):
+        ProcessedMessagesWriter(redis_con_pool=None, stream_name=STREAM_NAME, batch_size=1, flush_interval_ms=10,
+                                durability_mode="eventually")
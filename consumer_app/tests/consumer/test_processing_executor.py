@@ -0,0 +1,64 @@
+import threading
+import pytest
+
+from consumer.processing_executor import ProcessingExecutor, ProcessingOverloadedError, ProcessingStoppedError
+from consumer.processing_pipeline import ProcessingPipeline
+
+def create_pipeline():
+    return ProcessingPipeline(output_fields=["message_id"])
+
+# submits a batch in a background thread, which is processed until release is set
+def submit_blocked_batch(executor, release):
+    started = threading.Event()
+
+    def process_batch(msgs):
+        started.set()
+        release.wait(5)
+        return [True] * len(msgs)
+
+    thread = threading.Thread(target=executor.submit, args=(process_batch, [{"message_id": "1"}]))
+    thread.start()
+    assert started.wait(5)
+    return thread
+
+def test_submit_returns_the_result_of_the_batch():
+    executor = ProcessingExecutor(create_pipeline)
+
+    assert executor.submit(lambda msgs: [True] * len(msgs), [{"message_id": "1"}, {"message_id": "2"}]) == [True, True]
+    assert executor.pending_count() == 0
+
+def test_batches_above_the_limit_are_rejected():
+    executor = ProcessingExecutor(create_pipeline, max_pending_batches=1)
+    release = threading.Event()
+    thread = submit_blocked_batch(executor, release)
+    try:
+        assert executor.pending_count() == 1
+        with pytest.raises(ProcessingOverloadedError):
+            executor.submit(lambda msgs: [True], [{"message_id": "2"}])
+    finally:
+        release.set()
+        thread.join()
+
+    assert executor.pending_count() == 0
+    assert executor.submit(lambda msgs: [True], [{"message_id": "2"}]) == [True]
+
+def test_batches_are_processed_by_the_io_workers():
+    executor = ProcessingExecutor(create_pipeline, io_workers=2)
+    try:
+        thread_name = executor.submit(lambda msgs: threading.current_thread().name, [{"message_id": "1"}])
+    finally:
+        executor.shutdown()
+
+    assert thread_name.startswith("ProcessingIO")
+
+def test_batches_are_rejected_after_shutdown():
+    executor = ProcessingExecutor(create_pipeline, io_workers=1)
+    executor.shutdown()
+
+    with pytest.raises(ProcessingStoppedError):
+        executor.submit(lambda msgs: [True], [{"message_id": "1"}])
+
+def test_run_pipeline_without_cpu_workers():
+    executor = ProcessingExecutor(create_pipeline)
+
+    assert executor.run_pipeline([{"message_id": "1", "value": 1}]) == ([{"message_id": "1"}], [0])
@@ -0,0 +1,77 @@
+import sys
+import pytest
+
+from types import ModuleType
+from unittest.mock import patch
+from consumer.processing_pipeline import MessageBatch, ProcessingPipeline, ProcessingStage, register_stages
+
+MSGS = [{"message_id": "1", "value": 1}, {"message_id": "2", "value": 2}, {"message_id": "3", "value": 3}]
+
+def test_pipeline_without_stages_returns_output_fields():
+    pipeline = ProcessingPipeline(output_fields=["message_id"])
+
+    entries, indexes = pipeline.process([dict(msg) for msg in MSGS])
+
+    assert entries == [{"message_id": "1"}, {"message_id": "2"}, {"message_id": "3"}]
+    assert indexes == [0, 1, 2]
+
+def test_transform_enricher_and_filter_stages():
+    pipeline = ProcessingPipeline(output_fields=["message_id"])
+    pipeline.add_transform("value", lambda values: [value * 10 for value in values], target_field="scaled")
+    pipeline.add_enricher("subscriber_id", lambda batch: "localhost:5001")
+    pipeline.add_filter(lambda batch: [value != 20 for value in batch.column("scaled")])
+
+    entries, indexes = pipeline.process([dict(msg) for msg in MSGS])
+
+    assert entries == [{"message_id": "1", "scaled": 10, "subscriber_id": "localhost:5001"},
+                       {"message_id": "3", "scaled": 30, "subscriber_id": "localhost:5001"}]
+    assert indexes == [0, 2]
+
+def test_enricher_with_column_value():
+    pipeline = ProcessingPipeline(output_fields=["message_id"])
+    pipeline.add_enricher("position", lambda batch: list(range(len(batch))))
+
+    entries, _ = pipeline.process([dict(msg) for msg in MSGS])
+
+    assert [entry["position"] for entry in entries] == [0, 1, 2]
+
+def test_fields_without_value_are_left_out():
+    pipeline = ProcessingPipeline(output_fields=["message_id", "missing"])
+
+    entries, _ = pipeline.process([{"message_id": "1"}])
+
+    assert entries == [{"message_id": "1"}]
+
+def test_stages_are_skipped_once_all_messages_are_filtered_out():
+    pipeline = ProcessingPipeline(output_fields=["message_id"])
+    pipeline.add_filter(lambda batch: [False] * len(batch))
+    pipeline.add_enricher("never", lambda batch: pytest.fail("stage called for an empty batch"))
+
+    assert pipeline.process([dict(msg) for msg in MSGS]) == ([], [])
+
+def test_column_with_wrong_length_is_rejected():
+    batch = MessageBatch([dict(msg) for msg in MSGS])
+
+    with pytest.raises(ValueError):
+        batch.set_column("value", [1])
+
+def test_stage_without_process_cannot_be_created():
+    class IncompleteStage(ProcessingStage):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteStage()
+
+def test_register_stages():
+    module = ModuleType("my_stages")
+    module.register = lambda pipeline: pipeline.add_enricher("source", lambda batch: "my_stages")
+
+    with patch.dict(sys.modules, {"my_stages": module}):
+        pipeline = ProcessingPipeline(output_fields=["message_id"])
+        register_stages(pipeline, ["my_stages:register"])
+
+    assert pipeline.process([{"message_id": "1"}])[0] == [{"message_id": "1", "source": "my_stages"}]
+
+def test_register_stages_with_invalid_import_path():
+    with pytest.raises(ValueError):
+        register_stages(ProcessingPipeline(output_fields=[]), ["my_stages"])
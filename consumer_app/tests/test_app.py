@@ -0,0 +1,22 @@
+import threading
+
+from types import SimpleNamespace
+import app
+
+def create_configs(**overrides):
+    configs = dict(redis_host="localhost", redis_port=6379, rest_api_host="127.0.0.1", rest_api_port=5001,
+                   write_batch_size=10, write_flush_interval_ms=10, durability_mode="sync", write_max_queued_batches=10,
+                   write_timeout_ms=1000, dedup_enabled=False, dedup_ttl_in_seconds=60, dedup_local_cache_size=10,
+                   processing_stages=[], io_workers=0, cpu_workers=0, max_pending_batches=1, pipeline_mode="push",
+                   pull_batch_size=10, pull_block_ms=10, pull_claim_min_idle_ms=1000)
+    configs.update(overrides)
+    return SimpleNamespace(**configs)
+
+def test_consumer_threads_dont_keep_the_process_running():
+    consumer = app.start_consumer(create_configs())
+    try:
+        threads = {thread.name: thread for thread in threading.enumerate()}
+        assert threads["ProcessedMessagesWriter"].daemon
+        assert threads["StatisticsReporter"].daemon
+    finally:
+        consumer.close()
@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+from config_parser import get_default_max_pending_batches, load_configs
+
+def create_args(config_file_path, **overrides):
+    args = dict(redisServerHost=None, redisServerPort=None, restApiHost=None, restApiPort=None, servingMode=None,
+                apiWorkers=None, apiThreads=None, consumerGroupAppHost=None, consumerGroupAppPort=None,
+                heartbeatIntervalMs=None, writeBatchSize=None, writeFlushIntervalMs=None, durabilityMode=None,
+                pipelineMode=None, pullBatchSize=None, dedupEnabled=None, processingStages=None, cpuWorkers=None,
+                maxPendingBatches=None, configFilePath=str(config_file_path))
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+def test_default_max_pending_batches_follows_the_workers():
+    assert get_default_max_pending_batches(cpu_workers=4, io_workers=16, rest_api_threads=8) == 8
+    assert get_default_max_pending_batches(cpu_workers=0, io_workers=3, rest_api_threads=8) == 6
+    assert get_default_max_pending_batches(cpu_workers=0, io_workers=0, rest_api_threads=8) == 8
+
+def test_max_pending_batches_is_limited_by_default(tmp_path):
+    config_file = tmp_path / "config.properties"
+    config_file.write_text("[processing]\ncpu_workers = 3\n")
+
+    assert load_configs(create_args(config_file)).max_pending_batches == 6
+    assert load_configs(create_args(config_file, maxPendingBatches="20")).max_pending_batches == 20
@@ -7,11 +7,14 @@ setup(
     packages=find_packages(where='src'),
     package_dir={"":"src"},
     install_requires=[
+        'consumer_common',
         'redis',
         'flask',
         'requests',
         'marshmallow'
     ],
+    # production grade serving modes of the Rest Api, the asyncio runtime mode and the faster json codec
+    extras_require={'production': ['waitress'], 'asyncio': ['aiohttp'], 'fast_json': ['orjson']},
     setup_requires=['pytest-runner'],
     tests_require=['pytest', 'requests-mock'],
 
@@ -1,14 +1,16 @@
 import uuid
 import logging
 from flask import (
-    g, Flask, jsonify, request
+    g, Blueprint, Flask, Response, current_app, jsonify, request
 )
 from marshmallow import Schema, fields
 
 from constants import CONSUMER_GROUP_CONTEXT_KEY
+from metrics import prometheus
+from metrics.metrics import REGISTRY
 
-# creating the Flask app
-rest_api_app = Flask(__name__)
+# the apis are registered in each app created by create_app
+rest_api = Blueprint("rest_api", __name__)
 
 consumer_schema_err_msg = "Provided data does not match requirements. " \
     + "The body should contain json data like the following: {'consumer_id': '<host>:<port>'}. " \
@@ -17,7 +19,7 @@ consumer_schema_err_msg = "Provided data does not match requirements. " \
 class ConsumerSchema(Schema):
     consumer_id = fields.String(required=True)
 
-@rest_api_app.post('/register')
+@rest_api.post('/register')
 def register():
     # expected format {"consumer_id": "consumer_host_address:consumer_port"}
     consumer_id = "undefined"
@@ -35,7 +37,7 @@ def register():
             return response
 
         consumer_id = data.get("consumer_id")
-        consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+        consumer_group = current_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
 
         consumer_group.add_consumer(consumer_id)
 
@@ -54,7 +56,7 @@ def register():
         response.status_code = 500
         return response
 
-@rest_api_app.post('/unregister')
+@rest_api.post('/unregister')
 def unregister():
     # expected format {"consumer_id": "consumer_host_address:consumer_port"}
     consumer_id = "undefined"
@@ -73,7 +75,7 @@ def unregister():
 
         consumer_id = data.get("consumer_id")
 
-        consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+        consumer_group = current_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
 
         consumer_group.remove_consumer(consumer_id)
 
@@ -92,7 +94,49 @@ def unregister():
         response.status_code = 500
         return response
 
-@rest_api_app.post('/checkMembership')
+@rest_api.post('/heartbeat')
+def heartbeat():
+    # expected format {"consumer_id": "consumer_host_address:consumer_port"}
+    consumer_id = "undefined"
+    try:
+        if not request.is_json:
+            response = jsonify({"error": consumer_schema_err_msg})
+            response.status_code = 400
+            return response
+        data = request.get_json(force=True)
+        try:
+            validate_consumer_data(json_request_data=data)
+        except:
+            response = jsonify({"error": consumer_schema_err_msg})
+            response.status_code = 400
+            return response
+
+        consumer_id = data.get("consumer_id")
+        consumer_group = current_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
+        is_member = consumer_group.renew_lease(consumer_id)
+
+        response = jsonify(
+           {"is_member": is_member}
+        )
+        # the consumer which is not a member (e.g. its lease expired) should register again
+        if is_member:
+            response.status_code = 200
+        else:
+            response.status_code = 404
+
+        return response
+    except Exception as ex:
+        uuid_ref = str(uuid.uuid4())
+        logging.error(f"Failed to renew the lease of consumer with id {consumer_id}. Ref: {uuid_ref}")
+        logging.exception(ex)
+
+        error_message = f"Failed to renew the lease! Use Ref for details: {uuid_ref}"
+        response = jsonify({"error": error_message})
+
+        response.status_code = 500
+        return response
+
+@rest_api.post('/checkMembership')
 def check_membership():
     # expected format {"consumer_id": "consumer_host_address:consumer_port"}
     consumer_id = "undefined"
@@ -110,7 +154,7 @@ def check_membership():
             return response
 
         consumer_id = data.get("consumer_id")
-        consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+        consumer_group = current_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
         is_member = consumer_group.check_consumer_membership(consumer_id)
 
         response = jsonify(
@@ -133,6 +177,17 @@ def check_membership():
         response.status_code = 500
         return response
 
+@rest_api.get('/metrics')
+def metrics():
+    return Response(prometheus.render(REGISTRY), content_type=prometheus.CONTENT_TYPE)
+
+def create_app(consumer_group) -> Flask:
+    rest_api_app = Flask(__name__)
+    # the consumer group is kept in the app extensions, so that it can be extracted and used in the api
+    rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY] = consumer_group
+    rest_api_app.register_blueprint(rest_api)
+    return rest_api_app
+
 def validate_consumer_data(json_request_data):
     schema = ConsumerSchema()
     schema.load(json_request_data)
\ No newline at end of file
@@ -1,80 +1,328 @@
 import argparse
+import asyncio
+import functools
 import logging
-import json
+import multiprocessing
+import os
+import signal
 import threading
 import time
 import atexit
 
 from pathlib import Path
+from typing import List, Tuple
 from redis.client import PubSub
+from codec import json_codec
+from codec.json_codec import Message
 from config_parser import Configs, load_configs
-from api.consumer_group_api import rest_api_app
+from api.consumer_group_api import create_app
+from api.api_server import ApiServer
 from consumer_group.consumers_monitor import ConsumerRegistrationsMonitor
 from consumer_group.consumer_group import ConsumersGroup
-from consumer.consumer_client import ConsumerClient
-from constants import CONSUMER_GROUP_CONTEXT_KEY
+from consumer_group.message_batcher import MessageBatcher
+from consumer_group.message_dispatcher import MessageDispatcher
+from consumer_group.load_balancing import LOAD_BALANCING_STRATEGIES, create_strategy
+from consumer_group.circuit_breaker import CircuitBreakers
+from consumer_group.retry_scheduler import BatchEntry, RetryScheduler, RetryTask, get_entry_attempt
+from consumer_group.listener_workers import ListenerWorkers, run_exporting_metrics
+from consumer_group.partition_ownership import PartitionOwnership
+from consumer_group.ingestion_buffer import IngestionBuffer
+from consumer.consumer_clients_pool import ConsumerClientsPool
+from consumer.consumer_client import ConsumerOverloadedError
+from consumer_group.dispatch_metrics import MESSAGES_RECEIVED, MESSAGES_PROCESSED, MESSAGES_FAILED, MESSAGES_RETRIED, \
+    record_dispatch_metrics, record_rejected_dispatch
+from metrics.metrics import REGISTRY
+from metrics.log_reporter import LogReporter
+from constants import PIPELINE_MODES, PIPELINE_MODE_PULL, SERVING_MODES, RUNTIME_MODES, RUNTIME_MODE_ASYNCIO
 
-logging.basicConfig(format='%(asctime)s %(levelname)s %(threadName)s %(message)s',
+logging.basicConfig(format='%(asctime)s %(levelname)s %(processName)s %(threadName)s %(message)s',
                     level=logging.INFO,
                     datefmt='%Y-%m-%d %H:%M:%S')
 
-PROCESSED_MESSAGES: int = 0
-FAILED_MESSAGES: int = 0
-
 PRINT_STATS_PERIOD_IN_SECONDS = 3
+MIN_RECONNECT_DELAY_IN_SECONDS = 0.1
+MAX_RECONNECT_DELAY_IN_SECONDS = 5
+# the maximum number of messages the distributor takes from the ingestion buffer at once
+INGESTION_READ_COUNT = 500
+
+def send_batch(consumer_group: ConsumersGroup, clients_pool: ConsumerClientsPool, retry_scheduler: RetryScheduler,
+               consumer_id: str, entries: List[BatchEntry]) -> None:
+    batch = [get_entry_attempt(entry)[0] for entry in entries]
+    start_time = time.monotonic()
+    error_reason = "Message was not processed by the consumer."
+    request_succeeded = False
+    overloaded_latency = None
+    try:
+        consumer_client = clients_pool.get_client(consumer_id)
+        logging.info(f"Sending batch of {len(batch)} messages to consumer with id: {consumer_id}")
+        results = consumer_client.process_msgs(batch)
+        request_succeeded = True
+    except ConsumerOverloadedError as ex:
+        # the messages are sent to another consumer by the retries - the rejection is counted as taking
+        # the time the consumer asked to wait, so that the latency based strategies send less to it
+        logging.warning(f"Consumer with id: {consumer_id} rejected batch of {len(batch)} messages. {ex}")
+        error_reason = str(ex)
+        results = [False] * len(batch)
+        overloaded_latency = ex.retry_after_seconds
+        record_rejected_dispatch(consumer_id, len(batch))
+    except Exception as ex:
+        logging.error(f"Failed to process batch of {len(batch)} messages by consumer with id: {consumer_id}")
+        logging.exception(ex)
+        error_reason = str(ex)
+        results = [False] * len(batch)
+    finally:
+        latency = time.monotonic() - start_time
+        consumer_group.record_dispatch(consumer_id, len(batch), max(latency, overloaded_latency or 0),
+                                       request_succeeded, overloaded=overloaded_latency is not None)
+
+    record_dispatch_metrics(consumer_id, len(batch), sum(results), latency)
+    # the failed messages are sent again (preferably to another consumer) by the retry scheduler
+    for entry, is_processed in zip(entries, results):
+        if not is_processed:
+            msg, attempt, tried_consumers = get_entry_attempt(entry)
+            logging.error(f"Failed to process message: {msg}")
+            if retry_scheduler.schedule(msg, attempt + 1, tried_consumers + (consumer_id,), error_reason):
+                MESSAGES_RETRIED.inc()
 
-consumer_group: ConsumersGroup = None
+# the retried message is batched with the other messages of the selected consumer
+def retry_message(consumer_group: ConsumersGroup, batcher: MessageBatcher, task: RetryTask) -> None:
+    consumer_id = consumer_group.get_consumer(task.msg, excluded_consumers=task.tried_consumers)
+    logging.info(f"Retrying msg '{task.msg}' (attempt {task.attempt}) with consumer with id: {consumer_id}")
+    batcher.add(consumer_id, task)
 
-def start_flask_app(consumer_group: ConsumersGroup):
-    # set the consumer group in the context so that it can be extracted and used in the api
-    setattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY, consumer_group)
+def dead_letter_message(consumer_group: ConsumersGroup, msg: Message, reason: str, attempts: int) -> None:
+    logging.error(f"Message '{msg}' failed after {attempts} retries. Moving it to the dead letter stream.")
+    MESSAGES_FAILED.inc()
+    consumer_group.add_to_dead_letter_stream(msg, reason, attempts)
 
-    logging.info("Starting Flask App...")
-    rest_api_app.run(debug = False)
+def append_batch_to_stream(consumer_group: ConsumersGroup, stream_name: str, batch: List[Message]) -> None:
+    try:
+        results = consumer_group.append_to_pending_stream(batch)
+    except Exception as ex:
+        logging.error(f"Failed to append batch of {len(batch)} messages to stream {stream_name}")
+        logging.exception(ex)
+        results = [False] * len(batch)
 
-def listen_for_messages(pubsub: PubSub, consumer_group: ConsumersGroup):
-    global PROCESSED_MESSAGES
-    global FAILED_MESSAGES
+    processed_count = sum(results)
+    MESSAGES_PROCESSED.inc(processed_count)
+    MESSAGES_FAILED.inc(len(results) - processed_count)
 
+def listen_for_messages(pubsub: PubSub, ingestion_buffer: IngestionBuffer, ownership: PartitionOwnership = None):
     logging.info("Starting MSG listener...")
+    reconnect_delay = MIN_RECONNECT_DELAY_IN_SECONDS
     while True:
         try:
-            for msg in pubsub.listen():
-                try:
-                    msg_data = json.loads(msg["data"].decode())
-                    consumer_id = consumer_group.get_consumer()
-                    consumer_host, consumer_port = (consumer_id.split(":"))
-                    consumer_client = ConsumerClient(consumer_host, consumer_port)
-                    logging.info(f"Sending msg '{msg_data}' to consumer with id: {consumer_id}")
-                    consumer_client.process_msg(msg_data)
-                    PROCESSED_MESSAGES += 1
-                except Exception as ex:
-                    logging.error(f"Failed to process message: {msg}")
-                    logging.exception(ex)
-                    FAILED_MESSAGES += 1
+            # in clustered mode only the messages of the partitions owned by the replica are received
+            for msg in (ownership.listen(pubsub) if ownership is not None else pubsub.listen()):
+                MESSAGES_RECEIVED.inc()
+                ingestion_buffer.put(msg["data"])
+                reconnect_delay = MIN_RECONNECT_DELAY_IN_SECONDS
         except Exception as ex:
-            logging.error(f"Listen for messages encountered a failure. Will try to connect again in 5 seconds")
+            # the messages published until the connection is restored are not received, so it is tried again quickly
+            logging.error(f"Listen for messages encountered a failure. Will try to connect again in {reconnect_delay} seconds")
             logging.exception(ex)
-            time.sleep(5)
+            time.sleep(reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2, MAX_RECONNECT_DELAY_IN_SECONDS)
 
-def print_statistics():
-    global PROCESSED_MESSAGES
-    global FAILED_MESSAGES
+def distribute_messages(ingestion_buffer: IngestionBuffer, consumer_group: ConsumersGroup, batcher: MessageBatcher,
+                        retry_scheduler: RetryScheduler, pipeline_mode: str):
+    logging.info("Starting MSG distributor...")
+    decode_messages = pipeline_mode != PIPELINE_MODE_PULL and consumer_group.needs_message_fields()
+    while True:
+        msgs = ingestion_buffer.get(max_count=INGESTION_READ_COUNT, timeout_in_seconds=1)
+        try:
+            distribute_messages_batch(msgs, consumer_group, batcher, retry_scheduler, pipeline_mode, decode_messages)
+        finally:
+            # the pipeline is stopped only after the taken messages are added to the batcher
+            ingestion_buffer.task_done(len(msgs))
 
-    global PRINT_STATS_PERIOD_IN_SECONDS
+def distribute_messages_batch(msgs: List[bytes], consumer_group: ConsumersGroup, batcher: MessageBatcher,
+                              retry_scheduler: RetryScheduler, pipeline_mode: str, decode_messages: bool):
+    for msg in msgs:
+        try:
+            # the raw payload is passed on, unless its fields are needed to select the consumer
+            try:
+                msg_data = json_codec.decode_message(msg, keep_raw=not decode_messages)
+            except ValueError as ex:
+                # a malformed message would fail every batch it is sent with, so it is not retried
+                logging.error(f"Malformed message: {msg}. {ex}")
+                MESSAGES_FAILED.inc()
+                consumer_group.add_to_dead_letter_stream(msg, str(ex), 0)
+                continue
+            if pipeline_mode == PIPELINE_MODE_PULL:
+                batcher.add(ConsumersGroup.PENDING_MSGS_STREAM_NAME, msg_data)
+                continue
 
-    logging.info("Starting Statistics Reporter ...")
-    while True:
-        time.sleep(PRINT_STATS_PERIOD_IN_SECONDS)
-        msg = f"Processed messages per second : {PROCESSED_MESSAGES / PRINT_STATS_PERIOD_IN_SECONDS }; " \
-                + f"Total messages failed: {FAILED_MESSAGES / PRINT_STATS_PERIOD_IN_SECONDS}"
-        logging.info(msg)
-        PROCESSED_MESSAGES = 0
-        FAILED_MESSAGES = 0
-
-def release_resources_on_exit(consumer_group: ConsumersGroup):
+            try:
+                consumer_id = consumer_group.get_consumer(msg_data)
+            except Exception as ex:
+                # there is no available consumer at the moment - the message will be tried again later
+                logging.error(f"Failed to select consumer for message: {msg_data}. {ex}")
+                if retry_scheduler.schedule(msg_data, 1, (), str(ex)):
+                    MESSAGES_RETRIED.inc()
+                continue
+            batcher.add(consumer_id, msg_data)
+        except Exception as ex:
+            logging.error(f"Failed to process message: {msg}")
+            logging.exception(ex)
+            MESSAGES_FAILED.inc()
+
+async def run_async_runtime(consumer_group: ConsumersGroup, configs: Configs):
+    try:
+        from consumer_group.async_runtime import AsyncRuntime
+    except ImportError:
+        raise RuntimeError("Runtime mode asyncio requires the aiohttp package: pip install aiohttp")
+
+    runtime = AsyncRuntime(consumer_group=consumer_group, configs=configs,
+                           stats_period_in_seconds=PRINT_STATS_PERIOD_IN_SECONDS)
+    consumer_group.add_removal_listener(runtime.forget)
+    REGISTRY.gauge("dispatch_in_flight", "Batches being sent to the consumers.", function=runtime.in_flight_count)
+    REGISTRY.gauge("dispatch_parked", "Batches waiting for a slot of their consumer.", function=runtime.parked_count)
+    REGISTRY.gauge("retry_pending", "Messages waiting to be sent again.", function=runtime.pending_retries_count)
+    REGISTRY.gauge("pubsub_backlog", "Messages received from the channel waiting to be dispatched.",
+                   function=runtime.pending_count)
+    await runtime.run()
+
+def register_threads_liveness(threads: List[threading.Thread]) -> None:
+    for thread in threads:
+        REGISTRY.gauge("thread_alive", "Whether the application thread is running.", {"thread": thread.name},
+                       function=thread.is_alive)
+
+def create_consumer_group(configs: Configs) -> ConsumersGroup:
+    logging.info("Initializing consumer group.")
+    consumer_group = ConsumersGroup(configs.max_consumer_group_size, configs.redis_host, configs.redis_port,
+                                    configs.pending_stream_max_length, configs.registry_refresh_interval_ms,
+                                    create_strategy(configs.load_balancing_strategy,
+                                                    routing_key=configs.routing_key,
+                                                    virtual_nodes_count=configs.hash_ring_virtual_nodes),
+                                    CircuitBreakers(failure_threshold=configs.circuit_breaker_failure_threshold,
+                                                    open_duration_ms=configs.circuit_breaker_open_ms,
+                                                    recovery_duration_ms=configs.circuit_breaker_recovery_ms),
+                                    lease_ttl_ms=configs.lease_ttl_ms)
+    # the metrics of a consumer are dropped once it is removed from the consumer group
+    consumer_group.add_removal_listener(functools.partial(REGISTRY.remove_labeled, "consumer_id"))
+    return consumer_group
+
+def create_clients_pool(consumer_group: ConsumersGroup, configs: Configs) -> ConsumerClientsPool:
+    clients_pool = ConsumerClientsPool(connect_timeout_ms=configs.connect_timeout_ms,
+                                       read_timeout_ms=configs.read_timeout_ms,
+                                       http_pool_size=configs.http_pool_size)
+    # the connections to a consumer are closed once it is removed from the consumer group
+    consumer_group.add_removal_listener(clients_pool.evict)
+    return clients_pool
+
+def start_messages_pipeline(consumer_group: ConsumersGroup, clients_pool: ConsumerClientsPool, configs: Configs,
+                            channels: List[str], ownership: PartitionOwnership = None) \
+        -> Tuple[List[threading.Thread], IngestionBuffer, MessageBatcher, MessageDispatcher]:
+    consumer_group.registry.refresh()
+    registry_refreshing_thread = threading.Thread(name="ConsumersRegistryRefresher",
+                                                  target=consumer_group.registry.run_refreshing)
+    registry_refreshing_thread.start()
+
+    logging.info(f"Subscribing consumer group to Redis channels: {channels}")
+    pubsub = consumer_group.subscribe_to_channel(channels)
+
+    retry_scheduler = RetryScheduler(max_retries=configs.max_retries,
+                                     base_delay_ms=configs.retry_base_delay_ms,
+                                     max_delay_ms=configs.retry_max_delay_ms,
+                                     dead_letter=functools.partial(dead_letter_message, consumer_group),
+                                     max_pending_retries=configs.max_pending_retries)
+
+    if configs.pipeline_mode == PIPELINE_MODE_PULL:
+        batch_sender = functools.partial(append_batch_to_stream, consumer_group)
+    else:
+        batch_sender = functools.partial(send_batch, consumer_group, clients_pool, retry_scheduler)
+    dispatcher = MessageDispatcher(max_in_flight=configs.max_in_flight,
+                                   max_in_flight_per_consumer=configs.max_in_flight_per_consumer,
+                                   send_batch=batch_sender)
+    consumer_group.add_removal_listener(dispatcher.forget)
+    batcher = MessageBatcher(batch_size=configs.dispatch_batch_size,
+                             max_linger_ms=configs.dispatch_max_linger_ms,
+                             send_batch=dispatcher.submit)
+    batches_flusher_thread = threading.Thread(name="BatchesFlusher", target=batcher.run_flushing)
+    batches_flusher_thread.start()
+
+    retry_scheduler_thread = threading.Thread(name="RetryScheduler", target=retry_scheduler.run_scheduling,
+                                              kwargs={"retry":functools.partial(retry_message, consumer_group, batcher)})
+    retry_scheduler_thread.start()
+
+    ingestion_buffer = IngestionBuffer(capacity=configs.ingestion_buffer_size)
+    msg_distributor_thread = threading.Thread(name="MessageDistributor", target=distribute_messages,
+                                              kwargs={"ingestion_buffer":ingestion_buffer,
+                                                      "consumer_group":consumer_group, "batcher":batcher,
+                                                      "retry_scheduler":retry_scheduler,
+                                                      "pipeline_mode":configs.pipeline_mode})
+    msg_distributor_thread.start()
+
+    msg_listener_thread = threading.Thread(name="MessageListener", target=listen_for_messages,
+                                           kwargs={"pubsub":pubsub, "ingestion_buffer":ingestion_buffer,
+                                                   "ownership":ownership})
+    msg_listener_thread.start()
+
+    REGISTRY.gauge("dispatch_in_flight", "Batches being sent to the consumers.", function=dispatcher.in_flight_count)
+    REGISTRY.gauge("dispatch_parked", "Batches waiting for a slot of their consumer.", function=dispatcher.parked_count)
+    REGISTRY.gauge("retry_pending", "Messages waiting to be sent again.", function=retry_scheduler.pending_count)
+    # messages received from the channel, but not handed over to the dispatcher yet
+    REGISTRY.gauge("ingestion_backlog", "Messages received from the channel waiting in the ingestion buffer.",
+                   function=ingestion_buffer.pending_count)
+    REGISTRY.gauge("pubsub_backlog", "Messages received from the channel waiting to be dispatched.",
+                   function=lambda: ingestion_buffer.pending_count() + batcher.pending_count())
+
+    pipeline_threads = [registry_refreshing_thread, batches_flusher_thread, retry_scheduler_thread,
+                        msg_distributor_thread, msg_listener_thread]
+    return pipeline_threads, ingestion_buffer, batcher, dispatcher
+
+def stop_messages_pipeline(consumer_group: ConsumersGroup, ingestion_buffer: IngestionBuffer, batcher: MessageBatcher,
+                           dispatcher: MessageDispatcher, clients_pool: ConsumerClientsPool, drain_timeout_seconds: int):
     logging.info("Unsubscribing from channel...")
     consumer_group.unsubscribe_from_channel()
+    logging.info("Distributing the messages left in the ingestion buffer...")
+    if not ingestion_buffer.wait_until_empty(timeout_in_seconds=drain_timeout_seconds):
+        logging.error(f"{ingestion_buffer.pending_count()} messages left in the ingestion buffer were not distributed.")
+    logging.info("Sending the pending messages batches...")
+    batcher.flush_all()
+    dispatcher.shutdown()
+    logging.info("Closing connections to consumers...")
+    clients_pool.close()
+
+def run_listener_worker(worker_index: int, workers_count: int, metrics_queue: multiprocessing.Queue, configs: Configs):
+    consumer_group = create_consumer_group(configs)
+    clients_pool = create_clients_pool(consumer_group, configs)
+    channels = ConsumersGroup.get_channels(configs.channel_shards, worker_index, workers_count)
+    pipeline_threads, ingestion_buffer, batcher, dispatcher = start_messages_pipeline(consumer_group, clients_pool,
+                                                                                      configs, channels)
+    register_threads_liveness(pipeline_threads)
+
+    metrics_source = ListenerWorkers.get_source(multiprocessing.current_process().name, os.getpid())
+    metrics_exporting_thread = threading.Thread(name="MetricsExporter", target=run_exporting_metrics,
+                                                kwargs={"metrics_queue":metrics_queue, "source":metrics_source,
+                                                        "registry":REGISTRY, "period_in_seconds":1})
+    metrics_exporting_thread.start()
+
+    # the parent process stops the worker with SIGTERM
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    while not stop_event.wait(timeout=1):
+        pass
+
+    stop_messages_pipeline(consumer_group, ingestion_buffer, batcher, dispatcher, clients_pool,
+                           configs.rest_api_drain_timeout_seconds)
+    metrics_queue.put((metrics_source, REGISTRY.export()))
+    # the pipeline threads run until the process exits
+    os._exit(0)
+
+def release_resources_on_exit(consumer_group: ConsumersGroup, ingestion_buffer: IngestionBuffer,
+                              batcher: MessageBatcher, dispatcher: MessageDispatcher,
+                              clients_pool: ConsumerClientsPool, api_server: ApiServer, drain_timeout_seconds: int):
+    api_server.shutdown()
+    stop_messages_pipeline(consumer_group, ingestion_buffer, batcher, dispatcher, clients_pool, drain_timeout_seconds)
+
+def stop_listener_workers_on_exit(listener_workers: ListenerWorkers, clients_pool: ConsumerClientsPool,
+                                  api_server: ApiServer):
+    api_server.shutdown()
+    logging.info("Stopping listener workers...")
+    listener_workers.stop()
+    clients_pool.close()
 
 def run():
     logging.info("Starting Consumer Group application.")
@@ -86,34 +334,143 @@ def run():
                         help="Provide Redis server port to connect to.")
     parser.add_argument("--maxConsumerGroupSize", required=False,
                         help="Maximum allowed size of the consumer group.")
+    parser.add_argument("--loadBalancingStrategy", required=False, choices=list(LOAD_BALANCING_STRATEGIES),
+                        help="Strategy used to select the consumer for a message.")
+    parser.add_argument("--routingKey", required=False,
+                        help="Message field used as routing key by the consistent_hash load balancing strategy.")
+    parser.add_argument("--leaseTtlMs", required=False,
+                        help="Time in milliseconds after which a consumer without heartbeats is removed from the group.")
+    parser.add_argument("--healthCheckIntervalSeconds", required=False,
+                        help="How often in seconds the health of the consumers is checked.")
+    parser.add_argument("--dispatchBatchSize", required=False,
+                        help="Maximum number of messages sent to a consumer in one request.")
+    parser.add_argument("--dispatchMaxLingerMs", required=False,
+                        help="Maximum time in milliseconds a message waits for its batch to fill up before it is sent.")
+    parser.add_argument("--pipelineMode", required=False, choices=PIPELINE_MODES,
+                        help="push - send messages to the consumers' Rest Api; pull - append messages to the pending messages stream.")
+    parser.add_argument("--readTimeoutMs", required=False,
+                        help="Maximum time in milliseconds to wait for a consumer to respond.")
+    parser.add_argument("--maxInFlight", required=False,
+                        help="Maximum number of batches sent to the consumers at the same time.")
+    parser.add_argument("--maxRetries", required=False,
+                        help="Maximum number of times a failed message is sent again before it is moved to the dead letter stream.")
+    parser.add_argument("--runtimeMode", required=False, choices=RUNTIME_MODES,
+                        help="threads - threaded messages pipeline; asyncio - messages pipeline on one asyncio event loop.")
+    parser.add_argument("--listenerProcesses", required=False,
+                        help="Number of worker processes listening to the sharded messages channels.")
+    parser.add_argument("--channelShards", required=False,
+                        help="Number of messages:published:<shard> channels the messages are published to (0 - one channel).")
+    parser.add_argument("--clusterEnabled", required=False, choices=["true", "false"],
+                        help="Run as one of several replicas, which split the channel shards (partitions) between them.")
+    parser.add_argument("--replicaId", required=False,
+                        help="Unique id of the replica in clustered mode (default: <hostname>:<pid>).")
+    parser.add_argument("--ingestionBufferSize", required=False,
+                        help="Maximum number of received messages waiting to be dispatched, the oldest are dropped above it.")
+    parser.add_argument("--restApiHost", required=False,
+                        help="Hostname/IP on which the Rest Api Service will be started.")
+    parser.add_argument("--restApiPort", required=False,
+                        help="Port on which the Rest Api Service will be started.")
+    parser.add_argument("--servingMode", required=False, choices=SERVING_MODES,
+                        help="development - Flask development server; waitress - multi-threaded WSGI server.")
+    parser.add_argument("--apiThreads", required=False,
+                        help="Number of threads serving the Rest Api in waitress serving mode.")
     parser.add_argument("--configFilePath", default=f"{src_folder_path}/../config/config.properties",
                         help="Location of the properties files with application configurations.")
 
     args = parser.parse_args()
     configs: Configs = load_configs(args)
 
-    logging.info("Initializing consumer group.")
-    consumer_group = ConsumersGroup(configs.max_consumer_group_size, configs.redis_host, configs.redis_port)
+    if configs.cluster_enabled:
+        if configs.runtime_mode == RUNTIME_MODE_ASYNCIO or configs.listener_processes > 1:
+            raise ValueError("Clustered mode is supported only in threads runtime mode with one listener process.")
+        if configs.channel_shards <= 0:
+            raise ValueError("Clustered mode needs the messages to be published to channel shards (partitions).")
 
-    logging.info("Subscribing consumer group to Redis channel.")
-    pubsub = consumer_group.subscribe_to_channel()
+    if configs.listener_processes > 1:
+        if configs.runtime_mode == RUNTIME_MODE_ASYNCIO:
+            raise ValueError("Several listener processes are supported only in threads runtime mode.")
+        if configs.channel_shards < configs.listener_processes:
+            raise ValueError(f"{configs.listener_processes} listener processes need at least as many channel shards, "
+                             + f"configured channel shards: {configs.channel_shards}")
 
-    flask_thread = threading.Thread(name="FlaskApp", target=start_flask_app,
-                                    kwargs={"consumer_group":consumer_group})
+    consumer_group = create_consumer_group(configs)
+
+    api_server = ApiServer(host=configs.rest_api_host, port=configs.rest_api_port,
+                           serving_mode=configs.serving_mode, threads=configs.rest_api_threads,
+                           drain_timeout_seconds=configs.rest_api_drain_timeout_seconds)
+    flask_thread = threading.Thread(name="FlaskApp", target=api_server.serve,
+                                    kwargs={"app":create_app(consumer_group)})
     flask_thread.start()
 
-    msg_processor_thread = threading.Thread(name="MessageListener", target=listen_for_messages,
-                                            kwargs={"pubsub":pubsub, "consumer_group":consumer_group})
-    msg_processor_thread.start()
+    if configs.runtime_mode == RUNTIME_MODE_ASYNCIO:
+        register_threads_liveness([flask_thread])
+        try:
+            asyncio.run(run_async_runtime(consumer_group, configs))
+        finally:
+            api_server.shutdown()
+        return
+
+    clients_pool = create_clients_pool(consumer_group, configs)
+    if configs.listener_processes > 1:
+        # the workers listen to the messages, the application process serves the Rest Api and monitors the consumers
+        consumer_group.registry.refresh()
+        registry_refreshing_thread = threading.Thread(name="ConsumersRegistryRefresher",
+                                                      target=consumer_group.registry.run_refreshing)
+        registry_refreshing_thread.start()
+        listener_workers = ListenerWorkers(workers_count=configs.listener_processes, run_worker=run_listener_worker,
+                                           worker_args=(configs,), registry=REGISTRY,
+                                           stop_timeout_seconds=configs.rest_api_drain_timeout_seconds)
+        listener_workers.start()
+        workers_supervising_thread = threading.Thread(name="ListenerWorkersSupervisor",
+                                                      target=listener_workers.run_supervising)
+        workers_supervising_thread.start()
+        metrics_collecting_thread = threading.Thread(name="ListenerWorkersMetricsCollector",
+                                                     target=listener_workers.run_collecting_metrics)
+        metrics_collecting_thread.start()
+        REGISTRY.gauge("listener_workers_alive", "Listener worker processes running.",
+                       function=listener_workers.alive_count)
+        application_threads = [registry_refreshing_thread, workers_supervising_thread, metrics_collecting_thread]
+        atexit.register(stop_listener_workers_on_exit, listener_workers, clients_pool, api_server)
+    elif configs.cluster_enabled:
+        # the replica listens to the partitions it owns, which follow the replicas joining and leaving the cluster
+        ownership = PartitionOwnership(redis_con_pool=consumer_group.redis_con_pool, replica_id=configs.replica_id,
+                                       partitions_count=configs.channel_shards,
+                                       lease_ttl_ms=configs.partition_lease_ttl_ms)
+        partitions_rebalancing_thread = threading.Thread(name="PartitionsRebalancing", target=ownership.run_rebalancing)
+        partitions_rebalancing_thread.start()
+        REGISTRY.gauge("cluster_owned_partitions", "Partitions owned by the replica.", function=ownership.owned_count)
+        pipeline_threads, ingestion_buffer, batcher, dispatcher = start_messages_pipeline(consumer_group, clients_pool,
+                                                                                          configs, [], ownership)
+        application_threads = [partitions_rebalancing_thread] + pipeline_threads
+        # the partitions are released first, so that the other replicas take them over without waiting for the leases
+        atexit.register(release_resources_on_exit, consumer_group, ingestion_buffer, batcher, dispatcher, clients_pool,
+                        api_server, configs.rest_api_drain_timeout_seconds)
+        atexit.register(ownership.release_all)
+    else:
+        application_threads, ingestion_buffer, batcher, dispatcher = \
+            start_messages_pipeline(consumer_group, clients_pool, configs,
+                                    ConsumersGroup.get_channels(configs.channel_shards))
+        atexit.register(release_resources_on_exit, consumer_group, ingestion_buffer, batcher, dispatcher, clients_pool,
+                        api_server, configs.rest_api_drain_timeout_seconds)
+
+    leases_expiring_thread = threading.Thread(name="ConsumersLeasesExpiring", target=consumer_group.run_expiring_leases,
+                                              kwargs={"check_interval_ms":configs.lease_check_interval_ms})
+    leases_expiring_thread.start()
 
-    consumers_monitor = ConsumerRegistrationsMonitor(consumer_group=consumer_group)
+    consumers_monitor = ConsumerRegistrationsMonitor(consumer_group=consumer_group, clients_pool=clients_pool,
+                                                     check_interval_in_seconds=configs.health_check_interval_seconds,
+                                                     check_jitter=configs.health_check_jitter,
+                                                     check_timeout_ms=configs.health_check_timeout_ms,
+                                                     check_concurrency=configs.health_check_concurrency)
     consumers_monitoring_thread = threading.Thread(name= "ConsumersMonitoring", target=consumers_monitor.run_monitoring)
     consumers_monitoring_thread.start()
 
-    printStats_thread = threading.Thread(name="StatisticsReporter", target=print_statistics)
+    stats_reporter = LogReporter(registry=REGISTRY, period_in_seconds=PRINT_STATS_PERIOD_IN_SECONDS)
+    printStats_thread = threading.Thread(name="StatisticsReporter", target=stats_reporter.run_reporting)
     printStats_thread.start()
 
-    atexit.register(release_resources_on_exit, consumer_group)
+    register_threads_liveness([flask_thread, leases_expiring_thread, consumers_monitoring_thread, printStats_thread]
+                              + application_threads)
 
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    run()
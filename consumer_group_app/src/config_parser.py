@@ -1,5 +1,6 @@
 import configparser
 import os.path
+import socket
 import logging
 from dataclasses import dataclass
 
@@ -7,7 +8,45 @@ from dataclasses import dataclass
 class Configs:
     redis_host: str
     redis_port: int
+    rest_api_host: str
+    rest_api_port: int
+    serving_mode: str
+    rest_api_threads: int
+    rest_api_drain_timeout_seconds: int
     max_consumer_group_size: int
+    registry_refresh_interval_ms: int
+    load_balancing_strategy: str
+    routing_key: str
+    hash_ring_virtual_nodes: int
+    lease_ttl_ms: int
+    lease_check_interval_ms: int
+    health_check_interval_seconds: float
+    health_check_jitter: float
+    health_check_timeout_ms: int
+    health_check_concurrency: int
+    dispatch_batch_size: int
+    dispatch_max_linger_ms: int
+    ingestion_buffer_size: int
+    pipeline_mode: str
+    runtime_mode: str
+    listener_processes: int
+    channel_shards: int
+    connect_timeout_ms: int
+    read_timeout_ms: int
+    http_pool_size: int
+    max_in_flight: int
+    max_in_flight_per_consumer: int
+    max_retries: int
+    retry_base_delay_ms: int
+    retry_max_delay_ms: int
+    max_pending_retries: int
+    circuit_breaker_failure_threshold: int
+    circuit_breaker_open_ms: int
+    circuit_breaker_recovery_ms: int
+    pending_stream_max_length: int
+    cluster_enabled: bool
+    replica_id: str
+    partition_lease_ttl_ms: int
 
 def get_property(args_value: str, config_file_value: str, default_value: str, prop_type: type):
     if args_value:
@@ -21,18 +60,71 @@ def load_configs(args):
     if not os.path.isfile(args.configFilePath):
         logging.warn(f"Config file is not found: {args.configFilePath}")
         redis_props = {}
+        rest_api_props = {}
         consumer_props = {}
+        dispatch_props = {}
+        retry_props = {}
+        cluster_props = {}
     else:
         properties_config = configparser.RawConfigParser()
         properties_config.read(args.configFilePath)
 
         redis_props = dict(properties_config.items('redis')) if properties_config.has_section('redis') else {}
+        rest_api_props = dict(properties_config.items('rest_api')) if properties_config.has_section('rest_api') else {}
         consumer_props = dict(properties_config.items('consumers')) if properties_config.has_section('consumers') else {}
+        dispatch_props = dict(properties_config.items('dispatch')) if properties_config.has_section('dispatch') else {}
+        retry_props = dict(properties_config.items('retry')) if properties_config.has_section('retry') else {}
+        cluster_props = dict(properties_config.items('cluster')) if properties_config.has_section('cluster') else {}
 
     configs: Configs = Configs(
         redis_host=get_property(args.redisServerHost, redis_props.get("host"), "localhost", str),
         redis_port=get_property(args.redisServerPort, redis_props.get("port"), "6379", int),
+
+        rest_api_host=get_property(args.restApiHost, rest_api_props.get("host"), "127.0.0.1", str),
+        rest_api_port=get_property(args.restApiPort, rest_api_props.get("port"), "5000", int),
+        serving_mode=get_property(args.servingMode, rest_api_props.get("serving_mode"), "development", str),
+        rest_api_threads=get_property(args.apiThreads, rest_api_props.get("threads"), "8", int),
+        rest_api_drain_timeout_seconds=get_property(None, rest_api_props.get("drain_timeout_seconds"), "10", int),
+
         max_consumer_group_size=get_property(args.maxConsumerGroupSize, consumer_props.get("max_consumer_group_size"), "5", int),
+        registry_refresh_interval_ms=get_property(None, consumer_props.get("registry_refresh_interval_ms"), "1000", int),
+        load_balancing_strategy=get_property(args.loadBalancingStrategy, consumer_props.get("load_balancing_strategy"), "random", str),
+        routing_key=get_property(args.routingKey, consumer_props.get("routing_key"), "message_id", str),
+        hash_ring_virtual_nodes=get_property(None, consumer_props.get("hash_ring_virtual_nodes"), "100", int),
+        lease_ttl_ms=get_property(args.leaseTtlMs, consumer_props.get("lease_ttl_ms"), "10000", int),
+        lease_check_interval_ms=get_property(None, consumer_props.get("lease_check_interval_ms"), "1000", int),
+        health_check_interval_seconds=get_property(args.healthCheckIntervalSeconds,
+                                                   consumer_props.get("health_check_interval_seconds"), "30", float),
+        health_check_jitter=get_property(None, consumer_props.get("health_check_jitter"), "0.2", float),
+        health_check_timeout_ms=get_property(None, consumer_props.get("health_check_timeout_ms"), "1000", int),
+        health_check_concurrency=get_property(None, consumer_props.get("health_check_concurrency"), "16", int),
+
+        dispatch_batch_size=get_property(args.dispatchBatchSize, dispatch_props.get("batch_size"), "50", int),
+        dispatch_max_linger_ms=get_property(args.dispatchMaxLingerMs, dispatch_props.get("max_linger_ms"), "20", int),
+        ingestion_buffer_size=get_property(args.ingestionBufferSize, dispatch_props.get("ingestion_buffer_size"),
+                                           "100000", int),
+        pipeline_mode=get_property(args.pipelineMode, dispatch_props.get("pipeline_mode"), "push", str),
+        runtime_mode=get_property(args.runtimeMode, dispatch_props.get("runtime_mode"), "threads", str),
+        listener_processes=get_property(args.listenerProcesses, dispatch_props.get("listener_processes"), "1", int),
+        channel_shards=get_property(args.channelShards, dispatch_props.get("channel_shards"), "0", int),
+        pending_stream_max_length=get_property(None, dispatch_props.get("pending_stream_max_length"), "100000", int),
+        connect_timeout_ms=get_property(None, dispatch_props.get("connect_timeout_ms"), "1000", int),
+        read_timeout_ms=get_property(args.readTimeoutMs, dispatch_props.get("read_timeout_ms"), "10000", int),
+        http_pool_size=get_property(None, dispatch_props.get("http_pool_size"), "10", int),
+        max_in_flight=get_property(args.maxInFlight, dispatch_props.get("max_in_flight"), "32", int),
+        max_in_flight_per_consumer=get_property(None, dispatch_props.get("max_in_flight_per_consumer"), "8", int),
+
+        max_retries=get_property(args.maxRetries, retry_props.get("max_retries"), "3", int),
+        retry_base_delay_ms=get_property(None, retry_props.get("base_delay_ms"), "100", int),
+        retry_max_delay_ms=get_property(None, retry_props.get("max_delay_ms"), "5000", int),
+        max_pending_retries=get_property(None, retry_props.get("max_pending_retries"), "100000", int),
+        circuit_breaker_failure_threshold=get_property(None, retry_props.get("circuit_breaker_failure_threshold"), "5", int),
+        circuit_breaker_open_ms=get_property(None, retry_props.get("circuit_breaker_open_ms"), "10000", int),
+        circuit_breaker_recovery_ms=get_property(None, retry_props.get("circuit_breaker_recovery_ms"), "10000", int),
+
+        cluster_enabled=get_property(args.clusterEnabled, cluster_props.get("enabled"), "false", str).lower() == "true",
+        replica_id=get_property(args.replicaId, cluster_props.get("replica_id"), f"{socket.gethostname()}:{os.getpid()}", str),
+        partition_lease_ttl_ms=get_property(None, cluster_props.get("partition_lease_ttl_ms"), "5000", int),
     )
 
     return configs
\ No newline at end of file
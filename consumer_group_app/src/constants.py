@@ -1 +1,13 @@
-CONSUMER_GROUP_CONTEXT_KEY = "consumer_group"
\ No newline at end of file
+CONSUMER_GROUP_CONTEXT_KEY = "consumer_group"
+
+PIPELINE_MODE_PUSH = "push"
+PIPELINE_MODE_PULL = "pull"
+PIPELINE_MODES = [PIPELINE_MODE_PUSH, PIPELINE_MODE_PULL]
+
+SERVING_MODE_DEVELOPMENT = "development"
+SERVING_MODE_WAITRESS = "waitress"
+SERVING_MODES = [SERVING_MODE_DEVELOPMENT, SERVING_MODE_WAITRESS]
+
+RUNTIME_MODE_THREADS = "threads"
+RUNTIME_MODE_ASYNCIO = "asyncio"
+RUNTIME_MODES = [RUNTIME_MODE_THREADS, RUNTIME_MODE_ASYNCIO]
\ No newline at end of file
@@ -0,0 +1,46 @@
+import logging
+import aiohttp
+
+from typing import List
+from codec import json_codec
+from codec.json_codec import Message
+from consumer.consumer_client import OVERLOADED_STATUS_CODES, ConsumerOverloadedError
+
+# The asyncio counterpart of ConsumerClient - all clients share one aiohttp session,
+# which keeps the connections to the consumers alive between the requests.
+class AsyncConsumerClient:
+
+    def __init__(self, session: aiohttp.ClientSession, consumer_id: str):
+        self.consumer_app_url = f"http://{consumer_id}"
+        self.session = session
+
+
+    async def check_health(self, timeout_ms: int = None) -> bool:
+        url = f"{self.consumer_app_url}/health"
+        # the timeout of the session is used when the timeout is not given
+        timeout = {"timeout": aiohttp.ClientTimeout(total=timeout_ms / 1000)} if timeout_ms is not None else {}
+        try:
+            async with self.session.get(url, **timeout) as response:
+                return True if response.status == 200 else False
+        except:
+            return False
+
+
+    async def process_msgs(self, msgs: List[Message]) -> List[bool]:
+        url = f"{self.consumer_app_url}/processMessages"
+
+        async with self.session.post(url, data=json_codec.encode_messages(msgs),
+                                     headers={"Content-Type": "application/json"}) as response:
+            if response.status == 200:
+                results = json_codec.loads(await response.read()).get("results", [])
+                if len(results) != len(msgs):
+                    raise Exception(f"Failed to process msgs. Expected {len(msgs)} results, received {len(results)}.")
+                logging.debug(f"Batch of {len(msgs)} messages was sent for processing.")
+                return [result.get("status") == "processed" for result in results]
+            elif response.status in OVERLOADED_STATUS_CODES:
+                raise ConsumerOverloadedError.from_response(response.status, response.headers.get("Retry-After"),
+                                                            await response.read())
+            else:
+                error_msg = f"Failed to process msgs. Status Code: {response.status}; " \
+                            + f"Response content: {await response.read()}"
+                raise Exception(error_msg)
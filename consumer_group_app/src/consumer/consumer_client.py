@@ -1,31 +1,108 @@
 import requests
 import logging
+import threading
 
-from typing import Dict
+from requests.adapters import HTTPAdapter
+from typing import List
+from codec import json_codec
+from codec.json_codec import Message
+
+DEFAULT_CONNECT_TIMEOUT_MS = 1000
+DEFAULT_READ_TIMEOUT_MS = 10000
+DEFAULT_HTTP_POOL_SIZE = 10
+# the consumer rejects the messages with 429 when it is overloaded and with 503 when it is stopping
+OVERLOADED_STATUS_CODES = (429, 503)
+DEFAULT_RETRY_AFTER_SECONDS = 1
+
+# The consumer rejected the messages without processing them - they can be sent to another consumer.
+# retry_after_seconds is the time after which the consumer expects to accept messages again.
+class ConsumerOverloadedError(Exception):
+    def __init__(self, message: str, retry_after_seconds: float = DEFAULT_RETRY_AFTER_SECONDS):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+    @staticmethod
+    def from_response(status_code: int, retry_after: str, content: bytes) -> "ConsumerOverloadedError":
+        try:
+            retry_after_seconds = float(retry_after)
+        except (TypeError, ValueError):
+            retry_after_seconds = DEFAULT_RETRY_AFTER_SECONDS
+        return ConsumerOverloadedError(f"Consumer rejected msgs. Status Code: {status_code}; "
+                                       + f"Response content: {content}", retry_after_seconds)
 
 class ConsumerClient:
 
-    def __init__(self, host: str, port: str):
+    def __init__(self, host: str, port: str, connect_timeout_ms: int = DEFAULT_CONNECT_TIMEOUT_MS,
+                 read_timeout_ms: int = DEFAULT_READ_TIMEOUT_MS, http_pool_size: int = DEFAULT_HTTP_POOL_SIZE):
         self.consumer_app_url = f"http://{host}:{port}"
+        self.timeout = (connect_timeout_ms / 1000, read_timeout_ms / 1000)
+        # the session keeps the connections to the consumer alive between the requests
+        self.session = requests.Session()
+        self.session.headers.update({ "Content-Type": "application/json" })
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=http_pool_size))
+        self.http_pool_size = http_pool_size
+        self._in_flight_count = 0
+        self._in_flight_lock = threading.Lock()
 
 
-    def check_health(self) -> bool:
+    def check_health(self, timeout_ms: int = None) -> bool:
         url = f"{self.consumer_app_url}/health"
+        timeout = self.timeout if timeout_ms is None else (timeout_ms / 1000, timeout_ms / 1000)
         try:
-            response = requests.get(url)
+            response = self.session.get(url, timeout=timeout)
             return True if response.status_code == 200 else False
         except:
             return False
 
 
-    def process_msg(self, msg: Dict) -> None:
+    def process_msg(self, msg: Message) -> None:
         url = f"{self.consumer_app_url}/processMessage"
 
-        headers = { "Content-Type": "application/json" }
-        response = requests.post(url, headers=headers, json=msg)
+        response = self._post(url, json_codec.encode_message(msg))
         if response.status_code == 200:
             logging.debug(f"Message {msg} was processed successfully.")
+        elif response.status_code in OVERLOADED_STATUS_CODES:
+            raise ConsumerOverloadedError.from_response(response.status_code, response.headers.get("Retry-After"),
+                                                        response.content)
         else:
             error_msg = f"Failed to process msg. Status Code: {response.status_code}; " \
                         + f"Response content: {response.content}"
-            raise Exception(error_msg)
\ No newline at end of file
+            raise Exception(error_msg)
+
+
+    def process_msgs(self, msgs: List[Message]) -> List[bool]:
+        url = f"{self.consumer_app_url}/processMessages"
+
+        response = self._post(url, json_codec.encode_messages(msgs))
+        if response.status_code == 200:
+            results = json_codec.loads(response.content).get("results", [])
+            if len(results) != len(msgs):
+                raise Exception(f"Failed to process msgs. Expected {len(msgs)} results, received {len(results)}.")
+            logging.debug(f"Batch of {len(msgs)} messages was sent for processing.")
+            return [result.get("status") == "processed" for result in results]
+        elif response.status_code in OVERLOADED_STATUS_CODES:
+            raise ConsumerOverloadedError.from_response(response.status_code, response.headers.get("Retry-After"),
+                                                        response.content)
+        else:
+            error_msg = f"Failed to process msgs. Status Code: {response.status_code}; " \
+                        + f"Response content: {response.content}"
+            raise Exception(error_msg)
+
+
+    def in_flight_count(self) -> int:
+        return self._in_flight_count
+
+
+    def close(self) -> None:
+        self.session.close()
+
+
+    def _post(self, url: str, body: bytes) -> requests.Response:
+        # the requests in flight are the connections of the pool in use
+        with self._in_flight_lock:
+            self._in_flight_count += 1
+        try:
+            return self.session.post(url, data=body, timeout=self.timeout)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight_count -= 1
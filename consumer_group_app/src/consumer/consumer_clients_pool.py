@@ -0,0 +1,51 @@
+import logging
+import threading
+
+from typing import Dict
+from consumer.consumer_client import ConsumerClient
+from metrics.metrics import REGISTRY
+
+# Keeps one client (with its own keep-alive HTTP session) per consumer id,
+# so that the connections to the consumers are reused between the requests.
+class ConsumerClientsPool:
+    def __init__(self, connect_timeout_ms: int, read_timeout_ms: int, http_pool_size: int):
+        self.connect_timeout_ms = connect_timeout_ms
+        self.read_timeout_ms = read_timeout_ms
+        self.http_pool_size = http_pool_size
+        self._lock = threading.Lock()
+        self._clients: Dict[str, ConsumerClient] = {}
+
+    def get_client(self, consumer_id: str) -> ConsumerClient:
+        client = self._clients.get(consumer_id)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(consumer_id)
+            if client is None:
+                host, port = consumer_id.split(":")
+                client = ConsumerClient(host, port,
+                                        connect_timeout_ms=self.connect_timeout_ms,
+                                        read_timeout_ms=self.read_timeout_ms,
+                                        http_pool_size=self.http_pool_size)
+                self._clients[consumer_id] = client
+                consumer_labels = {"consumer_id": consumer_id}
+                REGISTRY.gauge("http_pool_in_use", "Connections to the consumer in use.", consumer_labels,
+                               function=client.in_flight_count)
+                REGISTRY.gauge("http_pool_size", "Maximum connections to the consumer kept alive.", consumer_labels,
+                               function=lambda: client.http_pool_size)
+            return client
+
+    def evict(self, consumer_id: str) -> None:
+        with self._lock:
+            client = self._clients.pop(consumer_id, None)
+        if client is not None:
+            logging.info(f"Closing connections to consumer with id: {consumer_id}")
+            client.close()
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
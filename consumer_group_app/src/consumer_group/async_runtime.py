@@ -0,0 +1,375 @@
+import asyncio
+import logging
+import time
+import aiohttp
+import redis.asyncio
+
+from typing import Dict, List, Set, Tuple
+from codec import json_codec
+from codec.json_codec import Message
+from config_parser import Configs
+from consumer.async_consumer_client import AsyncConsumerClient
+from consumer.consumer_client import ConsumerOverloadedError
+from consumer_group.consumer_group import ConsumersGroup
+from consumer_group.consumers_monitor import get_check_delay
+from consumer_group.message_dispatcher import ConsumerSlots
+from consumer_group.dispatch_metrics import MESSAGES_RECEIVED, MESSAGES_PROCESSED, MESSAGES_FAILED, MESSAGES_RETRIED, \
+    record_dispatch_metrics, record_rejected_dispatch
+from consumer_group.retry_scheduler import BatchEntry, RetryTask, get_entry_attempt, get_retry_delay
+from metrics.log_reporter import LogReporter
+from metrics.metrics import REGISTRY, redis_command_latency
+from constants import PIPELINE_MODE_PULL
+
+# Runs the whole messages pipeline of the application on one asyncio event loop: the pub/sub listener,
+# the batching, the dispatching to the consumers, the retries, the consumers registry refreshing,
+# the consumers health checks and the statistics reporting.
+# It works like the threaded pipeline, but the batches in flight are tasks instead of threads,
+# so thousands of concurrent requests to the consumers don't need thousands of threads.
+# The runtime must be created in the running event loop.
+class AsyncRuntime:
+    def __init__(self, consumer_group: ConsumersGroup, configs: Configs, stats_period_in_seconds: int):
+        self.consumer_group = consumer_group
+        self.configs = configs
+        self.batch_size = max(configs.dispatch_batch_size, 1)
+        self._decode_messages = configs.pipeline_mode != PIPELINE_MODE_PULL and consumer_group.needs_message_fields()
+        self.max_linger_in_seconds = configs.dispatch_max_linger_ms / 1000
+        self.max_in_flight_per_consumer = max(configs.max_in_flight_per_consumer, 1)
+        self.stats_reporter = LogReporter(registry=REGISTRY, period_in_seconds=stats_period_in_seconds)
+        self._batches: Dict[str, List[BatchEntry]] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._batch_started = asyncio.Event()
+        self._in_flight_slots = asyncio.Semaphore(max(configs.max_in_flight, 1))
+        self._parked_slots = asyncio.Semaphore(max(configs.max_in_flight, 1))
+        self._consumers_slots: Dict[str, ConsumerSlots] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._in_flight_count = 0
+        self._parked_count = 0
+        self._pending_retries_count = 0
+        self._session: aiohttp.ClientSession = None
+        self._redis: redis.asyncio.Redis = None
+
+    def in_flight_count(self) -> int:
+        return self._in_flight_count
+
+    def parked_count(self) -> int:
+        return self._parked_count
+
+    def pending_retries_count(self) -> int:
+        return self._pending_retries_count
+
+    def pending_count(self) -> int:
+        return sum(len(batch) for batch in list(self._batches.values()))
+
+    async def run(self) -> None:
+        logging.info("Starting asyncio runtime...")
+        connector = aiohttp.TCPConnector(limit=self.configs.max_in_flight, limit_per_host=self.configs.http_pool_size)
+        timeout = aiohttp.ClientTimeout(sock_connect=self.configs.connect_timeout_ms / 1000,
+                                        sock_read=self.configs.read_timeout_ms / 1000)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session, \
+                redis.asyncio.Redis(host=self.configs.redis_host, port=self.configs.redis_port) as redis_client:
+            self._session = session
+            self._redis = redis_client
+            await self.consumer_group.registry.refresh_async(redis_client)
+            loops = [asyncio.create_task(coroutine) for coroutine in (
+                self.consumer_group.registry.run_refreshing_async(redis_client),
+                self._listen_for_messages(),
+                self._flush_expired_batches(),
+                self._expire_leases(),
+                self._monitor_consumers(),
+                self._report_statistics())]
+            try:
+                await asyncio.gather(*loops)
+            finally:
+                for loop in loops:
+                    loop.cancel()
+                logging.info("Sending the pending messages batches...")
+                for consumer_id in list(self._batches):
+                    await self._flush(consumer_id)
+                if self._tasks:
+                    await asyncio.wait(list(self._tasks))
+
+    async def add(self, consumer_id: str, msg: BatchEntry) -> None:
+        batch = self._batches.setdefault(consumer_id, [])
+        if not batch:
+            self._deadlines[consumer_id] = time.monotonic() + self.max_linger_in_seconds
+            # wake up the flusher so that it takes the new deadline into account
+            self._batch_started.set()
+        batch.append(msg)
+        if len(batch) >= self.batch_size:
+            await self._flush(consumer_id)
+
+    async def submit(self, consumer_id: str, batch: List[BatchEntry]) -> None:
+        # a batch above the limit of its consumer is parked without a global slot and it is sent by the task
+        # completing one of the consumer's batches, so a slow consumer doesn't stop the batches of the other consumers.
+        # Submitting waits once max_in_flight batches are being sent or parked (backpressure to the listener)
+        consumer_slots = None
+        if consumer_id != ConsumersGroup.PENDING_MSGS_STREAM_NAME:
+            consumer_slots = self._get_consumer_slots(consumer_id)
+            if consumer_slots.in_flight_count >= self.max_in_flight_per_consumer:
+                await self._parked_slots.acquire()
+                consumer_slots = self._get_consumer_slots(consumer_id)
+                # one of the consumer's batches might have been done while waiting
+                if consumer_slots.in_flight_count >= self.max_in_flight_per_consumer:
+                    consumer_slots.parked_batches.append(batch)
+                    self._parked_count += 1
+                    return
+                self._parked_slots.release()
+            consumer_slots.in_flight_count += 1
+        try:
+            await self._in_flight_slots.acquire()
+        except BaseException:
+            if consumer_slots is not None:
+                consumer_slots.in_flight_count -= 1
+            raise
+        self._in_flight_count += 1
+        self._start_task(self._dispatch(consumer_id, batch, consumer_slots))
+
+    # the slots of a removed consumer are dropped, its batches still in flight send its parked batches
+    def forget(self, consumer_id: str) -> None:
+        self._consumers_slots.pop(consumer_id, None)
+
+    async def _listen_for_messages(self) -> None:
+        logging.info("Starting MSG listener...")
+        while True:
+            try:
+                async with self._redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(*ConsumersGroup.get_channels(self.configs.channel_shards))
+                    async for msg in pubsub.listen():
+                        MESSAGES_RECEIVED.inc()
+                        await self._handle_message(msg)
+            except Exception as ex:
+                logging.error(f"Listen for messages encountered a failure. Will try to connect again in 5 seconds")
+                logging.exception(ex)
+                await asyncio.sleep(5)
+
+    async def _handle_message(self, msg: Dict) -> None:
+        try:
+            # the raw payload is passed on, unless its fields are needed to select the consumer
+            try:
+                msg_data = json_codec.decode_message(msg["data"], keep_raw=not self._decode_messages)
+            except ValueError as ex:
+                # a malformed message would fail every batch it is sent with, so it is not retried
+                logging.error(f"Malformed message: {msg['data']}. {ex}")
+                self._start_task(self._dead_letter(msg["data"], str(ex), 0))
+                return
+            if self.configs.pipeline_mode == PIPELINE_MODE_PULL:
+                await self.add(ConsumersGroup.PENDING_MSGS_STREAM_NAME, msg_data)
+                return
+
+            try:
+                consumer_id = self.consumer_group.get_consumer(msg_data)
+            except Exception as ex:
+                # there is no available consumer at the moment - the message will be tried again later
+                logging.error(f"Failed to select consumer for message: {msg_data}. {ex}")
+                self._schedule_retry(msg_data, 1, (), str(ex))
+                return
+            await self.add(consumer_id, msg_data)
+        except Exception as ex:
+            logging.error(f"Failed to process message: {msg}")
+            logging.exception(ex)
+            MESSAGES_FAILED.inc()
+
+    async def _flush_expired_batches(self) -> None:
+        logging.info("Starting batches flusher...")
+        while True:
+            now = time.monotonic()
+            for consumer_id in [consumer_id for consumer_id, deadline in self._deadlines.items() if deadline <= now]:
+                await self._flush(consumer_id)
+
+            next_deadline = min(self._deadlines.values(), default=None)
+            self._batch_started.clear()
+            try:
+                timeout = None if next_deadline is None else max(next_deadline - time.monotonic(), 0)
+                await asyncio.wait_for(self._batch_started.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush(self, consumer_id: str) -> None:
+        self._deadlines.pop(consumer_id, None)
+        batch = self._batches.pop(consumer_id, [])
+        if batch:
+            await self.submit(consumer_id, batch)
+
+    # sends the batch and then the consumer's parked batches, keeping the slots taken for the first batch until
+    # no batch is parked
+    async def _dispatch(self, consumer_id: str, batch: List[BatchEntry], consumer_slots: ConsumerSlots) -> None:
+        try:
+            while batch is not None:
+                try:
+                    if consumer_id == ConsumersGroup.PENDING_MSGS_STREAM_NAME:
+                        await self._append_to_pending_stream(batch)
+                    else:
+                        await self._send_batch(consumer_id, batch)
+                except Exception as ex:
+                    logging.error(f"Failed to dispatch batch of {len(batch)} messages to consumer with id: {consumer_id}")
+                    logging.exception(ex)
+                batch = self._take_parked_batch(consumer_slots)
+        finally:
+            self._in_flight_count -= 1
+            self._in_flight_slots.release()
+            if consumer_slots is not None:
+                consumer_slots.in_flight_count -= 1
+
+    def _take_parked_batch(self, consumer_slots: ConsumerSlots) -> List[BatchEntry]:
+        if consumer_slots is None or not consumer_slots.parked_batches:
+            return None
+        self._parked_count -= 1
+        self._parked_slots.release()
+        return consumer_slots.parked_batches.popleft()
+
+    async def _send_batch(self, consumer_id: str, entries: List[BatchEntry]) -> None:
+        batch = [get_entry_attempt(entry)[0] for entry in entries]
+        start_time = time.monotonic()
+        error_reason = "Message was not processed by the consumer."
+        request_succeeded = False
+        overloaded_latency = None
+        try:
+            logging.info(f"Sending batch of {len(batch)} messages to consumer with id: {consumer_id}")
+            results = await self._get_client(consumer_id).process_msgs(batch)
+            request_succeeded = True
+        except ConsumerOverloadedError as ex:
+            # rejected by an overloaded consumer - the retries send the messages to another one
+            logging.warning(f"Consumer with id: {consumer_id} rejected batch of {len(batch)} messages. {ex}")
+            error_reason = str(ex)
+            results = [False] * len(batch)
+            overloaded_latency = ex.retry_after_seconds
+            record_rejected_dispatch(consumer_id, len(batch))
+        except Exception as ex:
+            logging.error(f"Failed to process batch of {len(batch)} messages by consumer with id: {consumer_id}")
+            logging.exception(ex)
+            error_reason = str(ex)
+            results = [False] * len(batch)
+        finally:
+            latency = time.monotonic() - start_time
+            self.consumer_group.record_dispatch(consumer_id, len(batch), max(latency, overloaded_latency or 0),
+                                                request_succeeded, overloaded=overloaded_latency is not None)
+
+        record_dispatch_metrics(consumer_id, len(batch), sum(results), latency)
+        # the failed messages are sent again (preferably to another consumer) after a backoff delay
+        for entry, is_processed in zip(entries, results):
+            if not is_processed:
+                msg, attempt, tried_consumers = get_entry_attempt(entry)
+                logging.error(f"Failed to process message: {msg}")
+                self._schedule_retry(msg, attempt + 1, tried_consumers + (consumer_id,), error_reason)
+
+    async def _append_to_pending_stream(self, batch: List[Message]) -> None:
+        try:
+            pipeline = self._redis.pipeline(transaction=False)
+            for msg in batch:
+                pipeline.xadd(ConsumersGroup.PENDING_MSGS_STREAM_NAME, {"data": json_codec.encode_message(msg)},
+                              maxlen=self.consumer_group.pending_stream_max_length, approximate=True)
+            with redis_command_latency("xadd").time():
+                responses = await pipeline.execute(raise_on_error=False)
+            results = [not isinstance(response, Exception) for response in responses]
+        except Exception as ex:
+            logging.error(f"Failed to append batch of {len(batch)} messages to stream {ConsumersGroup.PENDING_MSGS_STREAM_NAME}")
+            logging.exception(ex)
+            results = [False] * len(batch)
+
+        processed_count = sum(results)
+        MESSAGES_PROCESSED.inc(processed_count)
+        MESSAGES_FAILED.inc(len(results) - processed_count)
+
+    def _schedule_retry(self, msg: Message, attempt: int, tried_consumers: Tuple[str, ...], reason: str) -> None:
+        if attempt > self.configs.max_retries:
+            self._start_task(self._dead_letter(msg, reason, attempt - 1))
+            return
+        if 0 < self.configs.max_pending_retries <= self._pending_retries_count:
+            reason = f"{self._pending_retries_count} messages are waiting to be retried. {reason}"
+            self._start_task(self._dead_letter(msg, reason, attempt - 1))
+            return
+
+        MESSAGES_RETRIED.inc()
+        self._pending_retries_count += 1
+        delay = get_retry_delay(attempt, self.configs.retry_base_delay_ms / 1000, self.configs.retry_max_delay_ms / 1000)
+        asyncio.get_running_loop().call_later(delay, self._start_retry, msg, attempt, tried_consumers, reason)
+
+    def _start_retry(self, msg: Message, attempt: int, tried_consumers: Tuple[str, ...], reason: str) -> None:
+        self._start_task(self._retry(msg, attempt, tried_consumers, reason))
+
+    async def _retry(self, msg: Message, attempt: int, tried_consumers: Tuple[str, ...], reason: str) -> None:
+        self._pending_retries_count -= 1
+        try:
+            consumer_id = self.consumer_group.get_consumer(msg, excluded_consumers=tried_consumers)
+        except Exception as ex:
+            logging.error(f"Failed to retry message: {msg}")
+            logging.exception(ex)
+            self._schedule_retry(msg, attempt + 1, tried_consumers, str(ex))
+            return
+        logging.info(f"Retrying msg '{msg}' (attempt {attempt}) with consumer with id: {consumer_id}")
+        # the retried message is batched with the other messages of the selected consumer
+        await self.add(consumer_id, RetryTask(due_time=time.monotonic(), sequence=0, msg=msg, attempt=attempt,
+                                              tried_consumers=tried_consumers, reason=reason))
+
+    async def _dead_letter(self, msg: Message, reason: str, attempts: int) -> None:
+        logging.error(f"Message '{msg}' failed after {attempts} retries. Moving it to the dead letter stream.")
+        MESSAGES_FAILED.inc()
+        try:
+            with redis_command_latency("xadd").time():
+                await self._redis.xadd(ConsumersGroup.DEAD_LETTER_STREAM_NAME,
+                                       {"data": json_codec.encode_message(msg), "error": reason, "attempts": attempts},
+                                       maxlen=ConsumersGroup.DEAD_LETTER_STREAM_MAX_LENGTH, approximate=True)
+        except Exception as ex:
+            logging.error(f"Failed to move message to the dead letter stream: {msg}")
+            logging.exception(ex)
+
+    async def _expire_leases(self) -> None:
+        logging.info("Starting consumers leases expiring...")
+        while True:
+            try:
+                # the leases rarely expire, so it is done with the blocking Redis client in a separate thread
+                await asyncio.to_thread(self.consumer_group.remove_expired_consumers)
+            except Exception as ex:
+                logging.error("Failed to remove consumers with expired leases.")
+                logging.exception(ex)
+
+            await asyncio.sleep(self.configs.lease_check_interval_ms / 1000)
+
+    async def _monitor_consumers(self) -> None:
+        logging.info("Starting consumers health monitoring.")
+        while True:
+            delay = get_check_delay(self.configs.health_check_interval_seconds, self.configs.health_check_jitter)
+            try:
+                logging.info("Checking consumers health.")
+                consumers = self.consumer_group.registry.get_consumers()
+                healthy = await asyncio.gather(*[self._get_client(consumer_id).check_health(
+                                                     timeout_ms=self.configs.health_check_timeout_ms)
+                                                 for consumer_id in consumers])
+                for consumer_id, is_healthy in zip(consumers, healthy):
+                    if not is_healthy:
+                        logging.info(f"Consumer with id {consumer_id} is not healthy. Removing it from subscribers list.")
+                        # the removal is rare, so it is done with the blocking Redis client in a separate thread
+                        await asyncio.to_thread(self.consumer_group.remove_consumer, consumer_id)
+            except Exception as ex:
+                error_msg = f"Exception raised in consumers monitoring flow. Will try again in {delay:.0f} seconds"
+                logging.error(error_msg)
+                logging.exception(ex)
+
+            await asyncio.sleep(delay)
+
+    async def _report_statistics(self) -> None:
+        logging.info("Starting Statistics Reporter ...")
+        while True:
+            await asyncio.sleep(self.stats_reporter.period_in_seconds)
+            try:
+                for line in self.stats_reporter.report():
+                    logging.info(line)
+            except Exception as ex:
+                logging.error("Failed to report statistics.")
+                logging.exception(ex)
+
+    def _get_client(self, consumer_id: str) -> AsyncConsumerClient:
+        return AsyncConsumerClient(self._session, consumer_id)
+
+    def _get_consumer_slots(self, consumer_id: str) -> ConsumerSlots:
+        slots = self._consumers_slots.get(consumer_id)
+        if slots is None:
+            slots = ConsumerSlots()
+            self._consumers_slots[consumer_id] = slots
+        return slots
+
+    def _start_task(self, coroutine) -> None:
+        # the running tasks are referenced until they are done, so that they are not garbage collected
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,73 @@
+import logging
+import random
+import threading
+import time
+
+from typing import Dict
+
+# Circuit breakers for the consumers - after failure_threshold consecutive failed requests to a consumer,
+# its circuit is opened and the consumer is skipped for open_duration_ms. After that time requests are
+# let through again (half-open) - the first success closes the circuit, a failure opens it again.
+# With recovery_duration_ms the recovered consumer is let back in gradually - it gets a share of its messages
+# growing from MIN_RECOVERY_SHARE to all of them over that time, a failure meanwhile opens the circuit again.
+class CircuitBreakers:
+    MIN_RECOVERY_SHARE = 0.1
+
+    def __init__(self, failure_threshold: int, open_duration_ms: int, recovery_duration_ms: int = 0):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.open_duration_in_seconds = open_duration_ms / 1000
+        self.recovery_duration_in_seconds = recovery_duration_ms / 1000
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+        self._recovering_since: Dict[str, float] = {}
+
+    def is_available(self, consumer_id: str) -> bool:
+        open_until = self._open_until.get(consumer_id)
+        return open_until is None or open_until <= time.monotonic()
+
+    # whether a message may be sent to the available consumer - the half-open and recovering consumers
+    # get only a share of the messages
+    def is_admitted(self, consumer_id: str) -> bool:
+        if self.recovery_duration_in_seconds <= 0:
+            return True
+        if consumer_id in self._open_until:
+            return random.random() < CircuitBreakers.MIN_RECOVERY_SHARE
+        recovering_since = self._recovering_since.get(consumer_id)
+        if recovering_since is None:
+            return True
+        share = (time.monotonic() - recovering_since) / self.recovery_duration_in_seconds
+        if share >= 1:
+            with self._lock:
+                if self._recovering_since.pop(consumer_id, None) is not None:
+                    logging.info(f"Consumer with id {consumer_id} is recovered.")
+            return True
+        return random.random() < max(share, CircuitBreakers.MIN_RECOVERY_SHARE)
+
+    def has_open_circuits(self) -> bool:
+        return bool(self._open_until) or bool(self._recovering_since)
+
+    def record_success(self, consumer_id: str) -> None:
+        if consumer_id not in self._failures and consumer_id not in self._open_until:
+            return
+        with self._lock:
+            self._failures.pop(consumer_id, None)
+            if self._open_until.pop(consumer_id, None) is not None:
+                logging.info(f"Circuit for consumer with id {consumer_id} is closed.")
+                if self.recovery_duration_in_seconds > 0:
+                    self._recovering_since[consumer_id] = time.monotonic()
+
+    def record_failure(self, consumer_id: str) -> None:
+        with self._lock:
+            failures = self._failures.get(consumer_id, 0) + 1
+            self._failures[consumer_id] = failures
+            recovering = self._recovering_since.pop(consumer_id, None) is not None
+            if failures >= self.failure_threshold or recovering:
+                self._open_until[consumer_id] = time.monotonic() + self.open_duration_in_seconds
+                logging.warning(f"Circuit for consumer with id {consumer_id} is opened after {failures} consecutive failures.")
+
+    def forget(self, consumer_id: str) -> None:
+        with self._lock:
+            self._failures.pop(consumer_id, None)
+            self._open_until.pop(consumer_id, None)
+            self._recovering_since.pop(consumer_id, None)
@@ -1,65 +1,215 @@
 import logging
 import redis
-import threading
-import random
+import time
 
 from redis.client import PubSub
-from typing import List
+from typing import Callable, List, Sequence, Set
+from codec import json_codec
+from codec.json_codec import Message
+from consumer_group.consumers_registry import ConsumersRegistry
+from consumer_group.membership_scripts import REGISTER_SCRIPT, RENEW_LEASE_SCRIPT, UNREGISTER_SCRIPT, \
+    EXPIRE_LEASES_SCRIPT
+from consumer_group.load_balancing import LoadBalancingStrategy, RandomStrategy
+from consumer_group.circuit_breaker import CircuitBreakers
+from metrics.metrics import redis_command_latency
 
 class ConsumersGroup:
     # TODO this class should be singleton!!!
 
     MSGS_CHANNEL_NAME = "messages:published"
     CONSUMERS_LIST_NAME = "consumer:ids"
+    # the members of the group are the consumers with a lease - a key expiring after the lease TTL
+    # and an entry in the sorted set scored by the lease expiry time (epoch milliseconds)
+    CONSUMER_LEASES_NAME = "consumer:leases"
+    CONSUMER_LEASE_KEY_PREFIX = "consumer:lease:"
+    DEFAULT_LEASE_TTL_MS = 10000
+    PENDING_MSGS_STREAM_NAME = "messages:pending"
+    DEAD_LETTER_STREAM_NAME = "messages:deadletter"
+    DEAD_LETTER_STREAM_MAX_LENGTH = 100000
 
-    def __init__(self, group_members_max_count: int, redis_host: str, redis_port: int):
-        self._lock = threading.Lock()
+    def __init__(self, group_members_max_count: int, redis_host: str, redis_port: int,
+                 pending_stream_max_length: int = 100000, registry_refresh_interval_ms: int = 1000,
+                 load_balancing_strategy: LoadBalancingStrategy = None, circuit_breakers: CircuitBreakers = None,
+                 lease_ttl_ms: int = DEFAULT_LEASE_TTL_MS):
         self.group_members_max_count = group_members_max_count
+        self.lease_ttl_ms = lease_ttl_ms
+        self.pending_stream_max_length = pending_stream_max_length
+        self._removal_listeners: List[Callable[[str], None]] = []
+        self.load_balancing_strategy = load_balancing_strategy or RandomStrategy()
+        self.circuit_breakers = circuit_breakers or CircuitBreakers(failure_threshold=5, open_duration_ms=10000)
         try:
             self.redis_con_pool = redis.ConnectionPool(host=redis_host, port=redis_port)
         except redis.ConnectionError as ex:
             logging.error("Failed to connect to Redis server")
             raise RuntimeError(ex)
 
+        # the scripts are sent with EVALSHA (and loaded by their first call) through the connection given to each call
+        scripts_client = redis.Redis(connection_pool=self.redis_con_pool)
+        self._register_script = scripts_client.register_script(REGISTER_SCRIPT)
+        self._renew_lease_script = scripts_client.register_script(RENEW_LEASE_SCRIPT)
+        self._unregister_script = scripts_client.register_script(UNREGISTER_SCRIPT)
+        self._expire_leases_script = scripts_client.register_script(EXPIRE_LEASES_SCRIPT)
+
+        self.registry = ConsumersRegistry(redis_con_pool=self.redis_con_pool,
+                                          consumers_list_name=ConsumersGroup.CONSUMERS_LIST_NAME,
+                                          refresh_interval_ms=registry_refresh_interval_ms,
+                                          on_consumers_removed=self._on_consumers_removed)
+
     def add_consumer(self, id: str) -> bool:
-        with self._lock, \
+        with redis_command_latency("register").time(), \
+            redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
+            # the registration of a member only renews its lease
+            result = self._register_script(keys=[ConsumersGroup.CONSUMER_LEASES_NAME, ConsumersGroup.CONSUMERS_LIST_NAME,
+                                                 ConsumersRegistry.VERSION_KEY_NAME, ConsumersGroup.get_lease_key(id)],
+                                           args=[id, self._get_lease_expiry(), self.lease_ttl_ms,
+                                                 self.group_members_max_count],
+                                           client=connection)
+        if result == 0:
+            raise Exception(f"Consumer with id {id} cannot be added to the group, because max capacity is reached!")
+        if result == 2:
+            self.registry.refresh()
+        return True
+
+    # extends the lease of the consumer, returns False if the consumer is not a member of the group
+    def renew_lease(self, id: str) -> bool:
+        with redis_command_latency("renew_lease").time(), \
             redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
-            items_count = connection.llen(ConsumersGroup.CONSUMERS_LIST_NAME)
-            if items_count < self.group_members_max_count:
-                id_index = connection.lpos(ConsumersGroup.CONSUMERS_LIST_NAME, id)
-                if id_index == None:
-                    connection.lpush(ConsumersGroup.CONSUMERS_LIST_NAME, id)
-                return True
-            else:
-                raise Exception(f"Consumer with id {id} cannot be added to the group, because max capacity is reached!")
+            renewed = self._renew_lease_script(keys=[ConsumersGroup.CONSUMER_LEASES_NAME, ConsumersGroup.get_lease_key(id)],
+                                               args=[id, self._get_lease_expiry(), self.lease_ttl_ms],
+                                               client=connection)
+        return renewed == 1
 
     def remove_consumer(self, id: str) -> bool:
-        with self._lock, \
+        with redis_command_latency("unregister").time(), \
+            redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
+            removed_items_count = self._unregister_script(keys=[ConsumersGroup.CONSUMER_LEASES_NAME,
+                                                                ConsumersGroup.CONSUMERS_LIST_NAME,
+                                                                ConsumersRegistry.VERSION_KEY_NAME,
+                                                                ConsumersGroup.get_lease_key(id)],
+                                                          args=[id], client=connection)
+        # the removal listeners are notified by the registry once the consumer is missing from the snapshot
+        self.registry.refresh()
+        return True if removed_items_count > 0 else False
+
+    # removes the consumers whose leases expired - they stopped sending heartbeats
+    def remove_expired_consumers(self) -> List[str]:
+        with redis_command_latency("expire_leases").time(), \
             redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
-            removed_items_count = connection.lrem(ConsumersGroup.CONSUMERS_LIST_NAME, count=0, value=id)
-            return True if removed_items_count > 0 else False
+            expired_consumers = self._expire_leases_script(keys=[ConsumersGroup.CONSUMER_LEASES_NAME,
+                                                                 ConsumersGroup.CONSUMERS_LIST_NAME,
+                                                                 ConsumersRegistry.VERSION_KEY_NAME],
+                                                           args=[int(time.time() * 1000)], client=connection)
+        if not expired_consumers:
+            return []
+        logging.info(f"Leases of consumers {expired_consumers} expired. Removing them from subscribers list.")
+        self.registry.refresh()
+        return expired_consumers
+
+    def run_expiring_leases(self, check_interval_ms: int) -> None:
+        logging.info("Starting consumers leases expiring...")
+        while True:
+            try:
+                self.remove_expired_consumers()
+            except Exception as ex:
+                logging.error("Failed to remove consumers with expired leases.")
+                logging.exception(ex)
+
+            time.sleep(check_interval_ms / 1000)
+
+    def _get_lease_expiry(self) -> int:
+        return int(time.time() * 1000) + self.lease_ttl_ms
+
+    @staticmethod
+    def get_lease_key(id: str) -> str:
+        return f"{ConsumersGroup.CONSUMER_LEASE_KEY_PREFIX}{id}"
+
+    def add_removal_listener(self, listener: Callable[[str], None]) -> None:
+        self._removal_listeners.append(listener)
+
+    def _on_consumers_removed(self, ids: Set[str]) -> None:
+        for id in ids:
+            self.load_balancing_strategy.forget(id)
+            self.circuit_breakers.forget(id)
+            for listener in self._removal_listeners:
+                listener(id)
 
     def check_consumer_membership(self, id: str) -> bool:
-        with redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
-            id_index = connection.lpos(name=ConsumersGroup.CONSUMERS_LIST_NAME, value=id)
+        with redis_command_latency("exists").time(), \
+            redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
+            return connection.exists(ConsumersGroup.get_lease_key(id)) > 0
 
     def get_all_consumers(self) -> List[str]:
         with redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
             return [item.decode() for item in connection.lrange(ConsumersGroup.CONSUMERS_LIST_NAME, 0, -1)]
 
-    def get_consumer(self) -> str:
-        with redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
-            items_count = connection.llen(ConsumersGroup.CONSUMERS_LIST_NAME)
-            index = random.randint(0, items_count - 1)
-            consumer_id = connection.lindex(ConsumersGroup.CONSUMERS_LIST_NAME, index)
-            return consumer_id.decode()
+    def get_consumer(self, msg: Message = None, excluded_consumers: Sequence[str] = ()) -> str:
+        consumers = self.registry.get_consumers()
+        if not consumers:
+            raise Exception("There are no consumers registered in the consumer group!")
+        if excluded_consumers or self.circuit_breakers.has_open_circuits():
+            available_consumers = [consumer_id for consumer_id in consumers
+                                   if self.circuit_breakers.is_available(consumer_id)]
+            # the recovering consumers get a growing share of the messages, unless there is no other choice
+            available_consumers = [consumer_id for consumer_id in available_consumers
+                                   if self.circuit_breakers.is_admitted(consumer_id)] or available_consumers
+            # the excluded consumers (e.g. already tried for the message) are used only when there is no other choice
+            consumers = [consumer_id for consumer_id in available_consumers
+                         if consumer_id not in excluded_consumers] or available_consumers
+            if not consumers:
+                raise Exception("There are no available consumers in the consumer group - all circuits are open!")
+        consumer_id = self.load_balancing_strategy.select(consumers, msg)
+        self.load_balancing_strategy.on_selected(consumer_id)
+        return consumer_id
+
+    def needs_message_fields(self) -> bool:
+        return self.load_balancing_strategy.needs_message_fields
 
-    def subscribe_to_channel(self) -> PubSub:
+    # an overloaded consumer, which rejected the messages, is not failing - its circuit is not changed
+    def record_dispatch(self, consumer_id: str, msgs_count: int, latency_in_seconds: float, success: bool,
+                        overloaded: bool = False) -> None:
+        self.load_balancing_strategy.on_completed(consumer_id, msgs_count, latency_in_seconds)
+        if success:
+            self.circuit_breakers.record_success(consumer_id)
+        elif not overloaded:
+            self.circuit_breakers.record_failure(consumer_id)
+
+    def add_to_dead_letter_stream(self, msg: Message, reason: str, attempts: int) -> None:
+        with redis_command_latency("xadd").time(), redis.Redis(connection_pool=self.redis_con_pool) as connection:
+            connection.xadd(ConsumersGroup.DEAD_LETTER_STREAM_NAME,
+                            {"data": json_codec.encode_message(msg), "error": reason, "attempts": attempts},
+                            maxlen=ConsumersGroup.DEAD_LETTER_STREAM_MAX_LENGTH, approximate=True)
+
+    def append_to_pending_stream(self, msgs: List[Message]) -> List[bool]:
+        with redis.Redis(connection_pool=self.redis_con_pool) as connection:
+            pipeline = connection.pipeline(transaction=False)
+            for msg in msgs:
+                pipeline.xadd(ConsumersGroup.PENDING_MSGS_STREAM_NAME, {"data": json_codec.encode_message(msg)},
+                              maxlen=self.pending_stream_max_length, approximate=True)
+            with redis_command_latency("xadd").time():
+                responses = pipeline.execute(raise_on_error=False)
+            return [not isinstance(response, Exception) for response in responses]
+
+    def subscribe_to_channel(self, channels: Sequence[str] = (MSGS_CHANNEL_NAME,)) -> PubSub:
         with redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
             pubsub = connection.pubsub(ignore_subscribe_messages=True)
-            pubsub.subscribe(ConsumersGroup.MSGS_CHANNEL_NAME)
+            # in clustered mode the channels are subscribed once their partitions are owned
+            if channels:
+                pubsub.subscribe(*channels)
             return pubsub
 
+    # The channels listened by a worker: without sharding all messages are published to one channel,
+    # otherwise to "messages:published:<shard>" channels, which are split between the workers.
+    @staticmethod
+    def get_channels(channel_shards: int, worker_index: int = 0, workers_count: int = 1) -> List[str]:
+        if channel_shards <= 0:
+            return [ConsumersGroup.MSGS_CHANNEL_NAME]
+        return [ConsumersGroup.get_channel(shard) for shard in range(channel_shards)
+                if shard % workers_count == worker_index]
+
+    @staticmethod
+    def get_channel(shard: int) -> str:
+        return f"{ConsumersGroup.MSGS_CHANNEL_NAME}:{shard}"
+
     def unsubscribe_from_channel(self) -> None:
         with redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
             pubsub = connection.pubsub(ignore_subscribe_messages=True)
@@ -1,34 +1,60 @@
 import logging
+import random
 import time
 
-from consumer.consumer_client import ConsumerClient
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from consumer.consumer_clients_pool import ConsumerClientsPool
 from consumer_group.consumer_group import ConsumersGroup
 
-# TODO move to config.properties
-CHECK_INTERVAL_IN_MINUTES = 5
+DEFAULT_CHECK_INTERVAL_IN_SECONDS = 30
+DEFAULT_CHECK_JITTER = 0.2
+DEFAULT_CHECK_TIMEOUT_MS = 1000
+DEFAULT_CHECK_CONCURRENCY = 16
 
+# the interval is spread randomly by +/- jitter (fraction of the interval),
+# so that the health checks of several applications don't hit the consumers at the same time
+def get_check_delay(interval_in_seconds: float, jitter: float) -> float:
+    return interval_in_seconds * (1 + random.uniform(-jitter, jitter))
+
+# Checks the health of all consumers of the group at once - each check is limited by the timeout,
+# so a hanging consumer does not delay the checks of the others. The unhealthy consumers are removed from the group.
+# The consumers failing in between the checks are skipped by their circuit breakers (see CircuitBreakers).
 class ConsumerRegistrationsMonitor:
-    def __init__(self, consumer_group: ConsumersGroup):
+    def __init__(self, consumer_group: ConsumersGroup, clients_pool: ConsumerClientsPool,
+                 check_interval_in_seconds: float = DEFAULT_CHECK_INTERVAL_IN_SECONDS,
+                 check_jitter: float = DEFAULT_CHECK_JITTER, check_timeout_ms: int = DEFAULT_CHECK_TIMEOUT_MS,
+                 check_concurrency: int = DEFAULT_CHECK_CONCURRENCY):
         self.consumer_group = consumer_group
+        self.clients_pool = clients_pool
+        self.check_interval_in_seconds = check_interval_in_seconds
+        self.check_jitter = check_jitter
+        self.check_timeout_ms = check_timeout_ms
+        self._executor = ThreadPoolExecutor(max_workers=max(check_concurrency, 1), thread_name_prefix="HealthCheck")
 
     def run_monitoring(self):
         logging.info("Starting consumers health monitoring.")
         while True:
+            delay = get_check_delay(self.check_interval_in_seconds, self.check_jitter)
             try:
-                logging.info("Checking consumers health.")
-                all_consumers = self.consumer_group.get_all_consumers()
-                for consumer_id in all_consumers:
-                    host, port = consumer_id.split(":")
-                    consumer_client = ConsumerClient(host, port)
-
-                    healthy = consumer_client.check_health()
-
-                    if not healthy:
-                        logging.info(f"Consumer with id {consumer_id} is not healthy. Removing it from subscribers list.")
-                        self.consumer_group.remove_consumer(consumer_id)
+                self.check_consumers()
             except Exception as ex:
-                error_msg = f"Exception raised in consumers monitoring flow. Will try again in {CHECK_INTERVAL_IN_MINUTES} minutes"
+                error_msg = f"Exception raised in consumers monitoring flow. Will try again in {delay:.0f} seconds"
                 logging.error(error_msg)
                 logging.exception(ex)
 
-            time.sleep(CHECK_INTERVAL_IN_MINUTES * 60)
+            time.sleep(delay)
+
+    # returns the removed consumers
+    def check_consumers(self) -> List[str]:
+        logging.info("Checking consumers health.")
+        consumers = self.consumer_group.registry.get_consumers()
+        healthy = list(self._executor.map(self._check_health, consumers))
+        unhealthy_consumers = [consumer_id for consumer_id, is_healthy in zip(consumers, healthy) if not is_healthy]
+        for consumer_id in unhealthy_consumers:
+            logging.info(f"Consumer with id {consumer_id} is not healthy. Removing it from subscribers list.")
+            self.consumer_group.remove_consumer(consumer_id)
+        return unhealthy_consumers
+
+    def _check_health(self, consumer_id: str) -> bool:
+        return self.clients_pool.get_client(consumer_id).check_health(timeout_ms=self.check_timeout_ms)
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import threading
+import time
+import redis
+import redis.asyncio
+
+from typing import Callable, Set, Tuple
+from metrics.metrics import redis_command_latency
+
+# Local snapshot of the consumers list, used to select consumers without calling Redis for each message.
+# Every change of the list increments a version counter; the snapshot is reloaded when the counter changes.
+# The consumers missing from the reloaded snapshot (removed by this or by another process) are reported
+# to on_consumers_removed.
+# The snapshot is refreshed by several threads (the refreshing loop and the registration requests), so a snapshot
+# read before a newer one was applied is skipped instead of bringing the old list back.
+class ConsumersRegistry:
+    VERSION_KEY_NAME = "consumer:ids:version"
+
+    def __init__(self, redis_con_pool: redis.ConnectionPool, consumers_list_name: str, refresh_interval_ms: int,
+                 on_consumers_removed: Callable[[Set[str]], None] = None):
+        self.redis_con_pool = redis_con_pool
+        self.consumers_list_name = consumers_list_name
+        self.refresh_interval_in_seconds = refresh_interval_ms / 1000
+        self.on_consumers_removed = on_consumers_removed
+        self._consumers: Tuple[str, ...] = ()
+        self._version = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get_consumers(self) -> Tuple[str, ...]:
+        return self._consumers
+
+    def refresh(self) -> None:
+        with redis.Redis(connection_pool=self.redis_con_pool) as connection:
+            pipeline = connection.pipeline(transaction=True)
+            pipeline.get(ConsumersRegistry.VERSION_KEY_NAME)
+            pipeline.lrange(self.consumers_list_name, 0, -1)
+            with redis_command_latency("lrange").time():
+                version, consumers = pipeline.execute()
+        self._update(version, consumers)
+
+    def is_changed(self, version) -> bool:
+        return not self._loaded or (int(version) if version is not None else 0) != self._version
+
+    def run_refreshing(self) -> None:
+        logging.info("Starting consumers registry refreshing...")
+        while True:
+            try:
+                with redis_command_latency("get").time(), redis.Redis(connection_pool=self.redis_con_pool) as connection:
+                    version = connection.get(ConsumersRegistry.VERSION_KEY_NAME)
+                if self.is_changed(version):
+                    self.refresh()
+                    logging.info(f"Consumers registry is refreshed. Consumers: {list(self._consumers)}")
+            except Exception as ex:
+                logging.error("Failed to refresh consumers registry.")
+                logging.exception(ex)
+
+            time.sleep(self.refresh_interval_in_seconds)
+
+    # the same as refresh and run_refreshing, but with the asyncio Redis client
+    async def refresh_async(self, redis_client: redis.asyncio.Redis) -> None:
+        pipeline = redis_client.pipeline(transaction=True)
+        pipeline.get(ConsumersRegistry.VERSION_KEY_NAME)
+        pipeline.lrange(self.consumers_list_name, 0, -1)
+        with redis_command_latency("lrange").time():
+            version, consumers = await pipeline.execute()
+        self._update(version, consumers)
+
+    async def run_refreshing_async(self, redis_client: redis.asyncio.Redis) -> None:
+        logging.info("Starting consumers registry refreshing...")
+        while True:
+            try:
+                with redis_command_latency("get").time():
+                    version = await redis_client.get(ConsumersRegistry.VERSION_KEY_NAME)
+                if self.is_changed(version):
+                    await self.refresh_async(redis_client)
+                    logging.info(f"Consumers registry is refreshed. Consumers: {list(self._consumers)}")
+            except Exception as ex:
+                logging.error("Failed to refresh consumers registry.")
+                logging.exception(ex)
+
+            await asyncio.sleep(self.refresh_interval_in_seconds)
+
+    def _update(self, version, consumers) -> None:
+        version = int(version) if version is not None else 0
+        with self._lock:
+            if self._loaded and version <= self._version:
+                return
+            previous_consumers = self._consumers
+            current_consumers = tuple(item.decode() for item in consumers)
+            self._consumers = current_consumers
+            self._version = version
+            self._loaded = True
+
+        removed_consumers = set(previous_consumers) - set(current_consumers)
+        if removed_consumers and self.on_consumers_removed:
+            self.on_consumers_removed(removed_consumers)
@@ -0,0 +1,21 @@
+from metrics.metrics import REGISTRY
+
+MESSAGES_RECEIVED = REGISTRY.counter("messages_received_total", "Messages received from the channel.")
+MESSAGES_PROCESSED = REGISTRY.counter("messages_processed_total", "Messages processed by the consumers.")
+MESSAGES_FAILED = REGISTRY.counter("messages_failed_total", "Messages failed after all retries.")
+MESSAGES_RETRIED = REGISTRY.counter("messages_retried_total", "Messages scheduled to be sent again.")
+
+# records the result of a batch sent to a consumer, the metrics are labeled with the consumer id
+def record_dispatch_metrics(consumer_id: str, msgs_count: int, processed_count: int, latency_in_seconds: float) -> None:
+    consumer_labels = {"consumer_id": consumer_id}
+    REGISTRY.counter("messages_dispatched_total", "Messages sent to the consumer.", consumer_labels).inc(msgs_count)
+    REGISTRY.histogram("dispatch_latency_seconds", "Latency of the requests to the consumer.",
+                       consumer_labels).observe(latency_in_seconds)
+    MESSAGES_PROCESSED.inc(processed_count)
+    if processed_count < msgs_count:
+        REGISTRY.counter("messages_dispatch_failed_total", "Messages not processed by the consumer.",
+                         consumer_labels).inc(msgs_count - processed_count)
+
+def record_rejected_dispatch(consumer_id: str, msgs_count: int) -> None:
+    REGISTRY.counter("messages_rejected_total", "Messages rejected by the overloaded consumer.",
+                     {"consumer_id": consumer_id}).inc(msgs_count)
@@ -0,0 +1,28 @@
+import bisect
+import hashlib
+
+from typing import Iterable, List
+
+# Consistent hash ring - each consumer is placed on the ring on several points (virtual nodes) and a key
+# is mapped to the first consumer point following the key's hash. Adding or removing a consumer
+# moves only the keys between its points, i.e. about 1/N of all keys.
+class HashRing:
+    def __init__(self, nodes: Iterable[str], virtual_nodes_count: int):
+        self.nodes = frozenset(nodes)
+        points = sorted(
+            (HashRing.hash(f"{node}#{index}"), node)
+            for node in self.nodes
+            for index in range(virtual_nodes_count)
+        )
+        self._points_hashes: List[int] = [point_hash for point_hash, _ in points]
+        self._points_nodes: List[str] = [node for _, node in points]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def get_node(self, key: str) -> str:
+        if not self._points_hashes:
+            raise Exception("There are no nodes in the hash ring!")
+        index = bisect.bisect(self._points_hashes, HashRing.hash(key)) % len(self._points_hashes)
+        return self._points_nodes[index]
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from collections import deque
+from typing import List
+from codec.json_codec import Message
+from metrics.metrics import REGISTRY
+
+MESSAGES_INGESTION_DROPPED = REGISTRY.counter("ingestion_dropped_total",
+                                              "Messages dropped, because the ingestion buffer was full.")
+INGESTION_LAG = REGISTRY.histogram("ingestion_lag_seconds",
+                                   "Time the messages waited in the ingestion buffer before they were dispatched.")
+
+# A bounded in-process ring buffer between the messages listener and the dispatching of the messages.
+# The listener only appends the received messages, so it keeps up with the channel during bursts and slow dispatching
+# and is not disconnected by Redis for a too big client output buffer. Once the buffer is full, the oldest
+# messages are dropped to make room for the new ones and counted.
+# Like with queue.Queue, the taker reports with task_done when the taken messages are handed over, so that
+# the buffer is drained only once the messages that were taken last are handed over too.
+class IngestionBuffer:
+
+    def __init__(self, capacity: int):
+        self.capacity = max(capacity, 1)
+        self._condition = threading.Condition()
+        # the messages are kept with the time they were received at
+        self._entries = deque(maxlen=self.capacity)
+        self._in_progress_count = 0
+
+    def put(self, msg: Message) -> None:
+        with self._condition:
+            if len(self._entries) == self.capacity:
+                MESSAGES_INGESTION_DROPPED.inc()
+            self._entries.append((time.monotonic(), msg))
+            # the condition is waited for also by wait_until_empty, so all the waiting threads are woken up
+            self._condition.notify_all()
+
+    # returns up to max_count of the oldest messages, waits up to timeout_in_seconds for a message if it is empty
+    def get(self, max_count: int, timeout_in_seconds: float) -> List[Message]:
+        with self._condition:
+            if not self._entries:
+                self._condition.wait(timeout=timeout_in_seconds)
+            entries = [self._entries.popleft() for _ in range(min(max_count, len(self._entries)))]
+            self._in_progress_count += len(entries)
+
+        now = time.monotonic()
+        for received_at, _ in entries:
+            INGESTION_LAG.observe(now - received_at)
+        return [msg for _, msg in entries]
+
+    # reports that count of the taken messages are handed over
+    def task_done(self, count: int) -> None:
+        with self._condition:
+            self._in_progress_count -= count
+            self._condition.notify_all()
+
+    # waits for the messages in the buffer to be taken and handed over, returns whether it happened in time
+    def wait_until_empty(self, timeout_in_seconds: float) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._entries and self._in_progress_count == 0,
+                                            timeout=timeout_in_seconds)
+
+    def pending_count(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,88 @@
+import logging
+import multiprocessing
+import time
+
+from typing import Callable, List, Tuple
+from metrics.metrics import MetricsRegistry
+
+# Runs the messages listeners in separate worker processes, so that parsing, selection and dispatching
+# of the messages use all cores. Each worker subscribes to its own share of the sharded channels.
+# The workers that die are started again. The workers export their metrics to the parent process,
+# where they are aggregated with the metrics of the parent.
+class ListenerWorkers:
+    SUPERVISION_INTERVAL_IN_SECONDS = 1
+
+    def __init__(self, workers_count: int, run_worker: Callable, worker_args: Tuple, registry: MetricsRegistry,
+                 stop_timeout_seconds: int):
+        self.workers_count = workers_count
+        self.run_worker = run_worker
+        self.worker_args = worker_args
+        self.registry = registry
+        self.stop_timeout_seconds = stop_timeout_seconds
+        # the workers are started with a fresh interpreter, as the parent process already runs threads
+        self._context = multiprocessing.get_context("spawn")
+        self._metrics_queue = self._context.Queue()
+        self._processes: List[multiprocessing.Process] = []
+        self._stopping = False
+
+    def start(self) -> None:
+        for worker_index in range(self.workers_count):
+            self._processes.append(self._start_worker(worker_index))
+
+    def alive_count(self) -> int:
+        return sum(1 for process in self._processes if process.is_alive())
+
+    def run_supervising(self) -> None:
+        logging.info("Starting listener workers supervising...")
+        while not self._stopping:
+            time.sleep(ListenerWorkers.SUPERVISION_INTERVAL_IN_SECONDS)
+            for worker_index, process in enumerate(self._processes):
+                if not process.is_alive() and not self._stopping:
+                    logging.error(f"Listener worker {process.name} (pid {process.pid}) exited with code "
+                                  + f"{process.exitcode}. Starting it again.")
+                    self.registry.retire_imported(ListenerWorkers.get_source(process.name, process.pid))
+                    self._processes[worker_index] = self._start_worker(worker_index)
+
+    def run_collecting_metrics(self) -> None:
+        logging.info("Starting listener workers metrics collecting...")
+        while True:
+            try:
+                source, metrics = self._metrics_queue.get()
+                self.registry.import_metrics(source, metrics)
+            except Exception as ex:
+                logging.error("Failed to collect metrics of listener worker.")
+                logging.exception(ex)
+
+    def stop(self) -> None:
+        # the workers send their pending batches before they exit
+        self._stopping = True
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(timeout=self.stop_timeout_seconds)
+            if process.is_alive():
+                logging.error(f"Listener worker {process.name} did not stop in time. Killing it.")
+                process.kill()
+
+    def _start_worker(self, worker_index: int) -> multiprocessing.Process:
+        process = self._context.Process(name=f"MessageListener-{worker_index}", target=self.run_worker,
+                                        args=(worker_index, self.workers_count, self._metrics_queue) + self.worker_args,
+                                        daemon=True)
+        process.start()
+        logging.info(f"Started listener worker {process.name} (pid {process.pid})")
+        return process
+
+    @staticmethod
+    def get_source(process_name: str, pid: int) -> str:
+        return f"{process_name}:{pid}"
+
+# sends the metrics of the worker process to the parent process
+def run_exporting_metrics(metrics_queue: multiprocessing.Queue, source: str, registry: MetricsRegistry,
+                          period_in_seconds: float) -> None:
+    while True:
+        time.sleep(period_in_seconds)
+        try:
+            metrics_queue.put((source, registry.export()))
+        except Exception as ex:
+            logging.error("Failed to export metrics to the parent process.")
+            logging.exception(ex)
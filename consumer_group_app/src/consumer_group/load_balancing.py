@@ -0,0 +1,131 @@
+import itertools
+import random
+import threading
+
+from abc import ABC, abstractmethod
+from typing import Dict, Sequence
+from consumer_group.hash_ring import HashRing
+
+# Base class of the strategies used to select the consumer for a message.
+# It keeps the number of outstanding messages (selected for a consumer, but not processed yet) and
+# an exponentially weighted moving average of the dispatch latency for each consumer.
+class LoadBalancingStrategy(ABC):
+    EWMA_DECAY = 0.3
+    # the messages are decoded before the selection only for the strategies using their fields
+    needs_message_fields = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outstanding: Dict[str, int] = {}
+        self._latencies: Dict[str, float] = {}
+
+    @abstractmethod
+    def select(self, consumers: Sequence[str], msg: Dict = None) -> str:
+        pass
+
+    def on_selected(self, consumer_id: str) -> None:
+        with self._lock:
+            self._outstanding[consumer_id] = self._outstanding.get(consumer_id, 0) + 1
+
+    def on_completed(self, consumer_id: str, msgs_count: int, latency_in_seconds: float) -> None:
+        with self._lock:
+            self._outstanding[consumer_id] = max(self._outstanding.get(consumer_id, 0) - msgs_count, 0)
+            previous_latency = self._latencies.get(consumer_id)
+            if previous_latency is None:
+                self._latencies[consumer_id] = latency_in_seconds
+            else:
+                self._latencies[consumer_id] = LoadBalancingStrategy.EWMA_DECAY * latency_in_seconds \
+                    + (1 - LoadBalancingStrategy.EWMA_DECAY) * previous_latency
+
+    def forget(self, consumer_id: str) -> None:
+        with self._lock:
+            self._outstanding.pop(consumer_id, None)
+            self._latencies.pop(consumer_id, None)
+
+    def get_outstanding(self, consumer_id: str) -> int:
+        return self._outstanding.get(consumer_id, 0)
+
+    def get_latency(self, consumer_id: str) -> float:
+        return self._latencies.get(consumer_id, 0.0)
+
+class RandomStrategy(LoadBalancingStrategy):
+    def select(self, consumers: Sequence[str], msg: Dict = None) -> str:
+        return random.choice(consumers)
+
+class RoundRobinStrategy(LoadBalancingStrategy):
+    def __init__(self):
+        super().__init__()
+        self._counter = itertools.count()
+
+    def select(self, consumers: Sequence[str], msg: Dict = None) -> str:
+        return consumers[next(self._counter) % len(consumers)]
+
+class LeastOutstandingStrategy(LoadBalancingStrategy):
+    def select(self, consumers: Sequence[str], msg: Dict = None) -> str:
+        # the random key breaks the ties, so that idle consumers are selected evenly
+        return min(consumers, key=lambda consumer_id: (self.get_outstanding(consumer_id), random.random()))
+
+# Power of two choices - selects the less loaded from two random consumers.
+class PowerOfTwoChoicesStrategy(LoadBalancingStrategy):
+    def select(self, consumers: Sequence[str], msg: Dict = None) -> str:
+        if len(consumers) == 1:
+            return consumers[0]
+        first, second = random.sample(consumers, 2)
+        return first if self.get_outstanding(first) <= self.get_outstanding(second) else second
+
+# Power of two choices by the expected time to get a response - the latency average multiplied by
+# the outstanding messages, so that slow consumers receive proportionally less messages.
+class EwmaLatencyStrategy(LoadBalancingStrategy):
+    def select(self, consumers: Sequence[str], msg: Dict = None) -> str:
+        if len(consumers) == 1:
+            return consumers[0]
+        first, second = random.sample(consumers, 2)
+        return first if self._get_cost(first) <= self._get_cost(second) else second
+
+    def _get_cost(self, consumer_id: str) -> float:
+        return self.get_latency(consumer_id) * (self.get_outstanding(consumer_id) + 1)
+
+# Routes the messages with the same routing key (the value of a message field) to the same consumer,
+# so that the consumers can keep local state per key. The messages without the field are spread randomly.
+class ConsistentHashStrategy(LoadBalancingStrategy):
+    DEFAULT_ROUTING_KEY = "message_id"
+    DEFAULT_VIRTUAL_NODES_COUNT = 100
+    needs_message_fields = True
+
+    def __init__(self, routing_key: str = DEFAULT_ROUTING_KEY, virtual_nodes_count: int = DEFAULT_VIRTUAL_NODES_COUNT):
+        super().__init__()
+        self.routing_key = routing_key
+        self.virtual_nodes_count = virtual_nodes_count
+        self._ring = HashRing([], virtual_nodes_count)
+        self._ring_consumers: Sequence[str] = ()
+
+    def select(self, consumers: Sequence[str], msg: Dict = None) -> str:
+        key = msg.get(self.routing_key) if msg else None
+        if key is None:
+            return random.choice(consumers)
+
+        ring = self._ring
+        # the registry returns the same snapshot object until the consumers list is reloaded
+        if consumers is not self._ring_consumers:
+            if ring.nodes != frozenset(consumers):
+                ring = HashRing(consumers, self.virtual_nodes_count)
+                self._ring = ring
+            self._ring_consumers = consumers
+        return ring.get_node(str(key))
+
+LOAD_BALANCING_STRATEGIES = {
+    "random": RandomStrategy,
+    "round_robin": RoundRobinStrategy,
+    "least_outstanding": LeastOutstandingStrategy,
+    "p2c": PowerOfTwoChoicesStrategy,
+    "ewma": EwmaLatencyStrategy,
+    "consistent_hash": ConsistentHashStrategy
+}
+
+def create_strategy(name: str, routing_key: str = ConsistentHashStrategy.DEFAULT_ROUTING_KEY,
+                    virtual_nodes_count: int = ConsistentHashStrategy.DEFAULT_VIRTUAL_NODES_COUNT) -> LoadBalancingStrategy:
+    if name not in LOAD_BALANCING_STRATEGIES:
+        raise ValueError(f"Unsupported load balancing strategy {name}. Supported strategies: {list(LOAD_BALANCING_STRATEGIES)}")
+    if name == "consistent_hash":
+        return ConsistentHashStrategy(routing_key=routing_key, virtual_nodes_count=virtual_nodes_count)
+    return LOAD_BALANCING_STRATEGIES[name]()
@@ -0,0 +1,60 @@
+# Lua scripts changing the membership of the consumer group - each one runs atomically in Redis,
+# so the group capacity and the consumers list stay consistent also with several application instances.
+# The scripts are called with EVALSHA, they are loaded in Redis by their first call.
+
+# KEYS: leases sorted set, consumers list, version counter, lease key of the consumer
+# ARGV: consumer id, lease expiry time (epoch milliseconds), lease TTL in milliseconds, max group size
+# returns 1 when the lease of the member is renewed, 2 when the consumer is added, 0 when the group is full
+REGISTER_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+    redis.call('SET', KEYS[4], 1, 'PX', ARGV[3])
+    return 1
+end
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[4]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('SET', KEYS[4], 1, 'PX', ARGV[3])
+redis.call('LPUSH', KEYS[2], ARGV[1])
+redis.call('INCR', KEYS[3])
+return 2
+"""
+
+# KEYS: leases sorted set, lease key of the consumer
+# ARGV: consumer id, lease expiry time (epoch milliseconds), lease TTL in milliseconds
+# returns 1 when the lease is renewed, 0 when the consumer is not a member of the group
+RENEW_LEASE_SCRIPT = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('SET', KEYS[2], 1, 'PX', ARGV[3])
+return 1
+"""
+
+# KEYS: leases sorted set, consumers list, version counter, lease key of the consumer
+# ARGV: consumer id
+# returns the number of removed entries of the consumers list
+UNREGISTER_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('DEL', KEYS[4])
+local removed = redis.call('LREM', KEYS[2], 0, ARGV[1])
+redis.call('INCR', KEYS[3])
+return removed
+"""
+
+# KEYS: leases sorted set, consumers list, version counter
+# ARGV: current time (epoch milliseconds)
+# returns the removed consumers with expired leases
+EXPIRE_LEASES_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('LREM', KEYS[2], 0, id)
+end
+if #expired > 0 then
+    redis.call('INCR', KEYS[3])
+end
+return expired
+"""
@@ -0,0 +1,70 @@
+import logging
+import threading
+import time
+
+from typing import Callable, Dict, List, Tuple
+
+# Collects the messages selected for each consumer and hands them over as one batch.
+# A batch is flushed when it reaches the configured size or when its oldest message
+# has waited longer than the configured linger time.
+class MessageBatcher:
+
+    def __init__(self, batch_size: int, max_linger_ms: int, send_batch: Callable[[str, List[Dict]], None]):
+        self.batch_size = max(batch_size, 1)
+        self.max_linger_in_seconds = max_linger_ms / 1000
+        self.send_batch = send_batch
+        self._condition = threading.Condition()
+        self._batches: Dict[str, List[Dict]] = {}
+        self._deadlines: Dict[str, float] = {}
+
+    def add(self, consumer_id: str, msg: Dict) -> None:
+        ready_batch = None
+        with self._condition:
+            batch = self._batches.setdefault(consumer_id, [])
+            if not batch:
+                self._deadlines[consumer_id] = time.monotonic() + self.max_linger_in_seconds
+                # wake up the flusher so that it takes the new deadline into account
+                self._condition.notify()
+            batch.append(msg)
+            if len(batch) >= self.batch_size:
+                ready_batch = self._pop_batch(consumer_id)
+
+        if ready_batch:
+            self._send(consumer_id, ready_batch)
+
+    def pending_count(self) -> int:
+        return sum(len(batch) for batch in list(self._batches.values()))
+
+    def flush_all(self) -> None:
+        with self._condition:
+            ready_batches = [(consumer_id, self._pop_batch(consumer_id)) for consumer_id in list(self._batches)]
+        self._send_all(ready_batches)
+
+    def run_flushing(self) -> None:
+        logging.info("Starting batches flusher...")
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                expired = [consumer_id for consumer_id, deadline in self._deadlines.items() if deadline <= now]
+                ready_batches = [(consumer_id, self._pop_batch(consumer_id)) for consumer_id in expired]
+                if not ready_batches:
+                    next_deadline = min(self._deadlines.values(), default=None)
+                    timeout = None if next_deadline is None else next_deadline - now
+                    self._condition.wait(timeout=timeout)
+            self._send_all(ready_batches)
+
+    def _pop_batch(self, consumer_id: str) -> List[Dict]:
+        self._deadlines.pop(consumer_id, None)
+        return self._batches.pop(consumer_id, [])
+
+    def _send_all(self, ready_batches: List[Tuple[str, List[Dict]]]) -> None:
+        for consumer_id, batch in ready_batches:
+            if batch:
+                self._send(consumer_id, batch)
+
+    def _send(self, consumer_id: str, batch: List[Dict]) -> None:
+        try:
+            self.send_batch(consumer_id, batch)
+        except Exception as ex:
+            logging.error(f"Failed to send batch of {len(batch)} messages to consumer with id: {consumer_id}")
+            logging.exception(ex)
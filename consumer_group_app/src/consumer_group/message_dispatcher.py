@@ -0,0 +1,120 @@
+import logging
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# The number of batches of a consumer that are in flight and the batches waiting for one of them to be done
+class ConsumerSlots:
+    def __init__(self):
+        self.in_flight_count = 0
+        self.parked_batches: Deque = deque()
+
+# Sends the batches of messages to the consumers from a pool of worker threads, so that several
+# requests are in flight at the same time.
+# The number of batches in flight is limited globally and per consumer. Submitting a batch never waits for
+# its consumer - a batch above the limit of its consumer is parked and it is sent by the thread that
+# completes one of the consumer's batches, so a slow consumer doesn't stop the batches of the other consumers.
+# Submitting blocks until one of the in-flight batches is done when the global limit is reached, or when
+# max_in_flight batches are already parked (backpressure).
+class MessageDispatcher:
+    def __init__(self, max_in_flight: int, max_in_flight_per_consumer: int,
+                 send_batch: Callable[[str, List[Dict]], None]):
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_in_flight_per_consumer = max(max_in_flight_per_consumer, 1)
+        self.send_batch = send_batch
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="Dispatcher")
+        self._in_flight_slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._parked_slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._consumers_slots: Dict[str, ConsumerSlots] = {}
+        self._in_flight_count = 0
+        self._parked_count = 0
+
+    def submit(self, consumer_id: str, batch: List[Dict],
+               send_batch: Callable[[str, List[Dict]], None] = None) -> None:
+        send_batch = send_batch or self.send_batch
+        consumer_slots = self._take_consumer_slot(consumer_id)
+        if consumer_slots is None:
+            self._parked_slots.acquire()
+            # one of the consumer's batches might have been done while waiting
+            consumer_slots = self._take_consumer_slot(consumer_id, park=(batch, send_batch))
+            if consumer_slots is None:
+                return
+            self._parked_slots.release()
+
+        self._in_flight_slots.acquire()
+        with self._lock:
+            self._in_flight_count += 1
+        try:
+            self._executor.submit(self._dispatch, consumer_id, batch, send_batch, consumer_slots)
+        except Exception:
+            self._release_slots(consumer_slots)
+            raise
+
+    def in_flight_count(self) -> int:
+        return self._in_flight_count
+
+    def parked_count(self) -> int:
+        return self._parked_count
+
+    # the slots of a removed consumer are dropped, its batches still in flight send its parked batches
+    def forget(self, consumer_id: str) -> None:
+        with self._lock:
+            self._consumers_slots.pop(consumer_id, None)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    # sends the batch and then the consumer's parked batches, keeping the slots taken for the first batch until
+    # no batch is parked
+    def _dispatch(self, consumer_id: str, batch: List[Dict], send_batch: Callable[[str, List[Dict]], None],
+                  consumer_slots: ConsumerSlots) -> None:
+        while batch is not None:
+            try:
+                send_batch(consumer_id, batch)
+            except Exception as ex:
+                logging.error(f"Failed to dispatch batch of {len(batch)} messages to consumer with id: {consumer_id}")
+                logging.exception(ex)
+            batch, send_batch = self._take_parked_batch(consumer_slots)
+
+    # returns the consumer's slots with one of them taken, or None when all of them are taken - then the batch
+    # to park (if any) is added to the consumer's parked batches
+    def _take_consumer_slot(self, consumer_id: str, park: Tuple[List[Dict], Callable[[str, List[Dict]], None]] = None) \
+            -> Optional[ConsumerSlots]:
+        with self._lock:
+            consumer_slots = self._consumers_slots.get(consumer_id)
+            if consumer_slots is None:
+                consumer_slots = ConsumerSlots()
+                self._consumers_slots[consumer_id] = consumer_slots
+            if consumer_slots.in_flight_count >= self.max_in_flight_per_consumer:
+                if park is not None:
+                    consumer_slots.parked_batches.append(park)
+                    self._parked_count += 1
+                return None
+            consumer_slots.in_flight_count += 1
+            return consumer_slots
+
+    # when the consumer has no parked batches its slot is released in the same lock, so that a batch is not
+    # parked after the last check
+    def _take_parked_batch(self, consumer_slots: ConsumerSlots) -> Tuple[List[Dict], Callable[[str, List[Dict]], None]]:
+        with self._lock:
+            if not consumer_slots.parked_batches:
+                self._in_flight_count -= 1
+                consumer_slots.in_flight_count -= 1
+                parked_batch = None
+            else:
+                self._parked_count -= 1
+                parked_batch = consumer_slots.parked_batches.popleft()
+        if parked_batch is None:
+            self._in_flight_slots.release()
+            return None, None
+        self._parked_slots.release()
+        return parked_batch
+
+    def _release_slots(self, consumer_slots: ConsumerSlots) -> None:
+        with self._lock:
+            self._in_flight_count -= 1
+            consumer_slots.in_flight_count -= 1
+        self._in_flight_slots.release()
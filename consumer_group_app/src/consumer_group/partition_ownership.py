@@ -0,0 +1,223 @@
+import logging
+import math
+import threading
+import time
+import zlib
+import redis
+
+from redis.client import PubSub
+from typing import Dict, FrozenSet, Iterator, List
+from consumer_group.consumer_group import ConsumersGroup
+from metrics.metrics import redis_command_latency
+
+# KEYS: owner key of the partition, fencing token counter of the partition
+# ARGV: replica id, lease TTL in milliseconds
+# returns the new fencing token when the partition is claimed, 0 when it is owned by a replica
+CLAIM_PARTITION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. token, 'PX', ARGV[2])
+return token
+"""
+
+# KEYS: owner key of the partition
+# ARGV: owner value (replica id and fencing token), lease TTL in milliseconds
+# returns 1 when the lease is extended, 0 when the partition is owned with another fencing token
+RENEW_PARTITION_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# KEYS: owner key of the partition
+# ARGV: owner value (replica id and fencing token)
+RELEASE_PARTITION_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Splits the sharded messages channels (partitions) between the replicas of the application running in clustered mode,
+# so that each message is dispatched by exactly one replica.
+# Each replica announces itself with a heartbeat in a sorted set scored by its expiry time and owns
+# about partitions / live replicas partitions. A partition is owned with a lease - a key expiring after lease_ttl_ms,
+# which holds the replica id and a fencing token increased by each claim. The owner renews and releases the lease
+# only if it still holds its token, so a replica whose lease expired meanwhile can't affect the new owner.
+# A replica stops listening to a partition once its lease was not confirmed for lease_ttl_ms.
+# The ownership is advisory - the fencing token guards only the lease, it is not checked downstream, so the messages
+# received while the partition was owned are dispatched even after the lease is lost.
+class PartitionOwnership:
+    REPLICAS_NAME = "consumer_group:replicas"
+    PARTITION_KEY_PREFIX = "consumer_group:partition:"
+    EXPIRY_CHECK_INTERVAL_IN_SECONDS = 0.1
+
+    def __init__(self, redis_con_pool: redis.ConnectionPool, replica_id: str, partitions_count: int,
+                 lease_ttl_ms: int):
+        self.redis_con_pool = redis_con_pool
+        self.replica_id = replica_id
+        self.partitions_count = partitions_count
+        self.lease_ttl_ms = lease_ttl_ms
+        self.rebalance_interval_in_seconds = lease_ttl_ms / 3000
+        # the leases are confirmed by the rebalancing thread and dropped by the listener once expired
+        self._lock = threading.Lock()
+        # owned partition -> owner value (replica id and fencing token)
+        self._owned: Dict[int, str] = {}
+        # owned partition -> time (monotonic) until which the lease is confirmed
+        self._lease_deadlines: Dict[int, float] = {}
+        self.owned_channels: FrozenSet[str] = frozenset()
+
+        scripts_client = redis.Redis(connection_pool=self.redis_con_pool)
+        self._claim_script = scripts_client.register_script(CLAIM_PARTITION_SCRIPT)
+        self._renew_script = scripts_client.register_script(RENEW_PARTITION_SCRIPT)
+        self._release_script = scripts_client.register_script(RELEASE_PARTITION_SCRIPT)
+
+    def owned_count(self) -> int:
+        return len(self._owned)
+
+    def rebalance(self) -> None:
+        with redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
+            replicas_count = self._send_heartbeat(connection)
+            self._renew_leases(connection)
+
+            target_count = math.ceil(self.partitions_count / max(replicas_count, 1))
+            for partition in sorted(list(self._owned), reverse=True)[:max(len(self._owned) - target_count, 0)]:
+                # the partitions above the fair share are left to the other replicas
+                self._release(connection, partition)
+            if len(self._owned) < target_count:
+                for partition in self._get_claim_order():
+                    if len(self._owned) >= target_count:
+                        break
+                    if partition not in self._owned:
+                        self._claim(connection, partition)
+        self._update_owned_channels()
+
+    def run_rebalancing(self) -> None:
+        logging.info(f"Starting partitions rebalancing of replica {self.replica_id}...")
+        while True:
+            try:
+                self.rebalance()
+            except Exception as ex:
+                logging.error("Failed to rebalance partitions.")
+                logging.exception(ex)
+                # the partitions whose leases can't be confirmed are not listened anymore
+                self._drop_expired_leases()
+                self._update_owned_channels()
+
+            time.sleep(self.rebalance_interval_in_seconds)
+
+    def release_all(self) -> None:
+        with redis.Redis(connection_pool=self.redis_con_pool, decode_responses=True) as connection:
+            for partition in list(self._owned):
+                self._release(connection, partition)
+            connection.zrem(PartitionOwnership.REPLICAS_NAME, self.replica_id)
+        self._update_owned_channels()
+
+    # yields the messages published to the owned partitions, the subscriptions follow the ownership changes
+    def listen(self, pubsub: PubSub) -> Iterator[Dict]:
+        subscribed_channels: FrozenSet[str] = frozenset()
+        next_expiry_check = 0
+        while True:
+            # the listener doesn't wait for the rebalancing (e.g. blocked by Redis) to stop listening to expired leases
+            if time.monotonic() >= next_expiry_check:
+                self._drop_expired_leases()
+                self._update_owned_channels()
+                next_expiry_check = time.monotonic() + PartitionOwnership.EXPIRY_CHECK_INTERVAL_IN_SECONDS
+            owned_channels = self.owned_channels
+            if owned_channels is not subscribed_channels:
+                if subscribed_channels - owned_channels:
+                    pubsub.unsubscribe(*(subscribed_channels - owned_channels))
+                if owned_channels - subscribed_channels:
+                    pubsub.subscribe(*(owned_channels - subscribed_channels))
+                subscribed_channels = owned_channels
+                logging.info(f"Listening to partitions channels: {sorted(subscribed_channels)}")
+            if not subscribed_channels:
+                time.sleep(0.1)
+                continue
+            msg = pubsub.get_message(timeout=0.1)
+            # the messages of the channels just unsubscribed are dropped
+            if msg is not None and msg["channel"].decode() in subscribed_channels:
+                yield msg
+
+    def _send_heartbeat(self, connection: redis.Redis) -> int:
+        now_ms = int(time.time() * 1000)
+        pipeline = connection.pipeline(transaction=False)
+        pipeline.zadd(PartitionOwnership.REPLICAS_NAME, {self.replica_id: now_ms + self.lease_ttl_ms})
+        pipeline.zremrangebyscore(PartitionOwnership.REPLICAS_NAME, "-inf", now_ms)
+        pipeline.zcard(PartitionOwnership.REPLICAS_NAME)
+        with redis_command_latency("zadd").time():
+            _, _, replicas_count = pipeline.execute()
+        return replicas_count
+
+    def _renew_leases(self, connection: redis.Redis) -> None:
+        for partition, owner in list(self._owned.items()):
+            deadline = time.monotonic() + self.lease_ttl_ms / 1000
+            with redis_command_latency("renew_partition").time():
+                renewed = self._renew_script(keys=[PartitionOwnership.get_partition_key(partition)],
+                                             args=[owner, self.lease_ttl_ms], client=connection)
+            if renewed:
+                with self._lock:
+                    if partition in self._owned:
+                        self._lease_deadlines[partition] = deadline
+            else:
+                logging.warning(f"Replica {self.replica_id} lost the ownership of partition {partition}.")
+                self._forget(partition)
+
+    def _claim(self, connection: redis.Redis, partition: int) -> None:
+        deadline = time.monotonic() + self.lease_ttl_ms / 1000
+        with redis_command_latency("claim_partition").time():
+            token = self._claim_script(keys=[PartitionOwnership.get_partition_key(partition),
+                                             PartitionOwnership.get_token_key(partition)],
+                                       args=[self.replica_id, self.lease_ttl_ms], client=connection)
+        if token:
+            logging.info(f"Replica {self.replica_id} claimed partition {partition} with fencing token {token}.")
+            with self._lock:
+                self._owned[partition] = f"{self.replica_id}:{token}"
+                self._lease_deadlines[partition] = deadline
+
+    def _release(self, connection: redis.Redis, partition: int) -> None:
+        owner = self._owned.get(partition)
+        # the partition is not listened anymore before the lease is released
+        self._forget(partition)
+        self._update_owned_channels()
+        with redis_command_latency("release_partition").time():
+            self._release_script(keys=[PartitionOwnership.get_partition_key(partition)], args=[owner],
+                                 client=connection)
+        logging.info(f"Replica {self.replica_id} released partition {partition}.")
+
+    def _forget(self, partition: int) -> None:
+        with self._lock:
+            self._owned.pop(partition, None)
+            self._lease_deadlines.pop(partition, None)
+
+    def _drop_expired_leases(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            expired_partitions = [partition for partition, deadline in self._lease_deadlines.items() if deadline <= now]
+            for partition in expired_partitions:
+                logging.warning(f"Lease of partition {partition} is not confirmed. Replica {self.replica_id} stops listening to it.")
+                self._owned.pop(partition, None)
+                self._lease_deadlines.pop(partition, None)
+
+    def _update_owned_channels(self) -> None:
+        with self._lock:
+            owned_channels = frozenset(ConsumersGroup.get_channel(partition) for partition in self._owned)
+            if owned_channels != self.owned_channels:
+                self.owned_channels = owned_channels
+
+    # the replicas start claiming from different partitions, so that they rarely compete for the same ones
+    def _get_claim_order(self) -> List[int]:
+        offset = zlib.crc32(self.replica_id.encode()) % self.partitions_count
+        return [(offset + index) % self.partitions_count for index in range(self.partitions_count)]
+
+    @staticmethod
+    def get_partition_key(partition: int) -> str:
+        return f"{PartitionOwnership.PARTITION_KEY_PREFIX}{partition}:owner"
+
+    @staticmethod
+    def get_token_key(partition: int) -> str:
+        return f"{PartitionOwnership.PARTITION_KEY_PREFIX}{partition}:token"
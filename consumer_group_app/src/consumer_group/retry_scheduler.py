@@ -0,0 +1,94 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple, Union
+from codec.json_codec import Message
+
+@dataclass(order=True)
+class RetryTask:
+    due_time: float
+    sequence: int
+    msg: Message = field(compare=False)
+    attempt: int = field(compare=False)
+    tried_consumers: Tuple[str, ...] = field(compare=False)
+    reason: str = field(compare=False)
+
+# The retried messages are batched together with the other messages of their consumer, as their retry tasks,
+# so that the attempts and the tried consumers of the messages are known when the batch is sent.
+BatchEntry = Union[Message, RetryTask]
+
+# the message of a batch entry with its attempt (0 - the message is sent for the first time) and tried consumers
+def get_entry_attempt(entry: BatchEntry) -> Tuple[Message, int, Tuple[str, ...]]:
+    if isinstance(entry, RetryTask):
+        return entry.msg, entry.attempt, entry.tried_consumers
+    return entry, 0, ()
+
+# capped exponential backoff with full jitter
+def get_retry_delay(attempt: int, base_delay_in_seconds: float, max_delay_in_seconds: float) -> float:
+    return random.uniform(0, min(max_delay_in_seconds, base_delay_in_seconds * 2 ** (attempt - 1)))
+
+# Schedules the failed messages to be sent again after a capped exponential backoff with full jitter.
+# The retries are executed from a separate thread, so they don't block the messages listener.
+# The messages that failed more than max_retries times are handed over to the dead letter handler,
+# as well as the failed messages once max_pending_retries messages wait to be sent again (0 - no limit),
+# so that the pending retries don't grow without a bound while the consumers are failing.
+class RetryScheduler:
+    def __init__(self, max_retries: int, base_delay_ms: int, max_delay_ms: int,
+                 dead_letter: Callable[[Message, str, int], None], max_pending_retries: int = 0):
+        self.max_retries = max_retries
+        self.max_pending_retries = max_pending_retries
+        self.base_delay_in_seconds = base_delay_ms / 1000
+        self.max_delay_in_seconds = max_delay_ms / 1000
+        self.dead_letter = dead_letter
+        self._condition = threading.Condition()
+        self._tasks: List[RetryTask] = []
+        self._sequence = itertools.count()
+
+    def schedule(self, msg: Message, attempt: int, tried_consumers: Tuple[str, ...], reason: str) -> bool:
+        if attempt > self.max_retries:
+            self._dead_letter(msg, reason, attempt - 1)
+            return False
+
+        delay = get_retry_delay(attempt, self.base_delay_in_seconds, self.max_delay_in_seconds)
+        task = RetryTask(due_time=time.monotonic() + delay, sequence=next(self._sequence), msg=msg,
+                         attempt=attempt, tried_consumers=tried_consumers, reason=reason)
+        with self._condition:
+            pending_count = len(self._tasks)
+            is_scheduled = not 0 < self.max_pending_retries <= pending_count
+            if is_scheduled:
+                heapq.heappush(self._tasks, task)
+                self._condition.notify()
+        if not is_scheduled:
+            self._dead_letter(msg, f"{pending_count} messages are waiting to be retried. {reason}", attempt - 1)
+        return is_scheduled
+
+    def pending_count(self) -> int:
+        return len(self._tasks)
+
+    def run_scheduling(self, retry: Callable[[RetryTask], None]) -> None:
+        logging.info("Starting retry scheduler...")
+        while True:
+            with self._condition:
+                while not self._tasks or self._tasks[0].due_time > time.monotonic():
+                    timeout = self._tasks[0].due_time - time.monotonic() if self._tasks else None
+                    self._condition.wait(timeout=timeout)
+                task = heapq.heappop(self._tasks)
+
+            try:
+                retry(task)
+            except Exception as ex:
+                logging.error(f"Failed to retry message: {task.msg}")
+                logging.exception(ex)
+                self.schedule(task.msg, task.attempt + 1, task.tried_consumers, str(ex))
+
+    def _dead_letter(self, msg: Message, reason: str, attempts: int) -> None:
+        try:
+            self.dead_letter(msg, reason, attempts)
+        except Exception as ex:
+            logging.error(f"Failed to move message to the dead letter stream: {msg}")
+            logging.exception(ex)
@@ -0,0 +1,26 @@
+import pytest
+
+from unittest.mock import MagicMock
+
+from api.api_server import ApiServer
+from api.consumer_group_api import create_app
+from constants import CONSUMER_GROUP_CONTEXT_KEY
+
+def test_serve_unsupported_mode():
+    api_server = ApiServer(host="127.0.0.1", port=5000, serving_mode="unknown", threads=2, drain_timeout_seconds=1)
+
+    with pytest.raises(ValueError):
+        api_server.serve(create_app(MagicMock()))
+
+def test_shutdown_not_started_server():
+    api_server = ApiServer(host="127.0.0.1", port=5000, serving_mode="waitress", threads=2, drain_timeout_seconds=1)
+
+    api_server.shutdown()
+
+def test_apps_keep_own_consumer_group():
+    first_group, second_group = MagicMock(), MagicMock()
+
+    first_app, second_app = create_app(first_group), create_app(second_group)
+
+    assert first_app.extensions[CONSUMER_GROUP_CONTEXT_KEY] is first_group
+    assert second_app.extensions[CONSUMER_GROUP_CONTEXT_KEY] is second_group
@@ -2,18 +2,20 @@ import pytest
 
 from unittest.mock import patch, MagicMock
 
-from api.consumer_group_api import rest_api_app
+from api.consumer_group_api import create_app
 from constants import CONSUMER_GROUP_CONTEXT_KEY
 
+rest_api_app = create_app(MagicMock())
+
 @pytest.fixture
 def client():
     with rest_api_app.test_client() as client:
         mock = MagicMock()
-        setattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY, mock)
+        rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY] = mock
         yield client
 
 def test_register_success(client):
-    mock_consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
     mock_consumer_group.add_consumer.return_value = True
 
     data = {"consumer_id": "localhost:5000"}
@@ -38,7 +40,7 @@ def test_register_validation_failure(client):
         assert b"Provided data does not match requirements" in response.data
 
 def test_register_internal_error(client):
-    mock_consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
     mock_consumer_group.add_consumer.side_effect = Exception("Some error")
 
     data = {"consumer_id": "localhost:5000"}
@@ -48,7 +50,7 @@ def test_register_internal_error(client):
     assert b"Failed to register consumer! Use Ref for details:" in response.data
 
 def test_unregister_success(client):
-    mock_consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
     mock_consumer_group.remove_consumer.return_value = True
 
     data = {"consumer_id": "localhost:5000"}
@@ -73,7 +75,7 @@ def test_unregister_validation_failure(client):
         assert b"Provided data does not match requirements" in response.data
 
 def test_unregister_internal_error(client):
-    mock_consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
     mock_consumer_group.remove_consumer.side_effect = Exception("Some error")
 
     data = {"consumer_id": "localhost:5000"}
@@ -82,8 +84,38 @@ def test_unregister_internal_error(client):
     assert response.status_code == 500
     assert b"Failed to unregister consumer! Use Ref for details:" in response.data
 
+def test_heartbeat_success(client):
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
+    mock_consumer_group.renew_lease.return_value = True
+
+    data = {"consumer_id": "localhost:5000"}
+    response = client.post('/heartbeat', json=data)
+
+    assert response.status_code == 200
+    mock_consumer_group.renew_lease.assert_called_once_with("localhost:5000")
+
+def test_heartbeat_not_member(client):
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
+    mock_consumer_group.renew_lease.return_value = False
+
+    data = {"consumer_id": "localhost:5000"}
+    response = client.post('/heartbeat', json=data)
+
+    assert response.status_code == 404
+    assert b'"is_member":false' in response.data
+
+def test_heartbeat_internal_error(client):
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
+    mock_consumer_group.renew_lease.side_effect = Exception("Some error")
+
+    data = {"consumer_id": "localhost:5000"}
+    response = client.post('/heartbeat', json=data)
+
+    assert response.status_code == 500
+    assert b"Failed to renew the lease! Use Ref for details:" in response.data
+
 def test_check_membership_success(client):
-    mock_consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
     mock_consumer_group.check_consumer_membership.return_value = True
 
     data = {"consumer_id": "localhost:5000"}
@@ -93,7 +125,7 @@ def test_check_membership_success(client):
     assert b'"is_member":true' in response.data
 
 def test_check_membership_not_found(client):
-    mock_consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
     mock_consumer_group.check_consumer_membership.return_value = False
 
     data = {"consumer_id": "localhost:5000"}
@@ -117,7 +149,7 @@ def test_check_membership_validation_failure(client):
         assert b"Provided data does not match requirements" in response.data
 
 def test_check_membership_internal_error(client):
-    mock_consumer_group = getattr(rest_api_app, CONSUMER_GROUP_CONTEXT_KEY)
+    mock_consumer_group = rest_api_app.extensions[CONSUMER_GROUP_CONTEXT_KEY]
     mock_consumer_group.check_consumer_membership.side_effect = Exception("Some error")
 
     data = {"consumer_id": "localhost:5000"}
@@ -125,3 +157,9 @@ def test_check_membership_internal_error(client):
 
     assert response.status_code == 500
     assert b"Failed to check for membership! Use Ref for details:" in response.data
+
+def test_metrics(client):
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type == "text/plain; version=0.0.4; charset=utf-8"
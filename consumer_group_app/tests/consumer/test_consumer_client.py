@@ -1,40 +1,41 @@
 import pytest
 
 from unittest.mock import patch
-from consumer.consumer_client import ConsumerClient
+from consumer.consumer_client import ConsumerClient, ConsumerOverloadedError, DEFAULT_RETRY_AFTER_SECONDS
 
 @pytest.fixture
 def consumer_client():
-    return ConsumerClient(host="127.0.0.1", port="5001")
+    return ConsumerClient(host="127.0.0.1", port="5001", connect_timeout_ms=500, read_timeout_ms=2000)
 
 def test_check_health_success(consumer_client):
-    with patch('requests.get') as mock_get:
+    with patch.object(consumer_client.session, 'get') as mock_get:
         mock_get.return_value.status_code = 200
         assert consumer_client.check_health() is True
+        mock_get.assert_called_once_with(f"{consumer_client.consumer_app_url}/health", timeout=(0.5, 2))
 
 def test_check_health_failure(consumer_client):
-    with patch('requests.get') as mock_get:
+    with patch.object(consumer_client.session, 'get') as mock_get:
         mock_get.side_effect = Exception("Connection error")
         assert consumer_client.check_health() is False
 
-    with patch('requests.get') as mock_get:
+    with patch.object(consumer_client.session, 'get') as mock_get:
         mock_get.return_value.status_code = 500
         assert consumer_client.check_health() is False
 
 def test_process_msg_success(consumer_client):
     msg = {"key": "value"}
-    with patch('requests.post') as mock_post:
+    with patch.object(consumer_client.session, 'post') as mock_post:
         mock_post.return_value.status_code = 200
         consumer_client.process_msg(msg)
         mock_post.assert_called_once_with(
             f"{consumer_client.consumer_app_url}/processMessage",
-            headers={"Content-Type": "application/json"},
-            json=msg
+            data=b'{"key":"value"}',
+            timeout=(0.5, 2)
         )
 
 def test_process_msg_failure(consumer_client):
     msg = {"key": "value"}
-    with patch('requests.post') as mock_post:
+    with patch.object(consumer_client.session, 'post') as mock_post:
         mock_post.return_value.status_code = 400
         mock_post.return_value.content = b"Bad Request"
 
@@ -42,3 +43,79 @@ def test_process_msg_failure(consumer_client):
             consumer_client.process_msg(msg)
 
         assert "Failed to process msg" in str(exc_info.value)
+
+def test_process_msgs_success(consumer_client):
+    msgs = [{"message_id": "1"}, {"message_id": "2"}]
+    with patch.object(consumer_client.session, 'post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.content = b'{"results": [{"message_id": "1", "status": "processed"}, ' \
+            + b'{"message_id": "2", "status": "failed"}]}'
+        assert consumer_client.process_msgs(msgs) == [True, False]
+        mock_post.assert_called_once_with(
+            f"{consumer_client.consumer_app_url}/processMessages",
+            data=b'[{"message_id":"1"},{"message_id":"2"}]',
+            timeout=(0.5, 2)
+        )
+
+def test_process_msgs_failure(consumer_client):
+    msgs = [{"message_id": "1"}]
+    with patch.object(consumer_client.session, 'post') as mock_post:
+        mock_post.return_value.status_code = 400
+        mock_post.return_value.content = b"Bad Request"
+
+        with pytest.raises(Exception) as exc_info:
+            consumer_client.process_msgs(msgs)
+
+        assert "Failed to process msgs" in str(exc_info.value)
+
+def test_process_msgs_overloaded(consumer_client):
+    msgs = [{"message_id": "1"}]
+    with patch.object(consumer_client.session, 'post') as mock_post:
+        mock_post.return_value.status_code = 429
+        mock_post.return_value.headers = {"Retry-After": "2"}
+        mock_post.return_value.content = b"Too Many Requests"
+
+        with pytest.raises(ConsumerOverloadedError) as exc_info:
+            consumer_client.process_msgs(msgs)
+
+        assert exc_info.value.retry_after_seconds == 2
+
+def test_process_msg_consumer_stopping(consumer_client):
+    with patch.object(consumer_client.session, 'post') as mock_post:
+        mock_post.return_value.status_code = 503
+        mock_post.return_value.headers = {}
+        mock_post.return_value.content = b"Service Unavailable"
+
+        with pytest.raises(ConsumerOverloadedError) as exc_info:
+            consumer_client.process_msg({"message_id": "1"})
+
+        assert exc_info.value.retry_after_seconds == DEFAULT_RETRY_AFTER_SECONDS
+
+def test_process_msgs_results_mismatch(consumer_client):
+    msgs = [{"message_id": "1"}, {"message_id": "2"}]
+    with patch.object(consumer_client.session, 'post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.content = b'{"results": [{"message_id": "1", "status": "processed"}]}'
+
+        with pytest.raises(Exception) as exc_info:
+            consumer_client.process_msgs(msgs)
+
+        assert "Expected 2 results" in str(exc_info.value)
+
+def test_process_msgs_sends_raw_payloads_unchanged(consumer_client):
+    msgs = [b'{"message_id": "1"}', {"message_id": "2"}]
+    with patch.object(consumer_client.session, 'post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.content = b'{"results": [{"message_id": "1", "status": "processed"}, ' \
+            + b'{"message_id": "2", "status": "processed"}]}'
+        assert consumer_client.process_msgs(msgs) == [True, True]
+        assert mock_post.call_args.kwargs["data"] == b'[{"message_id": "1"},{"message_id":"2"}]'
+
+def test_session_sends_json_content_type(consumer_client):
+    assert consumer_client.session.headers["Content-Type"] == "application/json"
+
+def test_check_health_with_timeout(consumer_client):
+    with patch.object(consumer_client.session, 'get') as mock_get:
+        mock_get.return_value.status_code = 200
+        assert consumer_client.check_health(timeout_ms=300) is True
+        mock_get.assert_called_once_with(f"{consumer_client.consumer_app_url}/health", timeout=(0.3, 0.3))
@@ -0,0 +1,32 @@
+import pytest
+
+from consumer.consumer_clients_pool import ConsumerClientsPool
+from metrics.metrics import REGISTRY
+
+@pytest.fixture
+def clients_pool():
+    return ConsumerClientsPool(connect_timeout_ms=500, read_timeout_ms=2000, http_pool_size=5)
+
+def test_get_client_reuses_client(clients_pool):
+    client = clients_pool.get_client("127.0.0.1:5001")
+
+    assert client.consumer_app_url == "http://127.0.0.1:5001"
+    assert client.timeout == (0.5, 2)
+    assert clients_pool.get_client("127.0.0.1:5001") is client
+    assert clients_pool.get_client("127.0.0.1:5002") is not client
+
+def test_evict_closes_client(clients_pool):
+    client = clients_pool.get_client("127.0.0.1:5001")
+    clients_pool.evict("127.0.0.1:5001")
+
+    assert clients_pool.get_client("127.0.0.1:5001") is not client
+
+def test_evict_unknown_consumer(clients_pool):
+    clients_pool.evict("127.0.0.1:5001")
+
+def test_http_pool_utilisation_gauges(clients_pool):
+    clients_pool.get_client("127.0.0.1:5003")
+
+    consumer_labels = {"consumer_id": "127.0.0.1:5003"}
+    assert REGISTRY.gauge("http_pool_in_use", "", consumer_labels).value() == 0
+    assert REGISTRY.gauge("http_pool_size", "", consumer_labels).value() == 5
@@ -0,0 +1,235 @@
+import asyncio
+import pytest
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+pytest.importorskip("aiohttp")
+
+from consumer_group.async_runtime import AsyncRuntime
+from consumer_group.consumer_group import ConsumersGroup
+from consumer.consumer_client import ConsumerOverloadedError
+
+def create_configs(**overrides):
+    configs = dict(dispatch_batch_size=2, dispatch_max_linger_ms=10, max_in_flight=4, max_in_flight_per_consumer=2,
+                   pipeline_mode="push", max_retries=1, retry_base_delay_ms=1, retry_max_delay_ms=1,
+                   max_pending_retries=100)
+    configs.update(overrides)
+    return SimpleNamespace(**configs)
+
+def create_runtime(**overrides):
+    consumer_group = MagicMock()
+    consumer_group.get_consumer.return_value = "localhost:5001"
+    return AsyncRuntime(consumer_group=consumer_group, configs=create_configs(**overrides), stats_period_in_seconds=3)
+
+def test_full_batch_is_sent():
+    async def run():
+        runtime = create_runtime()
+        client = MagicMock()
+        client.process_msgs = AsyncMock(return_value=[True, True])
+        with patch.object(runtime, '_get_client', return_value=client):
+            await runtime.add("localhost:5001", {"message_id": "1"})
+            client.process_msgs.assert_not_called()
+            await runtime.add("localhost:5001", {"message_id": "2"})
+            await asyncio.wait(list(runtime._tasks))
+
+        client.process_msgs.assert_awaited_once_with([{"message_id": "1"}, {"message_id": "2"}])
+        assert runtime.in_flight_count() == 0
+        assert runtime.pending_count() == 0
+        runtime.consumer_group.record_dispatch.assert_called_once()
+
+    asyncio.run(run())
+
+def test_batch_is_sent_after_linger_time():
+    async def run():
+        runtime = create_runtime()
+        client = MagicMock()
+        client.process_msgs = AsyncMock(return_value=[True])
+        with patch.object(runtime, '_get_client', return_value=client):
+            flusher = asyncio.create_task(runtime._flush_expired_batches())
+            await runtime.add("localhost:5001", {"message_id": "1"})
+            await asyncio.sleep(0.05)
+            flusher.cancel()
+
+        client.process_msgs.assert_awaited_once_with([{"message_id": "1"}])
+
+    asyncio.run(run())
+
+def test_failed_message_is_retried_with_other_consumer():
+    async def run():
+        runtime = create_runtime(dispatch_batch_size=1)
+        client = MagicMock()
+        client.process_msgs = AsyncMock(side_effect=[[False], [True]])
+        with patch.object(runtime, '_get_client', return_value=client):
+            await runtime.add("localhost:5001", {"message_id": "1"})
+            await asyncio.sleep(0.05)
+
+        assert client.process_msgs.await_count == 2
+        runtime.consumer_group.get_consumer.assert_called_once_with({"message_id": "1"},
+                                                                     excluded_consumers=("localhost:5001",))
+        assert runtime.pending_retries_count() == 0
+
+    asyncio.run(run())
+
+def test_rejected_message_is_retried_with_other_consumer():
+    async def run():
+        runtime = create_runtime(dispatch_batch_size=1)
+        client = MagicMock()
+        client.process_msgs = AsyncMock(side_effect=[ConsumerOverloadedError("overloaded", 0.5), [True]])
+        with patch.object(runtime, '_get_client', return_value=client):
+            await runtime.add("localhost:5001", {"message_id": "1"})
+            await asyncio.sleep(0.05)
+
+        assert client.process_msgs.await_count == 2
+        runtime.consumer_group.get_consumer.assert_called_once_with({"message_id": "1"},
+                                                                     excluded_consumers=("localhost:5001",))
+        # the rejection doesn't count as a failure of the consumer, but as a slow response
+        consumer_id, msgs_count, latency, success = runtime.consumer_group.record_dispatch.call_args_list[0].args
+        assert latency >= 0.5 and not success
+        assert runtime.consumer_group.record_dispatch.call_args_list[0].kwargs == {"overloaded": True}
+
+    asyncio.run(run())
+
+def test_message_is_dead_lettered_after_max_retries():
+    async def run():
+        runtime = create_runtime(dispatch_batch_size=1, max_retries=0)
+        runtime._redis = MagicMock()
+        runtime._redis.xadd = AsyncMock()
+        client = MagicMock()
+        client.process_msgs = AsyncMock(side_effect=Exception("Consumer is not reachable"))
+        with patch.object(runtime, '_get_client', return_value=client):
+            await runtime.add("localhost:5001", {"message_id": "1"})
+            await asyncio.sleep(0.05)
+
+        runtime._redis.xadd.assert_awaited_once()
+        assert runtime._redis.xadd.await_args.args[0] == ConsumersGroup.DEAD_LETTER_STREAM_NAME
+        assert runtime._redis.xadd.await_args.args[1]["error"] == "Consumer is not reachable"
+
+    asyncio.run(run())
+
+def test_batch_of_saturated_consumer_is_parked():
+    async def run():
+        runtime = create_runtime(max_in_flight=2, max_in_flight_per_consumer=1)
+        release = asyncio.Event()
+        sent_batches = []
+        async def process_msgs(batch):
+            sent_batches.append(batch[0]["message_id"])
+            if batch[0]["message_id"] != "3":
+                await release.wait()
+            return [True] * len(batch)
+        client = MagicMock()
+        client.process_msgs = AsyncMock(side_effect=process_msgs)
+        with patch.object(runtime, '_get_client', return_value=client):
+            await runtime.submit("localhost:5001", [{"message_id": "1"}])
+            # the batch above the limit of localhost:5001 doesn't wait for it or hold a global slot
+            await asyncio.wait_for(runtime.submit("localhost:5001", [{"message_id": "2"}]), timeout=1)
+            assert runtime.parked_count() == 1
+            await asyncio.wait_for(runtime.submit("localhost:5002", [{"message_id": "3"}]), timeout=1)
+            await asyncio.sleep(0.01)
+            assert sent_batches == ["1", "3"]
+            release.set()
+            await asyncio.wait(list(runtime._tasks))
+
+        assert sent_batches == ["1", "3", "2"]
+        assert runtime.in_flight_count() == 0
+        assert runtime.parked_count() == 0
+
+    asyncio.run(run())
+
+def test_submit_waits_when_too_many_batches_are_parked():
+    async def run():
+        runtime = create_runtime(max_in_flight=1, max_in_flight_per_consumer=1)
+        release = asyncio.Event()
+        async def process_msgs(batch):
+            await release.wait()
+            return [True] * len(batch)
+        client = MagicMock()
+        client.process_msgs = AsyncMock(side_effect=process_msgs)
+        with patch.object(runtime, '_get_client', return_value=client):
+            await runtime.submit("localhost:5001", [{"message_id": "1"}])
+            await runtime.submit("localhost:5001", [{"message_id": "2"}])
+            waiting = asyncio.create_task(runtime.submit("localhost:5001", [{"message_id": "3"}]))
+            await asyncio.sleep(0.01)
+            assert not waiting.done()
+            release.set()
+            await asyncio.wait_for(waiting, timeout=1)
+            if runtime._tasks:
+                await asyncio.wait(list(runtime._tasks))
+
+        assert client.process_msgs.await_count == 3
+        assert runtime.in_flight_count() == 0
+
+    asyncio.run(run())
+
+def test_forget_drops_consumer_slots():
+    async def run():
+        runtime = create_runtime()
+        client = MagicMock()
+        client.process_msgs = AsyncMock(return_value=[True])
+        with patch.object(runtime, '_get_client', return_value=client):
+            await runtime.submit("localhost:5001", [{"message_id": "1"}])
+            await asyncio.wait(list(runtime._tasks))
+
+        runtime.forget("localhost:5001")
+
+        assert "localhost:5001" not in runtime._consumers_slots
+
+    asyncio.run(run())
+
+def test_retried_message_is_batched_with_other_messages():
+    async def run():
+        runtime = create_runtime(dispatch_batch_size=2, max_retries=2)
+        runtime.consumer_group.get_consumer.return_value = "localhost:5002"
+        client = MagicMock()
+        client.process_msgs = AsyncMock(side_effect=[[True, False], [False, True], [True]])
+        with patch.object(runtime, '_get_client', return_value=client):
+            await runtime.add("localhost:5001", {"message_id": "1"})
+            await runtime.add("localhost:5001", {"message_id": "2"})
+            await asyncio.sleep(0.05)
+            await runtime.add("localhost:5002", {"message_id": "3"})
+            await asyncio.sleep(0.05)
+            await runtime._flush("localhost:5002")
+            await asyncio.wait(list(runtime._tasks))
+
+        assert client.process_msgs.await_args_list[1].args == ([{"message_id": "2"}, {"message_id": "3"}],)
+        # the second failure of the retried message keeps its attempts and tried consumers
+        runtime.consumer_group.get_consumer.assert_called_with({"message_id": "2"},
+                                                                excluded_consumers=("localhost:5001", "localhost:5002"))
+
+    asyncio.run(run())
+
+def test_message_is_dead_lettered_when_too_many_retries_are_pending():
+    async def run():
+        runtime = create_runtime(max_pending_retries=1, retry_base_delay_ms=1000, retry_max_delay_ms=1000)
+        runtime._redis = MagicMock()
+        runtime._redis.xadd = AsyncMock()
+
+        runtime._schedule_retry({"message_id": "1"}, 1, (), "Connection error")
+        runtime._schedule_retry({"message_id": "2"}, 1, (), "Connection error")
+        await asyncio.wait(list(runtime._tasks))
+
+        assert runtime.pending_retries_count() == 1
+        runtime._redis.xadd.assert_awaited_once()
+        assert runtime._redis.xadd.await_args.args[1]["data"] == b'{"message_id":"2"}'
+
+    asyncio.run(run())
+
+def test_malformed_message_is_dead_lettered_instead_of_batched():
+    async def run():
+        runtime = create_runtime()
+        runtime._decode_messages = False
+        runtime._redis = MagicMock()
+        runtime._redis.xadd = AsyncMock()
+        client = MagicMock()
+        client.process_msgs = AsyncMock(return_value=[True, True])
+        with patch.object(runtime, '_get_client', return_value=client):
+            for payload in (b'{"message_id":"1"}', b"not json", b'{"message_id":"3"}'):
+                await runtime._handle_message({"data": payload})
+            await asyncio.wait(list(runtime._tasks))
+
+        client.process_msgs.assert_awaited_once_with([b'{"message_id":"1"}', b'{"message_id":"3"}'])
+        runtime._redis.xadd.assert_awaited_once()
+        assert runtime._redis.xadd.await_args.args[0] == ConsumersGroup.DEAD_LETTER_STREAM_NAME
+        assert runtime._redis.xadd.await_args.args[1]["data"] == b"not json"
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+import time
+
+from unittest.mock import patch
+from consumer_group.circuit_breaker import CircuitBreakers
+
+def test_circuit_opens_after_consecutive_failures():
+    circuit_breakers = CircuitBreakers(failure_threshold=2, open_duration_ms=1000)
+
+    circuit_breakers.record_failure("localhost:5001")
+    assert circuit_breakers.is_available("localhost:5001")
+
+    circuit_breakers.record_failure("localhost:5001")
+    assert not circuit_breakers.is_available("localhost:5001")
+    assert circuit_breakers.has_open_circuits()
+    assert circuit_breakers.is_available("localhost:5002")
+
+def test_success_resets_failures():
+    circuit_breakers = CircuitBreakers(failure_threshold=2, open_duration_ms=1000)
+
+    circuit_breakers.record_failure("localhost:5001")
+    circuit_breakers.record_success("localhost:5001")
+    circuit_breakers.record_failure("localhost:5001")
+
+    assert circuit_breakers.is_available("localhost:5001")
+
+def test_circuit_is_half_open_after_open_duration():
+    circuit_breakers = CircuitBreakers(failure_threshold=1, open_duration_ms=10)
+    circuit_breakers.record_failure("localhost:5001")
+    assert not circuit_breakers.is_available("localhost:5001")
+
+    time.sleep(0.02)
+    assert circuit_breakers.is_available("localhost:5001")
+
+    circuit_breakers.record_failure("localhost:5001")
+    assert not circuit_breakers.is_available("localhost:5001")
+
+def test_success_closes_circuit():
+    circuit_breakers = CircuitBreakers(failure_threshold=1, open_duration_ms=1000)
+    circuit_breakers.record_failure("localhost:5001")
+
+    circuit_breakers.record_success("localhost:5001")
+
+    assert circuit_breakers.is_available("localhost:5001")
+    assert not circuit_breakers.has_open_circuits()
+
+def test_recovered_consumer_is_admitted_gradually():
+    circuit_breakers = CircuitBreakers(failure_threshold=1, open_duration_ms=10, recovery_duration_ms=50)
+    circuit_breakers.record_failure("localhost:5001")
+    time.sleep(0.02)
+
+    circuit_breakers.record_success("localhost:5001")
+
+    assert circuit_breakers.has_open_circuits()
+    with patch("random.random", return_value=0.5):
+        assert not circuit_breakers.is_admitted("localhost:5001")
+        time.sleep(0.06)
+        assert circuit_breakers.is_admitted("localhost:5001")
+    assert not circuit_breakers.has_open_circuits()
+
+def test_failure_of_recovering_consumer_opens_circuit():
+    circuit_breakers = CircuitBreakers(failure_threshold=3, open_duration_ms=1000, recovery_duration_ms=1000)
+    for _ in range(3):
+        circuit_breakers.record_failure("localhost:5001")
+    circuit_breakers.record_success("localhost:5001")
+
+    circuit_breakers.record_failure("localhost:5001")
+
+    assert not circuit_breakers.is_available("localhost:5001")
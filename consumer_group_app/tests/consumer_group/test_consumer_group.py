@@ -0,0 +1,135 @@
+import pytest
+
+from unittest.mock import patch, MagicMock
+from consumer_group.consumer_group import ConsumersGroup
+
+@pytest.fixture
+def consumer_group():
+    return ConsumersGroup(group_members_max_count=3, redis_host="localhost", redis_port=6379)
+
+@pytest.fixture
+def connection():
+    with patch('consumer_group.consumer_group.redis.Redis') as mock_redis:
+        connection = MagicMock()
+        mock_redis.return_value.__enter__.return_value = connection
+        yield connection
+
+def test_add_consumer_renews_lease_of_member(consumer_group, connection):
+    with patch.object(consumer_group, '_register_script', return_value=1) as mock_script, \
+            patch.object(consumer_group.registry, 'refresh') as mock_refresh:
+        assert consumer_group.add_consumer("localhost:5001")
+
+    keys = mock_script.call_args.kwargs["keys"]
+    assert keys[0] == ConsumersGroup.CONSUMER_LEASES_NAME
+    assert keys[3] == "consumer:lease:localhost:5001"
+    assert mock_script.call_args.kwargs["args"][0] == "localhost:5001"
+    mock_refresh.assert_not_called()
+
+def test_add_consumer_registers_new_consumer(consumer_group, connection):
+    with patch.object(consumer_group, '_register_script', return_value=2) as mock_script, \
+            patch.object(consumer_group.registry, 'refresh') as mock_refresh:
+        assert consumer_group.add_consumer("localhost:5001")
+
+    assert mock_script.call_args.kwargs["args"][3] == consumer_group.group_members_max_count
+    assert mock_script.call_args.kwargs["client"] is connection
+    mock_refresh.assert_called_once()
+
+def test_add_consumer_when_group_is_full(consumer_group, connection):
+    with patch.object(consumer_group, '_register_script', return_value=0):
+        with pytest.raises(Exception) as exc_info:
+            consumer_group.add_consumer("localhost:5001")
+
+    assert "max capacity is reached" in str(exc_info.value)
+
+def test_renew_lease(consumer_group, connection):
+    with patch.object(consumer_group, '_renew_lease_script', return_value=1):
+        assert consumer_group.renew_lease("localhost:5001") is True
+    with patch.object(consumer_group, '_renew_lease_script', return_value=0):
+        assert consumer_group.renew_lease("localhost:5001") is False
+
+def test_remove_consumer(consumer_group, connection):
+    with patch.object(consumer_group, '_unregister_script', return_value=1) as mock_script, \
+            patch.object(consumer_group.registry, 'refresh') as mock_refresh:
+        assert consumer_group.remove_consumer("localhost:5001") is True
+
+    assert mock_script.call_args.kwargs["args"] == ["localhost:5001"]
+    mock_refresh.assert_called_once()
+
+def test_check_consumer_membership(consumer_group, connection):
+    connection.exists.return_value = 1
+    assert consumer_group.check_consumer_membership("localhost:5001") is True
+
+    connection.exists.return_value = 0
+    assert consumer_group.check_consumer_membership("localhost:5001") is False
+
+def test_remove_expired_consumers(consumer_group, connection):
+    with patch.object(consumer_group, '_expire_leases_script', return_value=["localhost:5001"]), \
+            patch.object(consumer_group.registry, 'refresh') as mock_refresh:
+        assert consumer_group.remove_expired_consumers() == ["localhost:5001"]
+
+    mock_refresh.assert_called_once()
+
+def test_remove_expired_consumers_without_expired_leases(consumer_group, connection):
+    with patch.object(consumer_group, '_expire_leases_script', return_value=[]), \
+            patch.object(consumer_group.registry, 'refresh') as mock_refresh:
+        assert consumer_group.remove_expired_consumers() == []
+
+    mock_refresh.assert_not_called()
+
+def test_get_consumer_selects_registered_consumer(consumer_group):
+    consumers = ("localhost:5001", "localhost:5002")
+    with patch.object(consumer_group.registry, 'get_consumers', return_value=consumers):
+        for _ in range(10):
+            assert consumer_group.get_consumer() in consumers
+
+def test_get_consumer_without_consumers(consumer_group):
+    with patch.object(consumer_group.registry, 'get_consumers', return_value=()):
+        with pytest.raises(Exception) as exc_info:
+            consumer_group.get_consumer()
+
+        assert "There are no consumers registered" in str(exc_info.value)
+
+def test_get_consumer_skips_excluded_consumers(consumer_group):
+    consumers = ("localhost:5001", "localhost:5002")
+    with patch.object(consumer_group.registry, 'get_consumers', return_value=consumers):
+        for _ in range(10):
+            assert consumer_group.get_consumer(excluded_consumers=("localhost:5001",)) == "localhost:5002"
+
+def test_get_consumer_uses_excluded_consumer_when_no_other_choice(consumer_group):
+    with patch.object(consumer_group.registry, 'get_consumers', return_value=("localhost:5001",)):
+        assert consumer_group.get_consumer(excluded_consumers=("localhost:5001",)) == "localhost:5001"
+
+def test_get_consumer_skips_consumers_with_open_circuit(consumer_group):
+    consumers = ("localhost:5001", "localhost:5002")
+    for _ in range(consumer_group.circuit_breakers.failure_threshold):
+        consumer_group.record_dispatch("localhost:5001", 1, 0.1, success=False)
+
+    with patch.object(consumer_group.registry, 'get_consumers', return_value=consumers):
+        for _ in range(10):
+            assert consumer_group.get_consumer() == "localhost:5002"
+
+def test_record_dispatch_overloaded_consumer_keeps_circuit_closed(consumer_group):
+    for _ in range(consumer_group.circuit_breakers.failure_threshold):
+        consumer_group.record_dispatch("localhost:5001", 1, 0.1, success=False, overloaded=True)
+
+    with patch.object(consumer_group.registry, 'get_consumers', return_value=("localhost:5001",)):
+        assert consumer_group.get_consumer() == "localhost:5001"
+
+def test_get_consumer_all_circuits_open(consumer_group):
+    for _ in range(consumer_group.circuit_breakers.failure_threshold):
+        consumer_group.record_dispatch("localhost:5001", 1, 0.1, success=False)
+
+    with patch.object(consumer_group.registry, 'get_consumers', return_value=("localhost:5001",)):
+        with pytest.raises(Exception) as exc_info:
+            consumer_group.get_consumer()
+
+        assert "all circuits are open" in str(exc_info.value)
+
+def test_get_channels_without_shards():
+    assert ConsumersGroup.get_channels(0) == ["messages:published"]
+
+def test_get_channels_splits_shards_between_workers():
+    assert ConsumersGroup.get_channels(5, worker_index=0, workers_count=2) == \
+        ["messages:published:0", "messages:published:2", "messages:published:4"]
+    assert ConsumersGroup.get_channels(5, worker_index=1, workers_count=2) == \
+        ["messages:published:1", "messages:published:3"]
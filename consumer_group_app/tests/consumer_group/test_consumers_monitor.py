@@ -0,0 +1,34 @@
+import time
+
+from unittest.mock import MagicMock
+from consumer_group.consumers_monitor import ConsumerRegistrationsMonitor, get_check_delay
+
+def test_check_consumers_removes_unhealthy_consumers():
+    consumer_group = MagicMock()
+    consumer_group.registry.get_consumers.return_value = ("localhost:5001", "localhost:5002")
+    clients_pool = MagicMock()
+    clients_pool.get_client.side_effect = lambda consumer_id: MagicMock(
+        check_health=MagicMock(return_value=consumer_id == "localhost:5001"))
+    monitor = ConsumerRegistrationsMonitor(consumer_group, clients_pool, check_timeout_ms=500)
+
+    assert monitor.check_consumers() == ["localhost:5002"]
+    consumer_group.remove_consumer.assert_called_once_with("localhost:5002")
+
+def test_consumers_are_checked_concurrently():
+    consumer_group = MagicMock()
+    consumer_group.registry.get_consumers.return_value = tuple(f"localhost:{port}" for port in range(5001, 5005))
+    client = MagicMock()
+    client.check_health.side_effect = lambda timeout_ms: time.sleep(0.1) or True
+    clients_pool = MagicMock()
+    clients_pool.get_client.return_value = client
+    monitor = ConsumerRegistrationsMonitor(consumer_group, clients_pool, check_timeout_ms=500, check_concurrency=4)
+
+    start_time = time.monotonic()
+    assert monitor.check_consumers() == []
+    assert time.monotonic() - start_time < 0.3
+    client.check_health.assert_called_with(timeout_ms=500)
+
+def test_check_delay_is_spread_by_jitter():
+    delays = [get_check_delay(10, 0.2) for _ in range(100)]
+    assert all(8 <= delay <= 12 for delay in delays)
+    assert len(set(delays)) > 1
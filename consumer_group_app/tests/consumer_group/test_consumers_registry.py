@@ -0,0 +1,82 @@
+import pytest
+import threading
+
+from unittest.mock import patch, MagicMock
+from consumer_group.consumers_registry import ConsumersRegistry
+
+@pytest.fixture
+def connection():
+    with patch('consumer_group.consumers_registry.redis.Redis') as mock_redis:
+        connection = MagicMock()
+        mock_redis.return_value.__enter__.return_value = connection
+        yield connection
+
+@pytest.fixture
+def registry():
+    return ConsumersRegistry(redis_con_pool=MagicMock(), consumers_list_name="consumer:ids", refresh_interval_ms=10)
+
+def test_get_consumers_empty_before_refresh(registry):
+    assert registry.get_consumers() == ()
+
+def test_refresh_loads_consumers(registry, connection):
+    connection.pipeline.return_value.execute.return_value = [b"3", [b"localhost:5001", b"localhost:5002"]]
+
+    registry.refresh()
+
+    assert registry.get_consumers() == ("localhost:5001", "localhost:5002")
+    connection.pipeline.return_value.get.assert_called_once_with(ConsumersRegistry.VERSION_KEY_NAME)
+    connection.pipeline.return_value.lrange.assert_called_once_with("consumer:ids", 0, -1)
+
+def test_get_consumers_does_not_call_redis(registry, connection):
+    connection.pipeline.return_value.execute.return_value = [b"1", [b"localhost:5001"]]
+    registry.refresh()
+    connection.reset_mock()
+
+    for _ in range(10):
+        assert registry.get_consumers() == ("localhost:5001",)
+
+    connection.assert_not_called()
+    connection.pipeline.assert_not_called()
+
+def test_refresh_reports_removed_consumers(connection):
+    on_consumers_removed = MagicMock()
+    registry = ConsumersRegistry(redis_con_pool=MagicMock(), consumers_list_name="consumer:ids", refresh_interval_ms=10,
+                                 on_consumers_removed=on_consumers_removed)
+    connection.pipeline.return_value.execute.return_value = [b"1", [b"localhost:5001", b"localhost:5002"]]
+    registry.refresh()
+    on_consumers_removed.assert_not_called()
+
+    connection.pipeline.return_value.execute.return_value = [b"2", [b"localhost:5002"]]
+    registry.refresh()
+
+    on_consumers_removed.assert_called_once_with({"localhost:5001"})
+
+def test_refresh_skips_snapshot_that_is_not_newer(registry, connection):
+    connection.pipeline.return_value.execute.return_value = [b"5", [b"localhost:5001", b"localhost:5002"]]
+    registry.refresh()
+
+    # a snapshot read before the newer one was applied doesn't bring back the old list
+    connection.pipeline.return_value.execute.return_value = [b"4", [b"localhost:5001"]]
+    registry.refresh()
+    connection.pipeline.return_value.execute.return_value = [b"5", [b"localhost:5001"]]
+    registry.refresh()
+
+    assert registry.get_consumers() == ("localhost:5001", "localhost:5002")
+    assert not registry.is_changed(b"5")
+    assert registry.is_changed(b"6")
+
+def test_concurrent_refreshes_apply_the_newest_snapshot(registry):
+    removed = []
+    registry.on_consumers_removed = removed.append
+    registry._update(b"2", [b"localhost:5001", b"localhost:5002"])
+
+    threads = [threading.Thread(target=registry._update, args=(str(version).encode(), [b"localhost:5001"]))
+               for version in range(3, 20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry._version == 19
+    assert registry.get_consumers() == ("localhost:5001",)
+    assert removed == [{"localhost:5002"}]
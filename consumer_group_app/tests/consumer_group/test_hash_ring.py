@@ -0,0 +1,37 @@
+import pytest
+
+from consumer_group.hash_ring import HashRing
+
+KEYS = [f"message-{index}" for index in range(2000)]
+
+def test_get_node_is_stable():
+    ring = HashRing(["localhost:5001", "localhost:5002", "localhost:5003"], virtual_nodes_count=100)
+    other_ring = HashRing(["localhost:5003", "localhost:5001", "localhost:5002"], virtual_nodes_count=100)
+
+    for key in KEYS:
+        assert ring.get_node(key) == other_ring.get_node(key)
+
+def test_keys_are_spread_across_nodes():
+    nodes = ["localhost:5001", "localhost:5002", "localhost:5003"]
+    ring = HashRing(nodes, virtual_nodes_count=100)
+
+    counts = {node: 0 for node in nodes}
+    for key in KEYS:
+        counts[ring.get_node(key)] += 1
+
+    for count in counts.values():
+        assert count > len(KEYS) / len(nodes) * 0.5
+
+def test_adding_node_moves_about_one_nth_of_keys():
+    nodes = ["localhost:5001", "localhost:5002", "localhost:5003"]
+    ring = HashRing(nodes, virtual_nodes_count=100)
+    new_ring = HashRing(nodes + ["localhost:5004"], virtual_nodes_count=100)
+
+    moved_keys = [key for key in KEYS if ring.get_node(key) != new_ring.get_node(key)]
+
+    assert all(new_ring.get_node(key) == "localhost:5004" for key in moved_keys)
+    assert len(moved_keys) < len(KEYS) * 0.4
+
+def test_get_node_empty_ring():
+    with pytest.raises(Exception):
+        HashRing([], virtual_nodes_count=100).get_node("message-1")
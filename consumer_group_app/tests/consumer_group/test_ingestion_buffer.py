@@ -0,0 +1,62 @@
+import threading
+
+from consumer_group.ingestion_buffer import IngestionBuffer, MESSAGES_INGESTION_DROPPED
+
+def test_get_returns_oldest_messages_first():
+    buffer = IngestionBuffer(capacity=10)
+    buffer.put(b'{"message_id": "1"}')
+    buffer.put(b'{"message_id": "2"}')
+    buffer.put(b'{"message_id": "3"}')
+
+    assert buffer.get(max_count=2, timeout_in_seconds=0) == [b'{"message_id": "1"}', b'{"message_id": "2"}']
+    assert buffer.pending_count() == 1
+    assert buffer.get(max_count=2, timeout_in_seconds=0) == [b'{"message_id": "3"}']
+
+def test_get_returns_empty_list_after_timeout():
+    buffer = IngestionBuffer(capacity=10)
+
+    assert buffer.get(max_count=10, timeout_in_seconds=0.01) == []
+
+def test_put_drops_oldest_message_when_full():
+    buffer = IngestionBuffer(capacity=2)
+    dropped_before = MESSAGES_INGESTION_DROPPED.value()
+
+    buffer.put(b"1")
+    buffer.put(b"2")
+    buffer.put(b"3")
+
+    assert MESSAGES_INGESTION_DROPPED.value() == dropped_before + 1
+    assert buffer.get(max_count=10, timeout_in_seconds=0) == [b"2", b"3"]
+
+def test_get_wakes_up_on_put():
+    buffer = IngestionBuffer(capacity=10)
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(buffer.get(max_count=10, timeout_in_seconds=5)))
+    reader.start()
+
+    buffer.put(b"1")
+    reader.join(timeout=1)
+
+    assert not reader.is_alive()
+    assert received == [b"1"]
+
+def test_wait_until_empty():
+    buffer = IngestionBuffer(capacity=10)
+    buffer.put(b"1")
+
+    assert not buffer.wait_until_empty(timeout_in_seconds=0.02)
+    buffer.get(max_count=10, timeout_in_seconds=0)
+    buffer.task_done(1)
+    assert buffer.wait_until_empty(timeout_in_seconds=0.02)
+
+def test_wait_until_empty_waits_for_taken_messages_to_be_handed_over():
+    buffer = IngestionBuffer(capacity=10)
+    buffer.put(b"1")
+    buffer.put(b"2")
+
+    msgs = buffer.get(max_count=10, timeout_in_seconds=0)
+    assert buffer.pending_count() == 0
+    assert not buffer.wait_until_empty(timeout_in_seconds=0.02)
+
+    threading.Timer(0.05, buffer.task_done, args=(len(msgs),)).start()
+    assert buffer.wait_until_empty(timeout_in_seconds=2)
@@ -0,0 +1,109 @@
+import pytest
+
+from consumer_group.load_balancing import (
+    create_strategy, ConsistentHashStrategy, EwmaLatencyStrategy, LeastOutstandingStrategy, LoadBalancingStrategy,
+    PowerOfTwoChoicesStrategy,
+    RandomStrategy, RoundRobinStrategy
+)
+
+CONSUMERS = ("localhost:5001", "localhost:5002", "localhost:5003")
+
+def test_create_strategy():
+    assert isinstance(create_strategy("random"), RandomStrategy)
+    assert isinstance(create_strategy("round_robin"), RoundRobinStrategy)
+    assert isinstance(create_strategy("least_outstanding"), LeastOutstandingStrategy)
+    assert isinstance(create_strategy("p2c"), PowerOfTwoChoicesStrategy)
+    assert isinstance(create_strategy("ewma"), EwmaLatencyStrategy)
+    assert isinstance(create_strategy("consistent_hash", routing_key="user_id"), ConsistentHashStrategy)
+
+def test_create_strategy_unsupported():
+    with pytest.raises(ValueError):
+        create_strategy("unknown")
+
+def test_random_selects_registered_consumer():
+    strategy = RandomStrategy()
+    for _ in range(10):
+        assert strategy.select(CONSUMERS) in CONSUMERS
+
+def test_round_robin_selects_consumers_in_turns():
+    strategy = RoundRobinStrategy()
+    assert [strategy.select(CONSUMERS) for _ in range(4)] == list(CONSUMERS) + [CONSUMERS[0]]
+
+def test_outstanding_messages_tracking():
+    strategy = RandomStrategy()
+    strategy.on_selected("localhost:5001")
+    strategy.on_selected("localhost:5001")
+    assert strategy.get_outstanding("localhost:5001") == 2
+
+    strategy.on_completed("localhost:5001", msgs_count=2, latency_in_seconds=0.1)
+    assert strategy.get_outstanding("localhost:5001") == 0
+
+    strategy.forget("localhost:5001")
+    assert strategy.get_latency("localhost:5001") == 0.0
+
+def test_latency_moving_average():
+    strategy = RandomStrategy()
+    strategy.on_completed("localhost:5001", msgs_count=1, latency_in_seconds=1.0)
+    assert strategy.get_latency("localhost:5001") == 1.0
+
+    strategy.on_completed("localhost:5001", msgs_count=1, latency_in_seconds=2.0)
+    assert strategy.get_latency("localhost:5001") == pytest.approx(1.3)
+
+def test_least_outstanding_selects_least_loaded_consumer():
+    strategy = LeastOutstandingStrategy()
+    strategy.on_selected("localhost:5001")
+    strategy.on_selected("localhost:5003")
+
+    for _ in range(10):
+        assert strategy.select(CONSUMERS) == "localhost:5002"
+
+def test_p2c_never_selects_most_loaded_consumer():
+    strategy = PowerOfTwoChoicesStrategy()
+    for _ in range(5):
+        strategy.on_selected("localhost:5001")
+    strategy.on_selected("localhost:5002")
+
+    for _ in range(20):
+        assert strategy.select(CONSUMERS) != "localhost:5001"
+
+def test_p2c_single_consumer():
+    assert PowerOfTwoChoicesStrategy().select(("localhost:5001",)) == "localhost:5001"
+
+def test_ewma_never_selects_slowest_consumer():
+    strategy = EwmaLatencyStrategy()
+    strategy.on_completed("localhost:5001", msgs_count=1, latency_in_seconds=1.0)
+    strategy.on_completed("localhost:5002", msgs_count=1, latency_in_seconds=0.1)
+    strategy.on_completed("localhost:5003", msgs_count=1, latency_in_seconds=0.2)
+
+    for _ in range(20):
+        assert strategy.select(CONSUMERS) != "localhost:5001"
+
+def test_consistent_hash_routes_same_key_to_same_consumer():
+    strategy = ConsistentHashStrategy(routing_key="message_id", virtual_nodes_count=50)
+
+    consumer_id = strategy.select(CONSUMERS, {"message_id": "1"})
+    for _ in range(10):
+        assert strategy.select(CONSUMERS, {"message_id": "1"}) == consumer_id
+
+def test_consistent_hash_follows_membership_changes():
+    strategy = ConsistentHashStrategy(routing_key="message_id", virtual_nodes_count=50)
+    strategy.select(CONSUMERS, {"message_id": "1"})
+
+    for index in range(20):
+        assert strategy.select(CONSUMERS[:1], {"message_id": str(index)}) == CONSUMERS[0]
+
+def test_consistent_hash_without_routing_key():
+    strategy = ConsistentHashStrategy(routing_key="user_id", virtual_nodes_count=50)
+    assert strategy.select(CONSUMERS, {"message_id": "1"}) in CONSUMERS
+
+def test_only_consistent_hash_needs_message_fields():
+    assert ConsistentHashStrategy().needs_message_fields
+    assert not create_strategy("random").needs_message_fields
+    assert not create_strategy("ewma").needs_message_fields
+
+def test_strategy_without_select_cannot_be_created():
+    class IncompleteStrategy(LoadBalancingStrategy):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteStrategy()
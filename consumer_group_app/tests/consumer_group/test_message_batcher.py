@@ -0,0 +1,56 @@
+import threading
+
+from unittest.mock import MagicMock
+from consumer_group.message_batcher import MessageBatcher
+
+def test_add_sends_batch_when_full():
+    send_batch = MagicMock()
+    batcher = MessageBatcher(batch_size=2, max_linger_ms=1000, send_batch=send_batch)
+
+    batcher.add("localhost:5001", {"message_id": "1"})
+    send_batch.assert_not_called()
+
+    batcher.add("localhost:5001", {"message_id": "2"})
+    send_batch.assert_called_once_with("localhost:5001", [{"message_id": "1"}, {"message_id": "2"}])
+
+def test_add_keeps_separate_batches_per_consumer():
+    send_batch = MagicMock()
+    batcher = MessageBatcher(batch_size=2, max_linger_ms=1000, send_batch=send_batch)
+
+    batcher.add("localhost:5001", {"message_id": "1"})
+    batcher.add("localhost:5002", {"message_id": "2"})
+    send_batch.assert_not_called()
+
+    batcher.add("localhost:5002", {"message_id": "3"})
+    send_batch.assert_called_once_with("localhost:5002", [{"message_id": "2"}, {"message_id": "3"}])
+
+def test_flush_all_sends_pending_batches():
+    send_batch = MagicMock()
+    batcher = MessageBatcher(batch_size=10, max_linger_ms=1000, send_batch=send_batch)
+
+    batcher.add("localhost:5001", {"message_id": "1"})
+    batcher.add("localhost:5002", {"message_id": "2"})
+    batcher.flush_all()
+
+    assert send_batch.call_count == 2
+    send_batch.assert_any_call("localhost:5001", [{"message_id": "1"}])
+    send_batch.assert_any_call("localhost:5002", [{"message_id": "2"}])
+
+def test_run_flushing_sends_batch_after_linger_time():
+    sent = threading.Event()
+    send_batch = MagicMock(side_effect=lambda consumer_id, batch: sent.set())
+    batcher = MessageBatcher(batch_size=10, max_linger_ms=10, send_batch=send_batch)
+    threading.Thread(target=batcher.run_flushing, daemon=True).start()
+
+    batcher.add("localhost:5001", {"message_id": "1"})
+
+    assert sent.wait(timeout=2)
+    send_batch.assert_called_once_with("localhost:5001", [{"message_id": "1"}])
+
+def test_send_failure_does_not_propagate():
+    send_batch = MagicMock(side_effect=Exception("Connection error"))
+    batcher = MessageBatcher(batch_size=1, max_linger_ms=1000, send_batch=send_batch)
+
+    batcher.add("localhost:5001", {"message_id": "1"})
+
+    send_batch.assert_called_once()
@@ -0,0 +1,148 @@
+import threading
+import time
+
+from unittest.mock import MagicMock
+from consumer_group.message_dispatcher import MessageDispatcher
+
+def test_submit_sends_batch():
+    send_batch = MagicMock()
+    dispatcher = MessageDispatcher(max_in_flight=2, max_in_flight_per_consumer=1, send_batch=send_batch)
+
+    dispatcher.submit("localhost:5001", [{"message_id": "1"}])
+    dispatcher.shutdown()
+
+    send_batch.assert_called_once_with("localhost:5001", [{"message_id": "1"}])
+    assert dispatcher.in_flight_count() == 0
+
+def test_submit_sends_batches_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+    send_batch = MagicMock(side_effect=lambda consumer_id, batch: barrier.wait())
+    dispatcher = MessageDispatcher(max_in_flight=3, max_in_flight_per_consumer=3, send_batch=send_batch)
+
+    for index in range(3):
+        dispatcher.submit("localhost:5001", [{"message_id": str(index)}])
+    dispatcher.shutdown()
+
+    assert send_batch.call_count == 3
+    assert not barrier.broken
+
+def test_submit_blocks_when_in_flight_window_is_full():
+    release = threading.Event()
+    send_batch = MagicMock(side_effect=lambda consumer_id, batch: release.wait(timeout=2))
+    dispatcher = MessageDispatcher(max_in_flight=1, max_in_flight_per_consumer=1, send_batch=send_batch)
+    dispatcher.submit("localhost:5001", [{"message_id": "1"}])
+
+    submitted = threading.Event()
+    def submit_second_batch():
+        dispatcher.submit("localhost:5002", [{"message_id": "2"}])
+        submitted.set()
+    threading.Thread(target=submit_second_batch, daemon=True).start()
+
+    assert not submitted.wait(timeout=0.1)
+    assert dispatcher.in_flight_count() == 1
+    release.set()
+    assert submitted.wait(timeout=2)
+    dispatcher.shutdown()
+
+    assert send_batch.call_count == 2
+
+def test_send_failure_releases_in_flight_slot():
+    send_batch = MagicMock(side_effect=Exception("Connection error"))
+    dispatcher = MessageDispatcher(max_in_flight=1, max_in_flight_per_consumer=1, send_batch=send_batch)
+
+    dispatcher.submit("localhost:5001", [{"message_id": "1"}])
+    dispatcher.submit("localhost:5001", [{"message_id": "2"}])
+    dispatcher.shutdown()
+
+    assert send_batch.call_count == 2
+    assert dispatcher.in_flight_count() == 0
+
+def test_batch_of_saturated_consumer_doesnt_block_other_consumers():
+    release = threading.Event()
+    sent_batches = []
+    def send_batch(consumer_id, batch):
+        sent_batches.append(batch[0]["message_id"])
+        if consumer_id == "localhost:5001":
+            release.wait(timeout=2)
+    dispatcher = MessageDispatcher(max_in_flight=2, max_in_flight_per_consumer=1, send_batch=send_batch)
+    dispatcher.submit("localhost:5001", [{"message_id": "1"}])
+
+    # the batch above the limit of localhost:5001 is parked and doesn't wait for it or hold a global slot
+    dispatcher.submit("localhost:5001", [{"message_id": "2"}])
+    assert dispatcher.parked_count() == 1
+    dispatcher.submit("localhost:5002", [{"message_id": "3"}])
+
+    # localhost:5002 receives its batch while localhost:5001 is still busy
+    for _ in range(100):
+        if "3" in sent_batches:
+            break
+        time.sleep(0.01)
+    assert sorted(sent_batches) == ["1", "3"]
+    release.set()
+    dispatcher.shutdown()
+
+    assert sent_batches[-1] == "2"
+    assert dispatcher.parked_count() == 0
+    assert dispatcher.in_flight_count() == 0
+
+def test_parked_batches_are_sent_in_order():
+    release = threading.Event()
+    sent_batches = []
+    def send_batch(consumer_id, batch):
+        release.wait(timeout=2)
+        sent_batches.append(batch[0]["message_id"])
+    dispatcher = MessageDispatcher(max_in_flight=4, max_in_flight_per_consumer=1, send_batch=send_batch)
+
+    for index in range(4):
+        dispatcher.submit("localhost:5001", [{"message_id": str(index)}])
+    assert dispatcher.in_flight_count() == 1
+    assert dispatcher.parked_count() == 3
+    release.set()
+    dispatcher.shutdown()
+
+    assert sent_batches == ["0", "1", "2", "3"]
+
+def test_submit_blocks_when_too_many_batches_are_parked():
+    release = threading.Event()
+    send_batch = MagicMock(side_effect=lambda consumer_id, batch: release.wait(timeout=2))
+    dispatcher = MessageDispatcher(max_in_flight=1, max_in_flight_per_consumer=1, send_batch=send_batch)
+    dispatcher.submit("localhost:5001", [{"message_id": "1"}])
+    dispatcher.submit("localhost:5001", [{"message_id": "2"}])
+
+    submitted = threading.Event()
+    def submit_third_batch():
+        dispatcher.submit("localhost:5001", [{"message_id": "3"}])
+        submitted.set()
+    thread = threading.Thread(target=submit_third_batch, daemon=True)
+    thread.start()
+
+    assert not submitted.wait(timeout=0.1)
+    release.set()
+    assert submitted.wait(timeout=2)
+    thread.join()
+    dispatcher.shutdown()
+
+    assert send_batch.call_count == 3
+
+def test_forget_drops_consumer_slots():
+    dispatcher = MessageDispatcher(max_in_flight=2, max_in_flight_per_consumer=1, send_batch=MagicMock())
+    dispatcher.submit("localhost:5001", [{"message_id": "1"}])
+    dispatcher.shutdown()
+
+    dispatcher.forget("localhost:5001")
+
+    assert "localhost:5001" not in dispatcher._consumers_slots
+
+def test_parked_batches_of_forgotten_consumer_are_sent():
+    release = threading.Event()
+    send_batch = MagicMock(side_effect=lambda consumer_id, batch: release.wait(timeout=2))
+    dispatcher = MessageDispatcher(max_in_flight=2, max_in_flight_per_consumer=1, send_batch=send_batch)
+    dispatcher.submit("localhost:5001", [{"message_id": "1"}])
+    dispatcher.submit("localhost:5001", [{"message_id": "2"}])
+
+    dispatcher.forget("localhost:5001")
+    release.set()
+    dispatcher.shutdown()
+
+    assert send_batch.call_count == 2
+    assert dispatcher.parked_count() == 0
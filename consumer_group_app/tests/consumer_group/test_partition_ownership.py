@@ -0,0 +1,80 @@
+import pytest
+import time
+
+from unittest.mock import patch, MagicMock
+from consumer_group.partition_ownership import PartitionOwnership
+
+@pytest.fixture
+def connection():
+    with patch('consumer_group.partition_ownership.redis.Redis') as mock_redis:
+        connection = MagicMock()
+        mock_redis.return_value.__enter__.return_value = connection
+        yield connection
+
+def create_ownership(replicas_count: int, connection: MagicMock, partitions_count: int = 4) -> PartitionOwnership:
+    connection.pipeline.return_value.execute.return_value = [1, 0, replicas_count]
+    return PartitionOwnership(redis_con_pool=MagicMock(), replica_id="replica-1", partitions_count=partitions_count,
+                              lease_ttl_ms=3000)
+
+def test_single_replica_claims_all_partitions(connection):
+    ownership = create_ownership(1, connection)
+
+    with patch.object(ownership, '_claim_script', return_value=7):
+        ownership.rebalance()
+
+    assert ownership.owned_count() == 4
+    assert ownership.owned_channels == frozenset(f"messages:published:{partition}" for partition in range(4))
+
+def test_replica_claims_its_fair_share(connection):
+    ownership = create_ownership(2, connection)
+
+    with patch.object(ownership, '_claim_script', return_value=7) as mock_claim:
+        ownership.rebalance()
+
+    assert ownership.owned_count() == 2
+    assert mock_claim.call_count == 2
+
+def test_partitions_owned_by_other_replicas_are_skipped(connection):
+    ownership = create_ownership(1, connection)
+
+    with patch.object(ownership, '_claim_script', side_effect=[0, 5, 0, 6]):
+        ownership.rebalance()
+
+    assert ownership.owned_count() == 2
+
+def test_replica_releases_partitions_above_fair_share(connection):
+    ownership = create_ownership(1, connection)
+    with patch.object(ownership, '_claim_script', return_value=7):
+        ownership.rebalance()
+
+    connection.pipeline.return_value.execute.return_value = [1, 0, 2]
+    with patch.object(ownership, '_renew_script', return_value=1), \
+            patch.object(ownership, '_release_script', return_value=1) as mock_release:
+        ownership.rebalance()
+
+    assert ownership.owned_count() == 2
+    assert mock_release.call_count == 2
+    assert mock_release.call_args.kwargs["args"] == ["replica-1:7"]
+
+def test_partition_is_lost_when_renewal_fails(connection):
+    ownership = create_ownership(1, connection, partitions_count=1)
+    with patch.object(ownership, '_claim_script', return_value=7):
+        ownership.rebalance()
+
+    connection.pipeline.return_value.execute.return_value = [1, 0, 2]
+    with patch.object(ownership, '_renew_script', return_value=0), \
+            patch.object(ownership, '_claim_script', return_value=0):
+        ownership.rebalance()
+
+    assert ownership.owned_count() == 0
+    assert ownership.owned_channels == frozenset()
+
+def test_expired_lease_is_dropped(connection):
+    ownership = create_ownership(1, connection, partitions_count=1)
+    with patch.object(ownership, '_claim_script', return_value=7):
+        ownership.rebalance()
+
+    with patch('consumer_group.partition_ownership.time.monotonic', return_value=time.monotonic() + 4):
+        ownership._drop_expired_leases()
+
+    assert ownership.owned_count() == 0
@@ -0,0 +1,59 @@
+import threading
+
+from unittest.mock import MagicMock
+from consumer_group.retry_scheduler import RetryScheduler, RetryTask, get_entry_attempt
+
+def test_schedule_retries_message():
+    retried = threading.Event()
+    retry = MagicMock(side_effect=lambda task: retried.set())
+    scheduler = RetryScheduler(max_retries=3, base_delay_ms=10, max_delay_ms=20, dead_letter=MagicMock())
+    threading.Thread(target=scheduler.run_scheduling, kwargs={"retry": retry}, daemon=True).start()
+
+    assert scheduler.schedule({"message_id": "1"}, 1, ("localhost:5001",), "Connection error")
+
+    assert retried.wait(timeout=2)
+    task = retry.call_args[0][0]
+    assert task.msg == {"message_id": "1"}
+    assert task.attempt == 1
+    assert task.tried_consumers == ("localhost:5001",)
+    assert task.reason == "Connection error"
+
+def test_schedule_moves_message_to_dead_letter_after_max_retries():
+    dead_letter = MagicMock()
+    scheduler = RetryScheduler(max_retries=3, base_delay_ms=10, max_delay_ms=20, dead_letter=dead_letter)
+
+    assert not scheduler.schedule({"message_id": "1"}, 4, ("localhost:5001",), "Connection error")
+
+    dead_letter.assert_called_once_with({"message_id": "1"}, "Connection error", 3)
+    assert scheduler.pending_count() == 0
+
+def test_failed_retry_is_scheduled_again():
+    dead_letter_called = threading.Event()
+    dead_letter = MagicMock(side_effect=lambda msg, reason, attempts: dead_letter_called.set())
+    retry = MagicMock(side_effect=Exception("No consumers"))
+    scheduler = RetryScheduler(max_retries=2, base_delay_ms=1, max_delay_ms=2, dead_letter=dead_letter)
+    threading.Thread(target=scheduler.run_scheduling, kwargs={"retry": retry}, daemon=True).start()
+
+    scheduler.schedule({"message_id": "1"}, 1, (), "Connection error")
+
+    assert dead_letter_called.wait(timeout=2)
+    assert retry.call_count == 2
+    dead_letter.assert_called_once_with({"message_id": "1"}, "No consumers", 2)
+
+def test_get_entry_attempt():
+    task = RetryTask(due_time=0, sequence=0, msg={"message_id": "1"}, attempt=2, tried_consumers=("localhost:5001",),
+                     reason="Connection error")
+
+    assert get_entry_attempt(task) == ({"message_id": "1"}, 2, ("localhost:5001",))
+    assert get_entry_attempt({"message_id": "2"}) == ({"message_id": "2"}, 0, ())
+
+def test_schedule_moves_message_to_dead_letter_when_too_many_retries_are_pending():
+    dead_letter = MagicMock()
+    scheduler = RetryScheduler(max_retries=3, base_delay_ms=10, max_delay_ms=20, dead_letter=dead_letter,
+                               max_pending_retries=1)
+
+    assert scheduler.schedule({"message_id": "1"}, 1, ("localhost:5001",), "Connection error")
+    assert not scheduler.schedule({"message_id": "2"}, 2, ("localhost:5001",), "Connection error")
+
+    dead_letter.assert_called_once_with({"message_id": "2"}, "1 messages are waiting to be retried. Connection error", 1)
+    assert scheduler.pending_count() == 1
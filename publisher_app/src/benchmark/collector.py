@@ -0,0 +1,57 @@
+import logging
+import threading
+import redis
+
+from typing import Dict
+
+PROCESSED_MSGS_STREAM_NAME = "messages:processed"
+
+# Reads back the entries added to the "messages:processed" stream since the collector was created.
+# The entry id starts with the time in milliseconds the entry was added at (by the Redis server clock),
+# which is kept as the time the message was processed.
+class ProcessedMessagesCollector:
+    READ_COUNT = 1000
+    READ_BLOCK_MS = 100
+
+    def __init__(self, connection: redis.Redis):
+        self.connection = connection
+        self.processed_at_ms: Dict[str, int] = {}
+        self.duplicates_count = 0
+        self._last_id = self._get_last_id()
+        self._stopping = threading.Event()
+
+    def run_collecting(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.collect(block_ms=ProcessedMessagesCollector.READ_BLOCK_MS)
+            except Exception as ex:
+                logging.error("Failed to read the processed messages.")
+                logging.exception(ex)
+                self._stopping.wait(timeout=1)
+
+    # reads the entries added since the last read, returns the number of read entries
+    def collect(self, block_ms: int = None) -> int:
+        response = self.connection.xread({PROCESSED_MSGS_STREAM_NAME: self._last_id},
+                                         count=ProcessedMessagesCollector.READ_COUNT, block=block_ms)
+        read_count = 0
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+                message_id = fields.get(b"message_id", b"").decode()
+                if message_id in self.processed_at_ms:
+                    self.duplicates_count += 1
+                else:
+                    self.processed_at_ms[message_id] = int(entry_id.split("-")[0])
+                self._last_id = entry_id
+                read_count += 1
+        return read_count
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _get_last_id(self) -> str:
+        last_entries = self.connection.xrevrange(PROCESSED_MSGS_STREAM_NAME, count=1)
+        if not last_entries:
+            return "0-0"
+        last_id = last_entries[0][0]
+        return last_id.decode() if isinstance(last_id, bytes) else last_id
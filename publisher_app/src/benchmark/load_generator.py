@@ -0,0 +1,45 @@
+import time
+import redis
+
+from typing import Dict
+from benchmark.profiles import PublishProfile
+from publisher import create_message_ids, publish_messages
+
+# Publishes the messages with the rate of the publish profile. The messages due since the previous tick
+# are published in pipelined batches, and the time each message was published at is recorded
+# (wall clock in milliseconds, to be compared with the ids of the processed messages stream entries).
+class PacedPublisher:
+    TICK_SECONDS = 0.01
+
+    def __init__(self, connection: redis.Redis, profile: PublishProfile, batch_size: int):
+        self.connection = connection
+        self.profile = profile
+        self.batch_size = max(batch_size, 1)
+        self.published_at_ms: Dict[str, int] = {}
+        self.duration_seconds = 0.0
+
+    def run(self) -> None:
+        start_time = time.monotonic()
+        previous_tick = start_time
+        due_count = 0.0
+        while True:
+            now = time.monotonic()
+            elapsed_seconds = now - start_time
+            if elapsed_seconds >= self.profile.duration_seconds:
+                break
+            due_count += self.profile.rate_at(elapsed_seconds) * (now - previous_tick)
+            previous_tick = now
+
+            # when publishing falls behind the profile, the missed messages are published in the next ticks
+            while due_count >= 1:
+                message_ids = create_message_ids(min(int(due_count), self.batch_size))
+                published_at_ms = int(time.time() * 1000)
+                publish_messages(self.connection, message_ids)
+                for message_id in message_ids:
+                    self.published_at_ms[message_id] = published_at_ms
+                due_count -= len(message_ids)
+                if time.monotonic() - start_time >= self.profile.duration_seconds:
+                    break
+
+            time.sleep(max(0.0, PacedPublisher.TICK_SECONDS - (time.monotonic() - now)))
+        self.duration_seconds = time.monotonic() - start_time
@@ -0,0 +1,78 @@
+from typing import Dict
+
+# Publish profile - the rate in messages per second the messages are published with at each moment of the run.
+class PublishProfile:
+
+    def __init__(self, duration_seconds: float):
+        self.duration_seconds = duration_seconds
+
+    def rate_at(self, elapsed_seconds: float) -> float:
+        raise NotImplementedError()
+
+    def describe(self) -> Dict:
+        return {"name": self.name, "duration_seconds": self.duration_seconds}
+
+# the same rate during the whole run
+class SteadyProfile(PublishProfile):
+    name = "steady"
+
+    def __init__(self, duration_seconds: float, rate: float):
+        super().__init__(duration_seconds)
+        self.rate = rate
+
+    def rate_at(self, elapsed_seconds: float) -> float:
+        return self.rate
+
+    def describe(self) -> Dict:
+        return {**super().describe(), "rate": self.rate}
+
+# the base rate with bursts of burst_rate lasting burst_seconds at the start of each period_seconds
+class BurstProfile(PublishProfile):
+    name = "burst"
+
+    def __init__(self, duration_seconds: float, rate: float, burst_rate: float, burst_seconds: float,
+                 period_seconds: float):
+        super().__init__(duration_seconds)
+        self.rate = rate
+        self.burst_rate = burst_rate
+        self.burst_seconds = burst_seconds
+        self.period_seconds = period_seconds
+
+    def rate_at(self, elapsed_seconds: float) -> float:
+        return self.burst_rate if elapsed_seconds % self.period_seconds < self.burst_seconds else self.rate
+
+    def describe(self) -> Dict:
+        return {**super().describe(), "rate": self.rate, "burst_rate": self.burst_rate,
+                "burst_seconds": self.burst_seconds, "period_seconds": self.period_seconds}
+
+# the rate grows linearly from rate to end_rate during the run
+class RampProfile(PublishProfile):
+    name = "ramp"
+
+    def __init__(self, duration_seconds: float, rate: float, end_rate: float):
+        super().__init__(duration_seconds)
+        self.rate = rate
+        self.end_rate = end_rate
+
+    def rate_at(self, elapsed_seconds: float) -> float:
+        progress = min(elapsed_seconds / self.duration_seconds, 1.0) if self.duration_seconds > 0 else 1.0
+        return self.rate + (self.end_rate - self.rate) * progress
+
+    def describe(self) -> Dict:
+        return {**super().describe(), "rate": self.rate, "end_rate": self.end_rate}
+
+PUBLISH_PROFILES = {
+    SteadyProfile.name: SteadyProfile,
+    BurstProfile.name: BurstProfile,
+    RampProfile.name: RampProfile,
+}
+
+def create_profile(name: str, duration_seconds: float, rate: float, burst_rate: float, burst_seconds: float,
+                   period_seconds: float, end_rate: float) -> PublishProfile:
+    if name == SteadyProfile.name:
+        return SteadyProfile(duration_seconds, rate)
+    if name == BurstProfile.name:
+        return BurstProfile(duration_seconds, rate, burst_rate, burst_seconds, period_seconds)
+    if name == RampProfile.name:
+        return RampProfile(duration_seconds, rate, end_rate)
+    raise ValueError(f"Unsupported publish profile {name}")
@@ -0,0 +1,73 @@
+import json
+import math
+
+from pathlib import Path
+from typing import Dict, List
+
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+# nearest-rank percentile of the sorted values
+def get_percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+# The results of one run - end-to-end latency from publishing to saving in the "messages:processed" stream,
+# and throughput: the overall one - from the first published to the last processed message,
+# and the sustained one - of the messages processed while publishing, after the warm-up.
+def create_run_report(consumers_count: int, published_at_ms: Dict[str, int], processed_at_ms: Dict[str, int],
+                      duplicates_count: int, publish_duration_seconds: float, warmup_seconds: float) -> Dict:
+    latencies_ms = sorted(processed_at_ms[message_id] - published_ms
+                          for message_id, published_ms in published_at_ms.items() if message_id in processed_at_ms)
+    processed_count = len(latencies_ms)
+    report = {
+        "consumers_count": consumers_count,
+        "published_count": len(published_at_ms),
+        "processed_count": processed_count,
+        "lost_count": len(published_at_ms) - processed_count,
+        "duplicates_count": duplicates_count,
+        "publish_rate_per_second": _get_rate(len(published_at_ms), publish_duration_seconds),
+        "latency_ms": {f"p{percentile:g}": get_percentile(latencies_ms, percentile)
+                       for percentile in LATENCY_PERCENTILES},
+        "throughput_per_second": None,
+        "sustained_throughput_per_second": None,
+    }
+    report["latency_ms"]["max"] = latencies_ms[-1] if latencies_ms else None
+    report["latency_ms"]["mean"] = sum(latencies_ms) / processed_count if latencies_ms else None
+    if not latencies_ms:
+        return report
+
+    first_published_ms = min(published_at_ms.values())
+    processed_times_ms = [processed_at_ms[message_id] for message_id in published_at_ms if message_id in processed_at_ms]
+    report["throughput_per_second"] = _get_rate(processed_count, (max(processed_times_ms) - first_published_ms) / 1000)
+
+    window_start_ms = first_published_ms + warmup_seconds * 1000
+    window_end_ms = first_published_ms + publish_duration_seconds * 1000
+    if window_end_ms > window_start_ms:
+        window_count = sum(1 for processed_ms in processed_times_ms if window_start_ms <= processed_ms < window_end_ms)
+        report["sustained_throughput_per_second"] = _get_rate(window_count, (window_end_ms - window_start_ms) / 1000)
+    return report
+
+# compares the sustained throughput of each run with the run with the least consumers -
+# efficiency 1.0 means that the throughput grew as much as the consumers count
+def create_scaling_report(runs: List[Dict]) -> List[Dict]:
+    measured_runs = sorted((run for run in runs if run["sustained_throughput_per_second"]),
+                           key=lambda run: run["consumers_count"])
+    if not measured_runs:
+        return []
+    baseline = measured_runs[0]
+    return [{
+        "consumers_count": run["consumers_count"],
+        "speedup": run["sustained_throughput_per_second"] / baseline["sustained_throughput_per_second"],
+        "efficiency": (run["sustained_throughput_per_second"] / baseline["sustained_throughput_per_second"])
+                      / (run["consumers_count"] / baseline["consumers_count"]),
+    } for run in measured_runs]
+
+def write_report(report: Dict, report_path: Path) -> None:
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+def _get_rate(count: int, duration_seconds: float) -> float:
+    return count / duration_seconds if duration_seconds > 0 else None
@@ -0,0 +1,102 @@
+import logging
+import signal
+import subprocess
+import sys
+import time
+import requests
+
+from pathlib import Path
+from typing import List
+
+REPOSITORY_FOLDER_PATH = Path(__file__).resolve().parents[3]
+CONSUMER_GROUP_APP_PATH = REPOSITORY_FOLDER_PATH / "consumer_group_app" / "src" / "app.py"
+CONSUMER_APP_PATH = REPOSITORY_FOLDER_PATH / "consumer_app" / "src" / "app.py"
+
+# Starts the Consumer Group Application and consumers_count Consumer Applications as local processes,
+# connected to the given Redis, and stops them gracefully once the benchmark run is completed.
+# The extra arguments are passed to the applications as they are (e.g. --dispatchBatchSize 100).
+class LocalServices:
+    HOST = "127.0.0.1"
+
+    def __init__(self, redis_host: str, redis_port: int, consumers_count: int, consumer_group_app_port: int,
+                 first_consumer_port: int, channel_shards: int, consumer_group_app_args: List[str],
+                 consumer_app_args: List[str], logs_folder_path: Path, timeout_seconds: float):
+        self.redis_host = redis_host
+        self.redis_port = redis_port
+        self.consumers_count = consumers_count
+        self.consumer_group_app_port = consumer_group_app_port
+        self.consumer_ports = [first_consumer_port + index for index in range(consumers_count)]
+        self.channel_shards = channel_shards
+        self.consumer_group_app_args = consumer_group_app_args
+        self.consumer_app_args = consumer_app_args
+        self.logs_folder_path = logs_folder_path
+        self.timeout_seconds = timeout_seconds
+        self._processes: List[subprocess.Popen] = []
+        self._log_files = []
+
+    def start(self) -> None:
+        redis_args = ["--redisServerHost", self.redis_host, "--redisServerPort", str(self.redis_port)]
+        self._start_process("consumer_group_app", [str(CONSUMER_GROUP_APP_PATH)] + redis_args
+                            + ["--restApiHost", LocalServices.HOST, "--restApiPort", str(self.consumer_group_app_port),
+                               "--maxConsumerGroupSize", str(self.consumers_count),
+                               "--channelShards", str(self.channel_shards)]
+                            + self.consumer_group_app_args)
+        self._wait_until(self._is_consumer_group_app_up, "Consumer Group Application to start")
+
+        for port in self.consumer_ports:
+            self._start_process(f"consumer_app_{port}", [str(CONSUMER_APP_PATH)] + redis_args
+                                + ["--consumerGroupAppHost", LocalServices.HOST,
+                                   "--consumerGroupAppPort", str(self.consumer_group_app_port),
+                                   "--restApiHost", LocalServices.HOST, "--restApiPort", str(port)]
+                                + self.consumer_app_args)
+        self._wait_until(self._are_consumers_registered, f"{self.consumers_count} consumers to register")
+
+    def stop(self) -> None:
+        # the consumers are stopped first, so that they unregister from the running consumer group
+        for process in reversed(self._processes):
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=self.timeout_seconds)
+            except subprocess.TimeoutExpired:
+                logging.error(f"Process {process.args} did not stop in time. Killing it.")
+                process.kill()
+                process.wait()
+        for log_file in self._log_files:
+            log_file.close()
+        self._processes = []
+        self._log_files = []
+
+    def _start_process(self, name: str, args: List[str]) -> None:
+        self.logs_folder_path.mkdir(parents=True, exist_ok=True)
+        log_file = open(self.logs_folder_path / f"{name}.log", "w")
+        self._log_files.append(log_file)
+        logging.info(f"Starting {name}...")
+        self._processes.append(subprocess.Popen([sys.executable] + args, stdout=log_file, stderr=subprocess.STDOUT))
+
+    def _wait_until(self, condition, description: str) -> None:
+        deadline = time.monotonic() + self.timeout_seconds
+        while not condition():
+            if any(process.poll() is not None for process in self._processes):
+                raise RuntimeError(f"A process exited while waiting for {description}, "
+                                   + f"see the logs in {self.logs_folder_path}")
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"Timed out waiting for {description}, see the logs in {self.logs_folder_path}")
+            time.sleep(0.2)
+
+    def _is_consumer_group_app_up(self) -> bool:
+        try:
+            return requests.get(f"{self._consumer_group_app_url()}/metrics", timeout=1).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def _are_consumers_registered(self) -> bool:
+        try:
+            return all(requests.post(f"{self._consumer_group_app_url()}/checkMembership",
+                                     json={"consumer_id": f"{LocalServices.HOST}:{port}"}, timeout=1).status_code == 200
+                       for port in self.consumer_ports)
+        except requests.RequestException:
+            return False
+
+    def _consumer_group_app_url(self) -> str:
+        return f"http://{LocalServices.HOST}:{self.consumer_group_app_port}"
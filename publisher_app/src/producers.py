@@ -0,0 +1,123 @@
+import multiprocessing
+import time
+import uuid
+import redis
+
+from typing import Dict, List, Tuple
+import publisher
+
+# Limits the rate of publishing - the tokens are refilled with rate per second up to capacity,
+# each published message takes one token. Rate 0 means no limit.
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+
+    def acquire(self, count: int) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= count:
+                self._tokens -= count
+                return
+            time.sleep((count - self._tokens) / self.rate)
+
+# Prepares the messages of a producer in blocks before they are published, so that publishing only sends them.
+# The message ids are a random prefix of the producer with a sequence number, unique between the runs,
+# and the payload is padded to payload_size bytes.
+class MessageBlocks:
+
+    def __init__(self, block_size: int, payload_size: int):
+        self.block_size = max(block_size, 1)
+        self.prefix = uuid.uuid4().hex
+        self.next_sequence = 0
+        self.payload_size = payload_size
+
+    def next_block(self) -> List[Tuple[str, bytes]]:
+        block = []
+        for sequence in range(self.next_sequence, self.next_sequence + self.block_size):
+            message_id = f"{self.prefix}-{sequence:012d}"
+            payload = f'{{"message_id": "{message_id}"}}'
+            if len(payload) < self.payload_size:
+                padding_size = max(self.payload_size - len(payload) - len(', "payload": ""'), 0)
+                payload = f'{{"message_id": "{message_id}", "payload": "{"x" * padding_size}"}}'
+            block.append((publisher.get_channel(message_id), payload.encode()))
+        self.next_sequence += self.block_size
+        return block
+
+# Publishes messages from one producer process for duration_seconds with a pipelined round trip per block,
+# and sends the statistics of the producer to the results queue. PUBLISH returns the number of subscribers
+# that received the message, so the messages received by no subscriber are counted.
+def run_producer(producer_index: int, results_queue: multiprocessing.Queue, redis_host: str, redis_port: int,
+                 channel_shards: int, duration_seconds: float, rate: float, pipeline_depth: int,
+                 payload_size: int) -> None:
+    publisher.channel_shards = channel_shards
+    connection = redis.Redis(host=redis_host, port=redis_port)
+    blocks = MessageBlocks(block_size=pipeline_depth, payload_size=payload_size)
+    bucket = TokenBucket(rate=rate, capacity=pipeline_depth)
+    stats = {"producer_index": producer_index, "published_count": 0, "receivers_count": 0,
+             "not_received_count": 0, "min_receivers": None, "max_receivers": None, "error": None}
+
+    block = blocks.next_block()
+    start_time = time.monotonic()
+    try:
+        while time.monotonic() - start_time < duration_seconds:
+            bucket.acquire(len(block))
+            pipeline = connection.pipeline(transaction=False)
+            for channel, payload in block:
+                pipeline.publish(channel, payload)
+            receivers = pipeline.execute()
+
+            stats["published_count"] += len(receivers)
+            stats["receivers_count"] += sum(receivers)
+            stats["not_received_count"] += receivers.count(0)
+            block_min, block_max = min(receivers), max(receivers)
+            stats["min_receivers"] = block_min if stats["min_receivers"] is None else min(stats["min_receivers"], block_min)
+            stats["max_receivers"] = block_max if stats["max_receivers"] is None else max(stats["max_receivers"], block_max)
+            # the next block is prepared while the tokens for it are refilled
+            block = blocks.next_block()
+    except Exception as ex:
+        stats["error"] = str(ex)
+    finally:
+        stats["duration_seconds"] = time.monotonic() - start_time
+        results_queue.put(stats)
+
+# Runs processes_count producer processes sharing the target rate, waits for them and returns the summary:
+# the achieved publish rate and the PUBLISH receiver counts of all producers.
+def publish_with_producers(redis_host: str, redis_port: int, channel_shards: int, duration_seconds: float,
+                           processes_count: int, rate: float, pipeline_depth: int, payload_size: int) -> Dict:
+    context = multiprocessing.get_context("spawn")
+    results_queue = context.Queue()
+    processes = [context.Process(name=f"Producer-{index}", target=run_producer,
+                                 args=(index, results_queue, redis_host, redis_port, channel_shards, duration_seconds,
+                                       rate / processes_count, pipeline_depth, payload_size),
+                                 daemon=True)
+                 for index in range(processes_count)]
+    for process in processes:
+        process.start()
+    # the results are read before joining, so that the processes are not blocked on the full queue
+    producers = [results_queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    # the rate is measured by the publishing time of the producers, without the start of the processes
+    duration = max(producer["duration_seconds"] for producer in producers)
+    published_count = sum(producer["published_count"] for producer in producers)
+    active_producers = [producer for producer in producers if producer["published_count"] > 0]
+    return {
+        "published_count": published_count,
+        "duration_seconds": duration,
+        "publish_rate_per_second": published_count / duration if duration > 0 else None,
+        "target_rate_per_second": rate if rate > 0 else None,
+        "receivers_count": sum(producer["receivers_count"] for producer in producers),
+        "not_received_count": sum(producer["not_received_count"] for producer in producers),
+        "min_receivers": min((producer["min_receivers"] for producer in active_producers), default=None),
+        "max_receivers": max((producer["max_receivers"] for producer in active_producers), default=None),
+        "producers": sorted(producers, key=lambda producer: producer["producer_index"]),
+    }
@@ -1,17 +1,42 @@
-
+import argparse
+import json
 import random
 
 import time
 import uuid
+import zlib
 import redis
 
 from datetime import datetime, timedelta
+from typing import List
 
 # Redis connection details (modify host and port if needed)
 redis_host = "localhost"
 redis_port = 6379
 target_duration = timedelta(minutes=1)
 batch_size = 1000
+# number of messages:published:<shard> channels, must match channel_shards of the consumer group application
+# 0 - all messages are published to the messages:published channel
+channel_shards = 0
+
+PUBLISHER_MODES = ["simple", "high_rate"]
+
+def get_channel(message_id: str) -> str:
+    if channel_shards <= 0:
+        return "messages:published"
+    return f"messages:published:{zlib.crc32(message_id.encode()) % channel_shards}"
+
+def create_message_ids(count: int) -> List[str]:
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+# publishes the messages with one pipelined round trip
+def publish_messages(connection: redis.Redis, message_ids: List[str]) -> None:
+    p = connection.pipeline(transaction=False)
+    for message_id in message_ids:
+        p.publish(
+            get_channel(message_id), f'{{"message_id": "{message_id}"}}'
+        )
+    p.execute()
 
 def publisher():
     try:
@@ -24,12 +49,7 @@ def publisher():
     total_messages = 0
     try:
         while datetime.now() - start_time < target_duration:
-            p = connection.pipeline()
-            for _ in range(batch_size):
-                p.publish(
-                    "messages:published", f'{{"message_id": "{str(uuid.uuid4())}"}}'
-                )
-            p.execute()
+            publish_messages(connection, create_message_ids(batch_size))
             total_messages += batch_size
             time.sleep(random.uniform(0.1, 0.5))
             #exit(0)
@@ -40,4 +60,45 @@ def publisher():
 
 
 if __name__ == "__main__":
-    publisher()
\ No newline at end of file
+    parser = argparse.ArgumentParser("Publish messages to the messages:published channel(s)")
+    parser.add_argument("--redisServerHost", default=redis_host, help="Redis server host to connect to.")
+    parser.add_argument("--redisServerPort", default=redis_port, type=int, help="Redis server port to connect to.")
+    parser.add_argument("--durationSeconds", default=target_duration.total_seconds(), type=float,
+                        help="How long in seconds the messages are published.")
+    parser.add_argument("--batchSize", default=batch_size, type=int,
+                        help="Number of messages published with one pipelined round trip.")
+    parser.add_argument("--channelShards", default=channel_shards, type=int,
+                        help="Number of messages:published:<shard> channels (0 - one channel).")
+    parser.add_argument("--mode", default="simple", choices=PUBLISHER_MODES,
+                        help="simple - one process publishing batches with random pauses; "
+                             + "high_rate - several producer processes publishing with a target rate.")
+    parser.add_argument("--processes", default=1, type=int, help="Number of producer processes in high_rate mode.")
+    parser.add_argument("--rate", default=0, type=float,
+                        help="Target messages per second of all producers in high_rate mode (0 - as fast as possible).")
+    parser.add_argument("--pipelineDepth", default=batch_size, type=int,
+                        help="Number of messages published with one pipelined round trip in high_rate mode.")
+    parser.add_argument("--payloadSize", default=0, type=int,
+                        help="Size in bytes the messages are padded to in high_rate mode.")
+    args = parser.parse_args()
+    redis_host = args.redisServerHost
+    redis_port = args.redisServerPort
+    target_duration = timedelta(seconds=args.durationSeconds)
+    batch_size = args.batchSize
+    channel_shards = args.channelShards
+    if args.mode == "high_rate":
+        from producers import publish_with_producers
+        summary = publish_with_producers(redis_host=redis_host, redis_port=redis_port, channel_shards=channel_shards,
+                                         duration_seconds=args.durationSeconds, processes_count=args.processes,
+                                         rate=args.rate, pipeline_depth=args.pipelineDepth,
+                                         payload_size=args.payloadSize)
+        print(f"Total messages published: {summary['published_count']}")
+        print(f"Achieved publish rate: {summary['publish_rate_per_second']:.0f} messages per second")
+        # a subscriber that keeps up receives every message - the messages received by no subscriber are lost
+        print(f"Messages received by no subscriber: {summary['not_received_count']}, "
+              + f"receivers per message: {summary['min_receivers']} - {summary['max_receivers']}")
+        for producer in summary["producers"]:
+            if producer["error"]:
+                print(f"Error: producer {producer['producer_index']} failed: {producer['error']}")
+        print(json.dumps(summary))
+    else:
+        publisher()
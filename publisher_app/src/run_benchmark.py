@@ -0,0 +1,126 @@
+import argparse
+import logging
+import shlex
+import threading
+import time
+import redis
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict
+import publisher
+from benchmark.collector import ProcessedMessagesCollector
+from benchmark.load_generator import PacedPublisher
+from benchmark.profiles import PUBLISH_PROFILES, PublishProfile, create_profile
+from benchmark.report import create_run_report, create_scaling_report, write_report
+from benchmark.services import LocalServices
+
+logging.basicConfig(format='%(asctime)s %(levelname)s %(threadName)s %(message)s',
+                    level=logging.INFO,
+                    datefmt='%Y-%m-%d %H:%M:%S')
+
+# publishes the messages of the profile and waits for them to be processed, up to drain_timeout_seconds
+def run_once(connection: redis.Redis, profile: PublishProfile, consumers_count: int, batch_size: int,
+             drain_timeout_seconds: float, warmup_seconds: float) -> Dict:
+    collector = ProcessedMessagesCollector(connection)
+    collecting_thread = threading.Thread(name="ProcessedMessagesCollector", target=collector.run_collecting)
+    collecting_thread.start()
+
+    paced_publisher = PacedPublisher(connection, profile, batch_size)
+    logging.info(f"Publishing with profile {profile.describe()} to {consumers_count} consumers...")
+    paced_publisher.run()
+    logging.info(f"Published {len(paced_publisher.published_at_ms)} messages. Waiting for them to be processed...")
+
+    deadline = time.monotonic() + drain_timeout_seconds
+    while time.monotonic() < deadline and len(collector.processed_at_ms) < len(paced_publisher.published_at_ms):
+        time.sleep(0.5)
+    collector.stop()
+    collecting_thread.join()
+
+    run_report = create_run_report(consumers_count, paced_publisher.published_at_ms, collector.processed_at_ms,
+                                   collector.duplicates_count, paced_publisher.duration_seconds, warmup_seconds)
+    logging.info(f"Run results: {run_report}")
+    return run_report
+
+def run():
+    parser = argparse.ArgumentParser("Run end-to-end benchmark of the Consumer Group and Consumer Applications")
+    parser.add_argument("--redisServerHost", default="localhost", help="Redis server host to connect to.")
+    parser.add_argument("--redisServerPort", default=6379, type=int, help="Redis server port to connect to.")
+    parser.add_argument("--profile", default="steady", choices=list(PUBLISH_PROFILES),
+                        help="steady - constant rate; burst - bursts of burstRate on top of rate; ramp - from rate to endRate.")
+    parser.add_argument("--durationSeconds", default=30, type=float, help="How long in seconds the messages are published.")
+    parser.add_argument("--rate", default=1000, type=float, help="Messages published per second.")
+    parser.add_argument("--burstRate", default=10000, type=float, help="Messages published per second during the bursts.")
+    parser.add_argument("--burstSeconds", default=1, type=float, help="Duration of each burst in seconds.")
+    parser.add_argument("--periodSeconds", default=10, type=float, help="Time between the starts of the bursts in seconds.")
+    parser.add_argument("--endRate", default=10000, type=float, help="Messages published per second at the end of the ramp.")
+    parser.add_argument("--consumersCounts", default="1",
+                        help="Comma separated numbers of consumers, the benchmark is run once for each of them.")
+    parser.add_argument("--batchSize", default=100, type=int,
+                        help="Maximum number of messages published with one pipelined round trip.")
+    parser.add_argument("--channelShards", default=0, type=int,
+                        help="Number of messages:published:<shard> channels (0 - one channel).")
+    parser.add_argument("--warmupSeconds", default=5, type=float,
+                        help="Initial seconds of publishing not included in the sustained throughput.")
+    parser.add_argument("--drainTimeoutSeconds", default=30, type=float,
+                        help="Maximum time in seconds to wait for the published messages to be processed.")
+    parser.add_argument("--externalServices", action="store_true",
+                        help="Use the already running applications instead of starting them (consumersCounts is just reported).")
+    parser.add_argument("--consumerGroupAppPort", default=15000, type=int, help="Rest Api port of the Consumer Group Application.")
+    parser.add_argument("--firstConsumerPort", default=15001, type=int,
+                        help="Rest Api port of the first Consumer Application, the next ones use the following ports.")
+    parser.add_argument("--consumerGroupAppArgs", default="",
+                        help="Additional command line parameters of the Consumer Group Application, e.g. \"--dispatchBatchSize 100\".")
+    parser.add_argument("--consumerAppArgs", default="", help="Additional command line parameters of the Consumer Applications.")
+    parser.add_argument("--servicesTimeoutSeconds", default=30, type=float,
+                        help="Maximum time in seconds to wait for the applications to start and to stop.")
+    parser.add_argument("--reportPath", default="benchmark_results/report.json", help="Path of the json report.")
+    parser.add_argument("--logsFolderPath", default="benchmark_results/logs", help="Folder for the logs of the applications.")
+    args = parser.parse_args()
+
+    profile = create_profile(args.profile, duration_seconds=args.durationSeconds, rate=args.rate,
+                             burst_rate=args.burstRate, burst_seconds=args.burstSeconds,
+                             period_seconds=args.periodSeconds, end_rate=args.endRate)
+    publisher.channel_shards = args.channelShards
+    connection = redis.Redis(host=args.redisServerHost, port=args.redisServerPort)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "profile": profile.describe(),
+        "settings": {
+            "batch_size": args.batchSize,
+            "channel_shards": args.channelShards,
+            "warmup_seconds": args.warmupSeconds,
+            "drain_timeout_seconds": args.drainTimeoutSeconds,
+            "external_services": args.externalServices,
+            "consumer_group_app_args": args.consumerGroupAppArgs,
+            "consumer_app_args": args.consumerAppArgs,
+        },
+        "runs": [],
+    }
+    for consumers_count in [int(count) for count in args.consumersCounts.split(",")]:
+        services = None
+        if not args.externalServices:
+            services = LocalServices(redis_host=args.redisServerHost, redis_port=args.redisServerPort,
+                                     consumers_count=consumers_count, consumer_group_app_port=args.consumerGroupAppPort,
+                                     first_consumer_port=args.firstConsumerPort, channel_shards=args.channelShards,
+                                     consumer_group_app_args=shlex.split(args.consumerGroupAppArgs),
+                                     consumer_app_args=shlex.split(args.consumerAppArgs),
+                                     logs_folder_path=Path(args.logsFolderPath) / f"consumers_{consumers_count}",
+                                     timeout_seconds=args.servicesTimeoutSeconds)
+        try:
+            if services:
+                services.start()
+            report["runs"].append(run_once(connection, profile, consumers_count, args.batchSize,
+                                           args.drainTimeoutSeconds, args.warmupSeconds))
+        finally:
+            if services:
+                logging.info("Stopping the applications...")
+                services.stop()
+
+    report["scaling"] = create_scaling_report(report["runs"])
+    write_report(report, Path(args.reportPath))
+    logging.info(f"Benchmark report written to {args.reportPath}")
+
+if __name__ == '__main__':
+    run()